@@ -0,0 +1,185 @@
+"""
+Monthly Performance Analysis - Engine Parity Check and Benchmark
+
+Runs the direct-cost, pool and allocation stages on the pandas engine and
+on the Polars engine (lib/polars_engine.py) over synthetic months of
+increasing size, checks that every output matches and prints the timings
+and speedup of each size.
+
+Usage:
+    python api/py/mpa/compare_engines.py [--rows 100000 1000000] \
+        [--codes 2000] [--staff 500] [--repeat 3] [--seed 7]
+
+Exits with status 1 if any output differs between the engines (beyond
+floating-point summation order, rtol 1e-9), or 2 if polars is not
+installed.
+"""
+
+import argparse
+import sys
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Add lib directory to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+lib_dir = os.path.join(current_dir, 'lib')
+if lib_dir not in sys.path:
+    sys.path.insert(0, lib_dir)
+
+from allocations import OverheadAllocator, calculate_margins
+from classification import ProjectClassifier, classify_all_activity
+from computations import (
+    calculate_cost_center_costs,
+    calculate_expense_costs,
+    calculate_labor_costs,
+    calculate_non_revenue_client_costs,
+    merge_direct_costs,
+)
+import polars_engine
+
+# Relative tolerance for float columns (summation order differs between engines)
+RTOL = 1e-9
+
+
+def synthetic_month(rows: int, codes: int, staff: int, seed: int) -> Dict[str, pd.DataFrame]:
+    """Loader-shaped frames for one month: proforma, compensation, hours, expenses, pnl."""
+    rng = np.random.default_rng(seed)
+    client_codes = np.array([f"CLI-{i:05d}" for i in range(codes)])
+    cost_codes = np.array(sorted(ProjectClassifier().cost_centers))
+    activity_codes = np.concatenate([client_codes, cost_codes, [f"NRC-{i:03d}" for i in range(20)]])
+    staff_keys = np.array([f"Staff{i:04d}" for i in range(staff)])
+    dates = pd.Timestamp(2025, 11, 1) + pd.to_timedelta(rng.integers(0, 30, rows), unit='D')
+
+    proforma = pd.DataFrame({
+        'contract_code': client_codes,
+        'project_name': [f"Project {c}" for c in client_codes],
+        'proforma_section': 'BEH',
+        'analysis_category': 'Behavioral Health',
+        'allocation_tag': rng.choice(['Data', 'Wellness', ''], codes),
+        'revenue': rng.uniform(1000, 50000, codes).round(2),
+    })
+    compensation = pd.DataFrame({
+        # A few staff without a compensation record
+        'staff_key': staff_keys[:-3],
+        'hourly_cost': rng.uniform(40, 150, staff - 3),
+    })
+    hours = pd.DataFrame({
+        'date': dates,
+        'contract_code': rng.choice(activity_codes, rows),
+        'project_name': 'name',
+        'staff_key': rng.choice(staff_keys, rows),
+        'hours': rng.uniform(0.25, 8, rows).round(2),
+    })
+    expense_rows = max(1, rows // 5)
+    expenses = pd.DataFrame({
+        'date': dates[:expense_rows],
+        'contract_code': rng.choice(activity_codes, expense_rows),
+        'amount': rng.uniform(5, 2000, expense_rows).round(2),
+        'notes': 'synthetic',
+    })
+    pnl = pd.DataFrame({
+        'bucket': ['SGA', 'DATA', 'WORKPLACE', 'NIL'] * 5,
+        'amount': rng.uniform(1000, 100000, 20).round(2),
+    })
+    return {'proforma': proforma, 'compensation': compensation, 'hours': hours, 'expenses': expenses, 'pnl': pnl}
+
+
+def run_pandas(month: Dict[str, pd.DataFrame], classified: Dict[str, pd.DataFrame]) -> dict:
+    """The pandas direct_costs, pools and allocate stages (as in process.build_pipeline)."""
+    labor_summary, hours_detail, _ = calculate_labor_costs(month['hours'], month['compensation'])
+    expense_summary, expense_detail = calculate_expense_costs(month['expenses'])
+    cost_centers = calculate_cost_center_costs(classified['cost_centers'], hours_detail, expense_detail)
+    allocator = OverheadAllocator()
+    pools = allocator.calculate_pools(month['pnl'], cost_centers, include_cc_in_sga=True)
+    revenue_centers = merge_direct_costs(classified['revenue_centers'], labor_summary, expense_summary)
+    revenue_centers = allocator.allocate_sga(revenue_centers, pools['sga_pool'])
+    revenue_centers = allocator.allocate_data(revenue_centers, pools['data_pool'])
+    revenue_centers = allocator.allocate_workplace(revenue_centers, pools['workplace_pool'])
+    return {
+        'revenue_centers': calculate_margins(revenue_centers),
+        'cost_centers': cost_centers,
+        'non_revenue_clients': calculate_non_revenue_client_costs(
+            classified['non_revenue_clients'], hours_detail, expense_detail
+        ),
+        'hours_detail': hours_detail,
+        'expense_detail': expense_detail,
+        'pools': pools,
+    }
+
+
+def run_polars(month: Dict[str, pd.DataFrame], classified: Dict[str, pd.DataFrame]) -> dict:
+    """The same stages on the Polars engine."""
+    result, _ = polars_engine.direct_costs(classified, month['hours'], month['compensation'], month['expenses'])
+    pools = polars_engine.calculate_pools(month['pnl'], result['cost_centers'], include_cc_in_sga=True)
+    result['revenue_centers'] = polars_engine.allocate(result['revenue_centers'], pools)
+    result['pools'] = pools
+    return result
+
+
+def differences(expected: dict, actual: dict) -> List[str]:
+    """Outputs that differ between the engines."""
+    problems = []
+    for name, frame in expected.items():
+        try:
+            if isinstance(frame, pd.DataFrame):
+                pd.testing.assert_frame_equal(frame, actual[name], check_exact=False, rtol=RTOL)
+            else:
+                pd.testing.assert_series_equal(
+                    pd.Series(frame), pd.Series(actual[name]), check_exact=False, rtol=RTOL
+                )
+        except AssertionError as e:
+            problems.append(f"{name}: {e}")
+    return problems
+
+
+def best_time(func: Callable[[], dict], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Compare the pandas and Polars MPA engines')
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000], help='Hours rows per month')
+    parser.add_argument('--codes', type=int, default=2000, help='Revenue center codes')
+    parser.add_argument('--staff', type=int, default=500, help='Staff')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per engine (best is reported)')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args(argv)
+
+    if not polars_engine.HAS_POLARS:
+        print("polars is not installed (pip install polars)", file=sys.stderr)
+        sys.exit(2)
+
+    failed = False
+    classifier = ProjectClassifier()
+    for rows in args.rows:
+        month = synthetic_month(rows, args.codes, args.staff, args.seed)
+        classified = classify_all_activity(month['proforma'], month['hours'], month['expenses'], classifier)
+
+        problems = differences(run_pandas(month, classified), run_polars(month, classified))
+        pandas_seconds = best_time(lambda: run_pandas(month, classified), args.repeat)
+        polars_seconds = best_time(lambda: run_polars(month, classified), args.repeat)
+
+        status = 'identical' if not problems else f"{len(problems)} outputs differ"
+        print(
+            f"rows={rows:>9} pandas={pandas_seconds:.3f}s polars={polars_seconds:.3f}s "
+            f"speedup={pandas_seconds / polars_seconds:.2f}x {status}"
+        )
+        for problem in problems:
+            print(f"  {problem}")
+        failed = failed or bool(problems)
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
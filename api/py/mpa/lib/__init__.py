@@ -14,9 +14,30 @@ from .loaders import (
 )
 from .classification import ProjectClassifier, classify_all_activity
 from .computations import calculate_labor_costs, calculate_expense_costs, merge_direct_costs
+from .parallel import calculate_direct_costs
+from .polars_engine import engine_mode
 from .allocations import OverheadAllocator, calculate_margins
-from .validators import run_all_validations, ValidationResult
-from .db import SupabaseClient
+from .validators import (
+    run_all_validations,
+    ValidationResult,
+    ValidationEngine,
+    ValidationRule,
+    ValidationGate,
+    ValidationFailed,
+)
+from .db import SupabaseClient, get_client
+from .pipeline import Pipeline, Stage, StageCache, DiskStageCache, TieredStageCache, config_fingerprint
+from .local_backend import LocalClient
+from .checkpoints import CheckpointStore
+from .detail_store import DetailStore
+from .rollups import compute_rollups
+from .sniff import sniff_file, sniff_files
+from .jobs import BatchQueue, SupabaseBatchQueue, InMemoryBatchQueue
+from .instrumentation import Instrumentation
+from .profiling import Profiler, profile_mode
+from .spill import MemoryBudget, SpillStore
+from .schema import apply_schema, frame_memory, typed_schema_enabled
+from .incremental import IncrementalStore, incremental_enabled
 
 __all__ = [
     'normalize_contract_code',
@@ -29,10 +50,42 @@ __all__ = [
     'classify_all_activity',
     'calculate_labor_costs',
     'calculate_expense_costs',
+    'calculate_direct_costs',
+    'engine_mode',
     'merge_direct_costs',
     'OverheadAllocator',
     'calculate_margins',
     'run_all_validations',
     'ValidationResult',
+    'ValidationEngine',
+    'ValidationRule',
+    'ValidationGate',
+    'ValidationFailed',
     'SupabaseClient',
+    'get_client',
+    'LocalClient',
+    'Pipeline',
+    'Stage',
+    'StageCache',
+    'DiskStageCache',
+    'TieredStageCache',
+    'CheckpointStore',
+    'DetailStore',
+    'compute_rollups',
+    'sniff_file',
+    'sniff_files',
+    'BatchQueue',
+    'SupabaseBatchQueue',
+    'InMemoryBatchQueue',
+    'Instrumentation',
+    'Profiler',
+    'profile_mode',
+    'MemoryBudget',
+    'SpillStore',
+    'apply_schema',
+    'frame_memory',
+    'typed_schema_enabled',
+    'IncrementalStore',
+    'incremental_enabled',
+    'config_fingerprint',
 ]
@@ -0,0 +1,199 @@
+"""
+Batch Checkpoints for Monthly Performance Analysis
+
+Persists completed stage outputs to Supabase Storage under the batch id so a
+batch interrupted by a function timeout can resume from the last completed
+stage in a later invocation:
+- mpa_checkpoints/<batch_id>/<stage_key>.zip
+- Each archive holds meta.json plus one Parquet file per DataFrame
+- Non-tabular outputs fall back to pickle inside the archive
+- Only runs with a deadline are checkpointed, and only once half their time
+  budget has passed; outputs of earlier stages are uploaded then, so runs
+  that finish well inside the budget write nothing
+"""
+
+import json
+import pickle
+import time
+import zipfile
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    # Parquet needs pyarrow; checkpoints degrade to pickle without it
+    HAS_PYARROW = False
+
+try:
+    from .pipeline import StageCache
+except ImportError:
+    from pipeline import StageCache
+
+CHECKPOINT_FOLDER = 'mpa_checkpoints'
+
+
+def _is_scalar(value: Any) -> bool:
+    return value is None or isinstance(value, (str, int, float, bool))
+
+
+def encode_output(output: Any, logs: List[str]) -> bytes:
+    """
+    Encode a stage output as a compact zip archive.
+
+    DataFrames (alone or as values of a dict) are written as Parquet;
+    JSON scalars go to meta.json; anything else is pickled.
+    """
+    meta: Dict[str, Any] = {'logs': logs, 'values': {}, 'frames': []}
+    frames: Dict[str, pd.DataFrame] = {}
+
+    if isinstance(output, pd.DataFrame):
+        meta['kind'] = 'frame'
+        frames['output'] = output
+    elif isinstance(output, dict) and all(
+        isinstance(v, pd.DataFrame) or _is_scalar(v) for v in output.values()
+    ):
+        meta['kind'] = 'dict'
+        for name, value in output.items():
+            if isinstance(value, pd.DataFrame):
+                frames[name] = value
+            else:
+                meta['values'][name] = value
+    else:
+        meta['kind'] = 'pickle'
+
+    if not HAS_PYARROW and frames:
+        meta['kind'] = 'pickle'
+        frames = {}
+
+    try:
+        return _archive(meta, frames, output)
+    except Exception:
+        # Columns Parquet cannot hold (e.g. mixed str/int objects) are pickled
+        if meta['kind'] == 'pickle':
+            raise
+        return _archive(dict(meta, kind='pickle', values={}), {}, output)
+
+
+def _archive(meta: Dict[str, Any], frames: Dict[str, pd.DataFrame], output: Any) -> bytes:
+    """Write meta.json, the Parquet frames and (for kind 'pickle') the pickled output."""
+    meta['frames'] = list(frames)
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+        archive.writestr('meta.json', json.dumps(meta, default=str))
+        for name, df in frames.items():
+            frame_buffer = BytesIO()
+            df.to_parquet(frame_buffer, compression='zstd')
+            archive.writestr(f'{name}.parquet', frame_buffer.getvalue())
+        if meta['kind'] == 'pickle':
+            archive.writestr('output.pkl', pickle.dumps(output, protocol=pickle.HIGHEST_PROTOCOL))
+    return buffer.getvalue()
+
+
+def decode_output(content: bytes) -> Tuple[Any, List[str]]:
+    """Decode an archive written by encode_output into (output, logs)."""
+    with zipfile.ZipFile(BytesIO(content)) as archive:
+        meta = json.loads(archive.read('meta.json'))
+        if meta['kind'] == 'pickle':
+            return pickle.loads(archive.read('output.pkl')), meta['logs']
+
+        frames = {
+            name: pd.read_parquet(BytesIO(archive.read(f'{name}.parquet')))
+            for name in meta['frames']
+        }
+
+    if meta['kind'] == 'frame':
+        return frames['output'], meta['logs']
+
+    output = dict(meta['values'])
+    output.update(frames)
+    return output, meta['logs']
+
+
+class CheckpointStore(StageCache):
+    """
+    Stage cache backed by per-batch checkpoint files in Supabase Storage.
+
+    Used as the remote tier behind the local stage cache so completed stages
+    survive the function instance that produced them.
+
+    Args:
+        db: SupabaseClient (or LocalClient) providing the storage methods
+        batch_id: Batch UUID
+        write_after: time.monotonic() value before which puts are not
+            uploaded (None uploads every put)
+        defer: Keep outputs put before write_after and upload them with the
+            first later put or flush(); if False they are not checkpointed
+            (callers freeing outputs early should not have them held here)
+    """
+
+    def __init__(self, db, batch_id: str, write_after: Optional[float] = None, defer: bool = True):
+        super().__init__()
+        self.db = db
+        self.batch_id = batch_id
+        self.folder = f"{CHECKPOINT_FOLDER}/{batch_id}"
+        self.write_after = write_after
+        self.defer = defer
+        self._deferred: Dict[str, Tuple[Any, List[str]]] = {}
+        self._names: Optional[Set[str]] = None
+
+    def _path(self, key: str) -> str:
+        return f"{self.folder}/{key}.zip"
+
+    def _listing(self) -> Set[str]:
+        if self._names is None:
+            try:
+                self._names = set(self.db.list_files(self.folder))
+            except Exception:
+                self._names = set()
+        return self._names
+
+    def contains(self, key: str) -> bool:
+        return f"{key}.zip" in self._listing()
+
+    def get(self, key: str) -> Optional[Tuple[Any, List[str]]]:
+        if not self.contains(key):
+            return None
+        try:
+            return decode_output(self.db.download_file(self._path(key)).getvalue())
+        except Exception:
+            return None
+
+    def put(self, key: str, output: Any, logs: List[str]):
+        if self.write_after is not None and time.monotonic() < self.write_after:
+            # A timeout is not plausible yet
+            if self.defer:
+                self._deferred[key] = (output, logs)
+            return
+        self.flush()
+        self._upload(key, output, logs)
+
+    def flush(self):
+        """Upload the outputs deferred so far."""
+        deferred, self._deferred = self._deferred, {}
+        for key, (output, logs) in deferred.items():
+            self._upload(key, output, logs)
+
+    def _upload(self, key: str, output: Any, logs: List[str]):
+        try:
+            self.db.upload_file(self._path(key), encode_output(output, logs), 'application/zip')
+        except Exception as e:
+            # Storage errors or size limits cost the resume point, not the run
+            print(f"MPA checkpoint {key[:12]} for batch {self.batch_id} not written: {e}")
+            return
+        self._listing().add(f"{key}.zip")
+
+    def completed_keys(self) -> Set[str]:
+        """Stage keys that have a checkpoint for this batch."""
+        return {name[:-len('.zip')] for name in self._listing() if name.endswith('.zip')}
+
+    def clear(self):
+        """Delete all checkpoints for the batch (after a successful run)."""
+        names = self._listing()
+        if names:
+            self.db.remove_files([f"{self.folder}/{name}" for name in names])
+        self._names = set()
+        self._deferred = {}
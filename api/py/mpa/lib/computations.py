@@ -8,7 +8,7 @@ Computes:
 """
 
 import pandas as pd
-from typing import List, Tuple
+from typing import List, Set, Tuple
 
 
 def calculate_labor_costs(
@@ -32,19 +32,36 @@ def calculate_labor_costs(
         Staff missing from compensation file will be excluded from labor cost calculations
         and flagged as a warning.
     """
-    logs = []
+    labor_by_project, hours_detail, missing_staff, missing_hours = aggregate_labor(hours_df, comp_df)
+    return labor_by_project, hours_detail, missing_compensation_logs(missing_staff, missing_hours)
 
+
+def aggregate_labor(
+    hours_df: pd.DataFrame,
+    comp_df: pd.DataFrame
+) -> Tuple[pd.DataFrame, pd.DataFrame, Set[str], float]:
+    """
+    Price hours with compensation rates and aggregate them.
+
+    The labor step of calculate_labor_costs, also run per partition by
+    parallel.calculate_direct_costs.
+
+    Returns:
+        Tuple of labor by contract_code, hours detail by (contract_code,
+        staff_key), staff missing compensation and their excluded hours
+    """
     merged = hours_df.merge(
         comp_df[["staff_key", "hourly_cost"]],
         on="staff_key",
         how="left",
     )
 
+    missing_staff: Set[str] = set()
+    missing_hours = 0.0
     missing = merged[merged["hourly_cost"].isna()]
     if len(missing) > 0:
-        missing_staff = sorted(set(missing["staff_key"].astype(str)))
-        missing_hours = missing["hours"].sum()
-        logs.append(f"{len(missing_staff)} staff missing compensation records ({missing_hours:.1f} hours excluded)")
+        missing_staff = set(missing["staff_key"].astype(str))
+        missing_hours = float(missing["hours"].sum())
         merged = merged[merged["hourly_cost"].notna()]
 
     merged["labor_cost"] = merged["hours"] * merged["hourly_cost"]
@@ -66,7 +83,14 @@ def calculate_labor_costs(
         }).reset_index()
     )
 
-    return labor_by_project, hours_detail, logs
+    return labor_by_project, hours_detail, missing_staff, missing_hours
+
+
+def missing_compensation_logs(missing_staff: Set[str], missing_hours: float) -> List[str]:
+    """Warning for staff whose hours were excluded for lack of a compensation record."""
+    if not missing_staff:
+        return []
+    return [f"{len(missing_staff)} staff missing compensation records ({missing_hours:.1f} hours excluded)"]
 
 
 def calculate_expense_costs(expenses_df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
@@ -81,17 +105,23 @@ def calculate_expense_costs(expenses_df: pd.DataFrame) -> Tuple[pd.DataFrame, pd
         - DataFrame with expense costs by contract_code
         - DataFrame with expense detail (for drill-down)
     """
-    # Keep detail for drill-down
-    expense_detail = expenses_df[['contract_code', 'date', 'amount', 'notes']].copy()
-    expense_detail.rename(columns={'date': 'expense_date'}, inplace=True)
+    return aggregate_expenses(expenses_df), build_expense_detail(expenses_df)
 
-    # Aggregate by project
+
+def aggregate_expenses(expenses_df: pd.DataFrame) -> pd.DataFrame:
+    """Expense cost by contract_code."""
     expense_by_project = (
         expenses_df.groupby("contract_code").agg({"amount": "sum"}).reset_index()
     )
     expense_by_project.rename(columns={"amount": "expense_cost"}, inplace=True)
+    return expense_by_project
+
 
-    return expense_by_project, expense_detail
+def build_expense_detail(expenses_df: pd.DataFrame) -> pd.DataFrame:
+    """Expense line items kept for drill-down."""
+    expense_detail = expenses_df[['contract_code', 'date', 'amount', 'notes']].copy()
+    expense_detail.rename(columns={'date': 'expense_date'}, inplace=True)
+    return expense_detail
 
 
 def merge_direct_costs(
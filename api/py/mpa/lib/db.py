@@ -4,11 +4,17 @@ Supabase Database Operations for Monthly Performance Analysis
 Handles:
 - Downloading files from Supabase Storage
 - Saving analysis results to database tables
+- A warm, process-wide client (get_client) reused across invocations
 """
 
+import hashlib
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, Iterable, List, Any, Optional
 from datetime import datetime
 import pandas as pd
 
@@ -19,6 +25,289 @@ except ImportError:
     Client = None
     create_client = None
 
+try:
+    import httpx
+    # Raised before a request reached the server, so nothing was written
+    UNSENT_ERRORS = (ConnectionRefusedError, httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+except ImportError:
+    UNSENT_ERRORS = (ConnectionRefusedError,)
+
+
+# Column specs for result tables: (column, kind, default)
+# kind: 'key' (required text), 'text' (nullable text), 'float', 'date' (YYYY-MM-DD)
+REVENUE_CENTER_COLUMNS = [
+    ('contract_code', 'key', None),
+    ('project_name', 'text', None),
+    ('proforma_section', 'text', None),
+    ('analysis_category', 'text', None),
+    ('allocation_tag', 'text', None),
+    ('revenue', 'float', 0.0),
+    ('hours', 'float', 0.0),
+    ('labor_cost', 'float', 0.0),
+    ('expense_cost', 'float', 0.0),
+    ('sga_allocation', 'float', 0.0),
+    ('data_allocation', 'float', 0.0),
+    ('workplace_allocation', 'float', 0.0),
+    ('margin_dollars', 'float', 0.0),
+    ('margin_percent', 'float', 0.0),
+]
+
+COST_CENTER_COLUMNS = [
+    ('contract_code', 'key', None),
+    ('description', 'text', None),
+    ('pool', 'text', 'SGA'),
+    ('hours', 'float', 0.0),
+    ('labor_cost', 'float', 0.0),
+    ('expense_cost', 'float', 0.0),
+    ('total_cost', 'float', 0.0),
+]
+
+NON_REVENUE_CLIENT_COLUMNS = [
+    ('contract_code', 'key', None),
+    ('project_name', 'text', None),
+    ('hours', 'float', 0.0),
+    ('labor_cost', 'float', 0.0),
+    ('expense_cost', 'float', 0.0),
+    ('total_cost', 'float', 0.0),
+]
+
+HOURS_DETAIL_COLUMNS = [
+    ('contract_code', 'key', None),
+    ('staff_key', 'key', None),
+    ('hours', 'float', 0.0),
+    ('hourly_cost', 'float', 0.0),
+    ('labor_cost', 'float', 0.0),
+]
+
+EXPENSES_DETAIL_COLUMNS = [
+    ('contract_code', 'key', None),
+    ('expense_date', 'date', None),
+    ('amount', 'float', 0.0),
+    ('notes', 'text', None),
+]
+
+
+def _serialize_column(df: pd.DataFrame, name: str, kind: str, default: Any) -> List[Any]:
+    """Cast one column to JSON-ready Python values in a single vectorized pass."""
+    if name not in df.columns:
+        if kind == 'key':
+            raise KeyError(name)
+        return [default] * len(df)
+
+    series = df[name]
+    if kind == 'key':
+        return series.astype(str).tolist()
+    if kind == 'float':
+        values = pd.to_numeric(series, errors='coerce').astype('float64')
+        return values.fillna(default).tolist()
+    if kind == 'date':
+        dates = pd.to_datetime(series, errors='coerce')
+        text = dates.dt.strftime('%Y-%m-%d')
+        return text.astype(object).where(dates.notna(), None).tolist()
+
+    # Nullable text: NaN/None/'' become the default (NULL unless specified)
+    text = series.astype(str).astype(object)
+    missing = series.isna() | (text == '')
+    return text.where(~missing, default).tolist()
+
+
+def serialize_frame(
+    df: pd.DataFrame,
+    columns: List[tuple],
+    constants: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Convert a DataFrame into insert records column by column.
+
+    Each column is cast, null-filled and date-formatted once for the whole
+    frame, then the records are zipped together, instead of per-row
+    iterrows() lookups and casts.
+
+    Args:
+        df: Source frame
+        columns: Column specs (column, kind, default)
+        constants: Values repeated on every record (e.g. batch_id)
+
+    Returns:
+        List of JSON-serializable record dicts
+    """
+    if df.empty:
+        return []
+
+    constants = constants or {}
+    names = list(constants) + [name for name, _, _ in columns]
+    values = [[value] * len(df) for value in constants.values()]
+    values += [_serialize_column(df, name, kind, default) for name, kind, default in columns]
+    return [dict(zip(names, row)) for row in zip(*values)]
+
+
+def serialize_rows(df: pd.DataFrame, columns: List[tuple]) -> List[List[Any]]:
+    """
+    Convert a DataFrame into positional rows (same casts as serialize_frame).
+
+    Used for the compact mpa_persist_batch payload, where column names are
+    implied by position instead of repeated on every record.
+    """
+    if df.empty:
+        return []
+
+    values = [_serialize_column(df, name, kind, default) for name, kind, default in columns]
+    return [list(row) for row in zip(*values)]
+
+
+def summary_record(summary: Dict[str, Any], validation_results: List[Dict[str, str]]) -> Dict[str, Any]:
+    """mpa_analysis_batches summary columns for a completed batch."""
+    return {
+        'total_revenue': summary.get('total_revenue'),
+        'total_labor_cost': summary.get('total_labor_cost'),
+        'total_expense_cost': summary.get('total_expense_cost'),
+        'total_margin_dollars': summary.get('total_margin_dollars'),
+        'overall_margin_percent': summary.get('overall_margin_percent'),
+        'sga_pool': summary.get('sga_pool'),
+        'data_pool': summary.get('data_pool'),
+        'workplace_pool': summary.get('workplace_pool'),
+        'revenue_center_count': summary.get('revenue_center_count', 0),
+        'cost_center_count': summary.get('cost_center_count', 0),
+        'non_revenue_client_count': summary.get('non_revenue_client_count', 0),
+        'validation_passed': not any(v['type'] == 'fail' for v in validation_results),
+        'validation_errors': validation_results,
+    }
+
+
+def pools_record(pools: Dict[str, float], tagged_revenue: Dict[str, float]) -> Dict[str, float]:
+    """mpa_pools_detail columns (without batch_id)."""
+    return {
+        'sga_from_pnl': float(pools.get('sga_from_pnl', 0)),
+        'data_from_pnl': float(pools.get('data_from_pnl', 0)),
+        'workplace_from_pnl': float(pools.get('workplace_from_pnl', 0)),
+        'nil_excluded': float(pools.get('nil_excluded', 0)),
+        'sga_from_cc': float(pools.get('sga_from_cc', 0)),
+        'data_from_cc': float(pools.get('data_from_cc', 0)),
+        'total_revenue': float(tagged_revenue.get('total_revenue', 0)),
+        'data_tagged_revenue': float(tagged_revenue.get('data_tagged_revenue', 0)),
+        'wellness_tagged_revenue': float(tagged_revenue.get('wellness_tagged_revenue', 0)),
+    }
+
+
+# Detail tables written chunk by chunk under a memory budget (stream_rows)
+STREAMED_TABLE_COLUMNS = {
+    'mpa_hours_detail': HOURS_DETAIL_COLUMNS,
+    'mpa_expenses_detail': EXPENSES_DETAIL_COLUMNS,
+}
+
+# Natural key of each result table for diff-based re-persistence.
+# Expenses have no natural key, so a line item is identified by its content.
+TABLE_KEYS = {
+    'mpa_revenue_centers': ('contract_code',),
+    'mpa_cost_centers': ('contract_code',),
+    'mpa_non_revenue_clients': ('contract_code',),
+    'mpa_hours_detail': ('contract_code', 'staff_key'),
+    'mpa_expenses_detail': ('contract_code', 'row_hash'),
+}
+
+# Result tables of a full run that a summary-mode run leaves empty
+SUMMARY_CLEARED_TABLES = (
+    'mpa_cost_centers',
+    'mpa_non_revenue_clients',
+    'mpa_hours_detail',
+    'mpa_expenses_detail',
+    'mpa_pools_detail',
+)
+
+
+def row_hash(record: Dict[str, Any]) -> str:
+    """Content hash of a serialized record (batch_id, id and row_hash excluded)."""
+    values = [value for name, value in record.items() if name not in ('batch_id', 'id', 'row_hash')]
+    return hashlib.md5(json.dumps(values, separators=(',', ':'), default=str).encode()).hexdigest()
+
+
+def add_row_hashes(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Set 'row_hash' on each record in place."""
+    for record in records:
+        record['row_hash'] = row_hash(record)
+    return records
+
+
+def _keyed(rows: List[Dict[str, Any]], key_columns: tuple) -> Dict[tuple, Dict[str, Any]]:
+    """Index rows by key columns plus occurrence number (for repeated keys)."""
+    seen: Dict[tuple, int] = {}
+    keyed = {}
+    for row in rows:
+        key = tuple(row.get(c) for c in key_columns)
+        occurrence = seen.get(key, 0)
+        seen[key] = occurrence + 1
+        keyed[key + (occurrence,)] = row
+    return keyed
+
+
+def diff_rows(
+    records: List[Dict[str, Any]],
+    stored: List[Dict[str, Any]],
+    key_columns: tuple,
+) -> tuple:
+    """
+    Compare new records (with row_hash) against stored rows.
+
+    Returns:
+        (records to insert, records to upsert with their stored id, ids to delete)
+    """
+    current = _keyed(stored, key_columns)
+    inserts, updates = [], []
+    for key, record in _keyed(records, key_columns).items():
+        existing = current.pop(key, None)
+        if existing is None:
+            inserts.append(record)
+        elif existing.get('row_hash') != record['row_hash']:
+            updates.append({'id': existing['id'], **record})
+    return inserts, updates, [row['id'] for row in current.values()]
+
+
+def _postgrest_literal(value: Any) -> str:
+    """Quote a value for a PostgREST or=() filter."""
+    text = str(value)
+    if any(c in text for c in ',.:()"\\ '):
+        return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+    return text
+
+
+class AdaptiveChunkSizer:
+    """
+    Picks insert chunk sizes for one table from payload size and latency.
+
+    Starts at initial_rows, caps each chunk at target_bytes (estimated from
+    a sample of serialized rows) and grows or shrinks towards
+    target_seconds per request as chunk timings come in.
+    """
+
+    def __init__(
+        self,
+        records: List[Dict[str, Any]],
+        target_bytes: int = 512_000,
+        target_seconds: float = 1.5,
+        initial_rows: int = 500,
+        min_rows: int = 50,
+        max_rows: int = 5000,
+    ):
+        sample = records[:50]
+        bytes_per_row = len(json.dumps(sample, default=str)) / max(1, len(sample))
+        self.max_rows = max(min_rows, min(max_rows, int(target_bytes / max(1.0, bytes_per_row))))
+        self.min_rows = min_rows
+        self.target_seconds = target_seconds
+        self.rows = max(min_rows, min(initial_rows, self.max_rows))
+        self._lock = threading.Lock()
+
+    def next_size(self) -> int:
+        with self._lock:
+            return self.rows
+
+    def observe(self, rows: int, seconds: float):
+        """Scale the chunk size by target/observed latency (at most 2x per step)."""
+        if rows <= 0 or seconds <= 0:
+            return
+        factor = max(0.5, min(2.0, self.target_seconds / seconds))
+        with self._lock:
+            self.rows = max(self.min_rows, min(self.max_rows, int(rows * factor)))
+
 
 class SupabaseClient:
     """
@@ -27,6 +316,9 @@ class SupabaseClient:
     Handles file downloads from storage and database operations.
     """
 
+    # Queued batches rely on the mpa_claim_batch/mpa_heartbeat_batch functions
+    supports_queue = True
+
     def __init__(self):
         self.url = os.environ.get('NEXT_PUBLIC_SUPABASE_URL')
         self.key = os.environ.get('SUPABASE_SERVICE_ROLE_KEY')
@@ -40,8 +332,21 @@ class SupabaseClient:
         if create_client is None:
             raise ImportError("supabase package not installed. Run: pip install supabase")
 
+        started = time.perf_counter()
         self.client: Client = create_client(self.url, self.key)
+        self.connect_ms = round((time.perf_counter() - started) * 1000, 2)
         self.bucket = 'uploads'
+        self.write_concurrency = int(os.environ.get('MPA_WRITE_CONCURRENCY', '4'))
+        self.write_retries = 3
+        self.write_backoff_seconds = 0.5
+
+    def ping(self) -> bool:
+        """Cheap round trip to check the connection is usable."""
+        try:
+            self.select_rows('mpa_analysis_batches', 'id', limit=1)
+            return True
+        except Exception:
+            return False
 
     def download_file(self, path: str) -> BytesIO:
         """
@@ -56,6 +361,180 @@ class SupabaseClient:
         response = self.client.storage.from_(self.bucket).download(path)
         return BytesIO(response)
 
+    def upload_file(self, path: str, content: bytes, content_type: str = 'application/octet-stream'):
+        """
+        Upload (or overwrite) a file in Supabase Storage.
+
+        Args:
+            path: File path in storage
+            content: Raw file bytes
+            content_type: MIME type stored with the object
+        """
+        self.client.storage.from_(self.bucket).upload(
+            path,
+            content,
+            {'content-type': content_type, 'upsert': 'true'},
+        )
+
+    def list_files(self, folder: str) -> List[str]:
+        """List file names directly inside a storage folder."""
+        items = self.client.storage.from_(self.bucket).list(folder)
+        return [item['name'] for item in items or [] if item.get('name')]
+
+    def remove_files(self, paths: List[str]):
+        """Delete files from storage (missing paths are ignored)."""
+        if paths:
+            self.client.storage.from_(self.bucket).remove(paths)
+
+    def file_fingerprint(self, path: str) -> str:
+        """
+        Identify the current contents of a stored file without downloading it.
+
+        Uses the storage object's eTag, size and update time. Falls back to a
+        SHA-256 of the contents if the object metadata is unavailable.
+
+        Args:
+            path: File path in storage
+
+        Returns:
+            Opaque fingerprint string that changes when the file is replaced
+        """
+        folder, _, name = path.rpartition('/')
+        try:
+            items = self.client.storage.from_(self.bucket).list(folder, {'search': name})
+        except Exception:
+            items = []
+        for item in items or []:
+            if item.get('name') == name:
+                meta = item.get('metadata') or {}
+                if meta.get('eTag'):
+                    return f"{meta['eTag']}:{meta.get('size')}:{item.get('updated_at')}"
+
+        content = self.download_file(path)
+        return hashlib.sha256(content.getvalue()).hexdigest()
+
+    def file_content_hash(self, path: str) -> str:
+        """
+        Identify a stored file by its contents, so identical uploads match
+        across batches (unlike file_fingerprint, which changes on re-upload).
+
+        Uses the storage object's eTag (an MD5 of the contents) and size,
+        falling back to a SHA-256 of the contents.
+        """
+        folder, _, name = path.rpartition('/')
+        try:
+            items = self.client.storage.from_(self.bucket).list(folder, {'search': name})
+        except Exception:
+            items = []
+        for item in items or []:
+            if item.get('name') == name:
+                meta = item.get('metadata') or {}
+                if meta.get('eTag'):
+                    return f"etag:{meta['eTag']}:{meta.get('size')}"
+
+        content = self.download_file(path)
+        return hashlib.sha256(content.getvalue()).hexdigest()
+
+    # ============================================
+    # Table primitives
+    # Every database call goes through these, so another backend
+    # (see local_backend.LocalClient) only has to override them.
+    # Filter values that are lists match with IN, others with equality.
+    # ============================================
+
+    @staticmethod
+    def _filtered(query, filters: Optional[Dict[str, Any]]):
+        for column, value in (filters or {}).items():
+            query = query.in_(column, list(value)) if isinstance(value, (list, tuple, set)) else query.eq(column, value)
+        return query
+
+    def select_rows(
+        self,
+        table: str,
+        columns: str = '*',
+        filters: Optional[Dict[str, Any]] = None,
+        order: Optional[str] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Select rows matching filters, optionally ordered and paged."""
+        query = self._filtered(self.client.table(table).select(columns), filters)
+        if order:
+            query = query.order(order)
+        if limit is not None:
+            query = query.range(offset, offset + limit - 1)
+        return query.execute().data or []
+
+    def select_page(
+        self,
+        table: str,
+        columns: str,
+        filters: Optional[Dict[str, Any]],
+        sort: str,
+        descending: bool = False,
+        after: Optional[tuple] = None,
+        limit: int = 100,
+    ) -> List[Dict[str, Any]]:
+        """
+        One keyset page ordered by (sort, id).
+
+        Args:
+            after: (sort value, id) of the last row of the previous page
+        """
+        query = self._filtered(self.client.table(table).select(columns), filters)
+        if after is not None:
+            value, last_id = (_postgrest_literal(v) for v in after)
+            op = 'lt' if descending else 'gt'
+            if sort == 'id':
+                query = query.filter('id', op, last_id)
+            else:
+                query = query.or_(f"{sort}.{op}.{value},and({sort}.eq.{value},id.gt.{last_id})")
+        query = query.order(sort, desc=descending)
+        if sort != 'id':
+            query = query.order('id')
+        return query.limit(limit).execute().data or []
+
+    def insert_rows(self, table: str, records: List[Dict[str, Any]]):
+        """Insert records."""
+        self.client.table(table).insert(records).execute()
+
+    def upsert_rows(self, table: str, records: List[Dict[str, Any]]):
+        """Insert records, updating rows whose id already exists."""
+        self.client.table(table).upsert(records).execute()
+
+    def update_rows(self, table: str, values: Dict[str, Any], filters: Dict[str, Any]):
+        """Set values on rows matching filters."""
+        self._filtered(self.client.table(table).update(values), filters).execute()
+
+    def delete_rows(self, table: str, filters: Dict[str, Any]):
+        """Delete rows matching filters."""
+        self._filtered(self.client.table(table).delete(), filters).execute()
+
+    def count_rows(self, table: str, batch_id: str) -> int:
+        """Number of rows stored for a batch in a result table."""
+        response = self.client.table(table).select('id', count='exact').eq('batch_id', batch_id).limit(1).execute()
+        return response.count or 0
+
+    def _copy_results(self, source_batch_id: str, target_batch_id: str) -> Dict[str, int]:
+        """Copy a completed batch's results to another batch in one transaction (mpa_copy_batch_results)."""
+        response = self.client.rpc('mpa_copy_batch_results', {
+            'p_source_batch_id': source_batch_id,
+            'p_target_batch_id': target_batch_id,
+        }).execute()
+        return response.data or {}
+
+    def _persist(self, batch_id: str, payload: Dict[str, Any]) -> Dict[str, int]:
+        """Apply a persist_batch payload in one transaction (mpa_persist_batch)."""
+        response = self.client.rpc('mpa_persist_batch', {
+            'p_batch_id': batch_id,
+            'p_payload': payload,
+        }).execute()
+        return response.data or {}
+
+    # ============================================
+    # Batch operations
+    # ============================================
+
     def update_batch_status(
         self,
         batch_id: str,
@@ -72,7 +551,7 @@ class SupabaseClient:
         if status == 'completed':
             data['processed_at'] = datetime.utcnow().isoformat()
 
-        self.client.table('mpa_analysis_batches').update(data).eq('id', batch_id).execute()
+        self.update_rows('mpa_analysis_batches', data, {'id': batch_id})
 
     def save_batch_summary(
         self,
@@ -88,162 +567,472 @@ class SupabaseClient:
             summary: Dictionary with summary metrics
             validation_results: List of validation items [{type, message}]
         """
-        validation_passed = not any(v['type'] == 'fail' for v in validation_results)
-
-        data = {
-            'total_revenue': summary.get('total_revenue'),
-            'total_labor_cost': summary.get('total_labor_cost'),
-            'total_expense_cost': summary.get('total_expense_cost'),
-            'total_margin_dollars': summary.get('total_margin_dollars'),
-            'overall_margin_percent': summary.get('overall_margin_percent'),
-            'sga_pool': summary.get('sga_pool'),
-            'data_pool': summary.get('data_pool'),
-            'workplace_pool': summary.get('workplace_pool'),
-            'revenue_center_count': summary.get('revenue_center_count', 0),
-            'cost_center_count': summary.get('cost_center_count', 0),
-            'non_revenue_client_count': summary.get('non_revenue_client_count', 0),
-            'validation_passed': validation_passed,
-            'validation_errors': validation_results,
+        data = summary_record(summary, validation_results)
+        data.update({
             'status': 'completed',
             'processed_at': datetime.utcnow().isoformat(),
             'updated_at': datetime.utcnow().isoformat(),
+        })
+
+        self.update_rows('mpa_analysis_batches', data, {'id': batch_id})
+
+    def save_validation_failure(
+        self,
+        batch_id: str,
+        validation_results: List[Dict[str, str]],
+        error_message: str,
+    ):
+        """
+        Mark a batch failed by validation, keeping the results for review.
+
+        Args:
+            batch_id: Batch UUID
+            validation_results: List of validation items [{type, message}]
+            error_message: Failure summary
+        """
+        self.update_rows('mpa_analysis_batches', {
+            'status': 'failed',
+            'error_message': error_message,
+            'validation_passed': False,
+            'validation_errors': validation_results,
+            'updated_at': datetime.utcnow().isoformat(),
+        }, {'id': batch_id})
+
+    def save_batch_metrics(self, batch_id: str, metrics: Dict[str, Any]):
+        """
+        Save per-stage performance metrics on the batch record.
+
+        Args:
+            batch_id: Batch UUID
+            metrics: Instrumentation.to_json() output
+        """
+        self.update_rows('mpa_analysis_batches', {'metrics': metrics}, {'id': batch_id})
+
+    def _write_chunk(self, table: str, method: str, chunk: List[Dict[str, Any]]):
+        """
+        Insert or upsert one chunk, retrying with exponential backoff.
+
+        Upserts (rows keyed by their stored id) are retried after any error.
+        Inserts are retried only if the request never reached the server
+        (UNSENT_ERRORS): after e.g. a read timeout the chunk may already be
+        committed, and inserting it again would duplicate its rows.
+        """
+        for attempt in range(self.write_retries + 1):
+            try:
+                if method == 'upsert':
+                    self.upsert_rows(table, chunk)
+                else:
+                    self.insert_rows(table, chunk)
+                return
+            except Exception as e:
+                if attempt == self.write_retries or (method != 'upsert' and not isinstance(e, UNSENT_ERRORS)):
+                    raise
+                time.sleep(self.write_backoff_seconds * (2 ** attempt))
+
+    def _write_chunks(self, jobs: Dict[tuple, List[Dict[str, Any]]]):
+        """
+        Drain (table, method) record lists through a bounded thread pool.
+
+        Jobs are taken round-robin so small tables are not starved by detail
+        rows; each job's chunk size adapts to its payload and latency.
+        """
+        jobs = {job: records for job, records in jobs.items() if records}
+        if not jobs:
+            return
+
+        sizers = {job: AdaptiveChunkSizer(records) for job, records in jobs.items()}
+        cursors = {job: 0 for job in jobs}
+        lock = threading.Lock()
+
+        def next_chunk():
+            with lock:
+                for job in list(cursors):
+                    start = cursors[job]
+                    records = jobs[job]
+                    if start >= len(records):
+                        del cursors[job]
+                        continue
+                    # Re-inserting moves this job to the back of the rotation
+                    del cursors[job]
+                    cursors[job] = start + sizers[job].next_size()
+                    return job, records[start:cursors[job]]
+                return None
+
+        def drain():
+            while True:
+                item = next_chunk()
+                if item is None:
+                    return
+                (table, method), chunk = item
+                started = time.perf_counter()
+                self._write_chunk(table, method, chunk)
+                sizers[(table, method)].observe(len(chunk), time.perf_counter() - started)
+
+        workers = max(1, self.write_concurrency)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='mpa-write') as pool:
+            for future in [pool.submit(drain) for _ in range(workers)]:
+                future.result()
+
+    def _confirm_counts(self, batch_id: str, expected: Dict[str, int]):
+        """Raise RuntimeError unless each table stores the expected rows for the batch."""
+        with ThreadPoolExecutor(max_workers=max(1, self.write_concurrency)) as pool:
+            stored = dict(zip(expected, pool.map(lambda t: self.count_rows(t, batch_id), expected)))
+        mismatched = {table: (stored[table], want) for table, want in expected.items() if stored[table] != want}
+        if mismatched:
+            details = ', '.join(f"{t}: {got} stored of {want}" for t, (got, want) in mismatched.items())
+            raise RuntimeError(f"Row count mismatch after bulk write ({details})")
+
+    def fetch_row_hashes(self, table: str, batch_id: str) -> List[Dict[str, Any]]:
+        """Stored id, key columns and row_hash of a batch's rows (in id order)."""
+        columns = ','.join(('id',) + tuple(c for c in TABLE_KEYS[table] if c != 'row_hash') + ('row_hash',))
+        rows: List[Dict[str, Any]] = []
+        page = 1000
+        while True:
+            data = self.select_rows(table, columns, {'batch_id': batch_id}, order='id', offset=len(rows), limit=page)
+            rows.extend(data)
+            if len(data) < page:
+                return rows
+
+    def sync_tables(self, batch_id: str, tables: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Dict[str, int]]:
+        """
+        Make a batch's stored rows match the given records, writing only changes.
+
+        Existing rows are matched to new records by TABLE_KEYS (plus an
+        occurrence index for repeated keys) and compared by row_hash:
+        new keys are inserted, changed rows are upserted by id and rows no
+        longer present are deleted. A first run is all inserts; reprocessing
+        a corrected month touches only the rows that changed.
+
+        Args:
+            batch_id: Batch UUID the records belong to
+            tables: Records keyed by table name (batch_id included)
+
+        Returns:
+            Per table: {'inserted', 'updated', 'deleted', 'unchanged'}
+
+        Raises:
+            RuntimeError: If a table's stored row count does not match afterwards
+        """
+        for records in tables.values():
+            add_row_hashes(records)
+
+        with ThreadPoolExecutor(max_workers=max(1, self.write_concurrency)) as pool:
+            stored = dict(zip(tables, pool.map(lambda t: self.fetch_row_hashes(t, batch_id), tables)))
+
+        jobs: Dict[tuple, List[Dict[str, Any]]] = {}
+        deletes: Dict[str, List[str]] = {}
+        stats: Dict[str, Dict[str, int]] = {}
+        for table, records in tables.items():
+            inserts, updates, stale = diff_rows(records, stored[table], TABLE_KEYS[table])
+            jobs[(table, 'insert')] = inserts
+            jobs[(table, 'upsert')] = updates
+            deletes[table] = stale
+            stats[table] = {
+                'inserted': len(inserts),
+                'updated': len(updates),
+                'deleted': len(stale),
+                'unchanged': len(records) - len(inserts) - len(updates),
+            }
+
+        for table, ids in deletes.items():
+            for i in range(0, len(ids), 200):
+                self.delete_rows(table, {'id': ids[i:i + 200]})
+        self._write_chunks(jobs)
+
+        self._confirm_counts(batch_id, {table: len(records) for table, records in tables.items()})
+        return stats
+
+    def save_results(
+        self,
+        batch_id: str,
+        revenue_centers: pd.DataFrame,
+        cost_centers: pd.DataFrame,
+        non_revenue_clients: pd.DataFrame,
+        hours_detail: Optional[pd.DataFrame] = None,
+        expenses_detail: Optional[pd.DataFrame] = None,
+    ) -> Dict[str, Dict[str, int]]:
+        """
+        Save all per-code result tables, writing only rows that changed.
+
+        A detail frame of None leaves that table untouched (see stream_rows).
+        """
+        constants = {'batch_id': batch_id}
+        tables = {
+            'mpa_revenue_centers': serialize_frame(revenue_centers, REVENUE_CENTER_COLUMNS, constants),
+            'mpa_cost_centers': serialize_frame(cost_centers, COST_CENTER_COLUMNS, constants),
+            'mpa_non_revenue_clients': serialize_frame(non_revenue_clients, NON_REVENUE_CLIENT_COLUMNS, constants),
         }
+        if hours_detail is not None:
+            tables['mpa_hours_detail'] = serialize_frame(hours_detail, HOURS_DETAIL_COLUMNS, constants)
+        if expenses_detail is not None:
+            tables['mpa_expenses_detail'] = serialize_frame(expenses_detail, EXPENSES_DETAIL_COLUMNS, constants)
+        return self.sync_tables(batch_id, tables)
+
+    def stream_rows(self, batch_id: str, table: str, chunks: Iterable[pd.DataFrame]) -> int:
+        """
+        Replace a batch's detail rows one frame chunk at a time.
+
+        Unlike sync_tables this does not diff against the stored rows: the
+        batch's rows are deleted, then each chunk is serialized and inserted
+        before the next is read, so only one chunk of records is in memory.
+
+        Args:
+            batch_id: Batch UUID
+            table: 'mpa_hours_detail' or 'mpa_expenses_detail'
+            chunks: Frames of detail rows (e.g. spill.iter_frame_chunks)
+
+        Returns:
+            Rows written
+
+        Raises:
+            RuntimeError: If the stored row count does not match afterwards
+        """
+        columns = STREAMED_TABLE_COLUMNS[table]
+        self.delete_rows(table, {'batch_id': batch_id})
+        written = 0
+        for chunk in chunks:
+            records = add_row_hashes(serialize_frame(chunk, columns, {'batch_id': batch_id}))
+            self._write_chunks({(table, 'insert'): records})
+            written += len(records)
+        self._confirm_counts(batch_id, {table: written})
+        return written
+
+    def save_summary_results(self, batch_id: str, revenue_centers: pd.DataFrame) -> Dict[str, int]:
+        """
+        Save only the revenue centers of a summary-mode run (result_mode = 'summary').
 
-        self.client.table('mpa_analysis_batches').update(data).eq('id', batch_id).execute()
+        Returns:
+            Write stats for mpa_revenue_centers (inserted/updated/deleted/unchanged)
+        """
+        records = serialize_frame(revenue_centers, REVENUE_CENTER_COLUMNS, {'batch_id': batch_id})
+        return self.sync_tables(batch_id, {'mpa_revenue_centers': records})['mpa_revenue_centers']
+
+    def clear_full_results(self, batch_id: str):
+        """Delete the rows a summary-mode run does not write, so none outlive their inputs."""
+        for table in SUMMARY_CLEARED_TABLES:
+            self.delete_rows(table, {'batch_id': batch_id})
+
+    def persist_batch(
+        self,
+        batch_id: str,
+        revenue_centers: pd.DataFrame,
+        cost_centers: pd.DataFrame,
+        non_revenue_clients: pd.DataFrame,
+        hours_detail: pd.DataFrame,
+        expenses_detail: pd.DataFrame,
+        pools: Dict[str, float],
+        tagged_revenue: Dict[str, float],
+        summary: Dict[str, Any],
+        validation_results: List[Dict[str, str]],
+    ) -> Dict[str, int]:
+        """
+        Persist a complete result set in one round trip and one transaction.
+
+        Sends every table as positional rows to mpa_persist_batch
+        (008_mpa_persist_batch.sql), which replaces the batch's result rows,
+        writes the pools detail and completes the batch atomically.
+
+        Returns:
+            Rows written per table
+        """
+        payload = {
+            'revenue_centers': serialize_rows(revenue_centers, REVENUE_CENTER_COLUMNS),
+            'cost_centers': serialize_rows(cost_centers, COST_CENTER_COLUMNS),
+            'non_revenue_clients': serialize_rows(non_revenue_clients, NON_REVENUE_CLIENT_COLUMNS),
+            'hours_detail': serialize_rows(hours_detail, HOURS_DETAIL_COLUMNS),
+            'expenses_detail': serialize_rows(expenses_detail, EXPENSES_DETAIL_COLUMNS),
+            'pools_detail': pools_record(pools, tagged_revenue),
+            'batch': summary_record(summary, validation_results),
+        }
+        return self._persist(batch_id, payload)
 
     def save_revenue_centers(self, batch_id: str, df: pd.DataFrame):
         """Save revenue centers to database."""
         if df.empty:
             return
 
-        records = []
-        for _, row in df.iterrows():
-            records.append({
-                'batch_id': batch_id,
-                'contract_code': str(row['contract_code']),
-                'project_name': str(row.get('project_name', '')) or None,
-                'proforma_section': str(row.get('proforma_section', '')) or None,
-                'analysis_category': str(row.get('analysis_category', '')) or None,
-                'allocation_tag': str(row.get('allocation_tag', '')) or None,
-                'revenue': float(row.get('revenue', 0)),
-                'hours': float(row.get('hours', 0)),
-                'labor_cost': float(row.get('labor_cost', 0)),
-                'expense_cost': float(row.get('expense_cost', 0)),
-                'sga_allocation': float(row.get('sga_allocation', 0)),
-                'data_allocation': float(row.get('data_allocation', 0)),
-                'workplace_allocation': float(row.get('workplace_allocation', 0)),
-                'margin_dollars': float(row.get('margin_dollars', 0)),
-                'margin_percent': float(row.get('margin_percent', 0)),
-            })
-
-        self.client.table('mpa_revenue_centers').insert(records).execute()
+        records = serialize_frame(df, REVENUE_CENTER_COLUMNS, {'batch_id': batch_id})
+        self.sync_tables(batch_id, {'mpa_revenue_centers': records})
 
     def save_cost_centers(self, batch_id: str, df: pd.DataFrame):
         """Save cost centers to database."""
         if df.empty:
             return
 
-        records = []
-        for _, row in df.iterrows():
-            records.append({
-                'batch_id': batch_id,
-                'contract_code': str(row['contract_code']),
-                'description': str(row.get('description', '')) or None,
-                'pool': str(row.get('pool', 'SGA')),
-                'hours': float(row.get('hours', 0)),
-                'labor_cost': float(row.get('labor_cost', 0)),
-                'expense_cost': float(row.get('expense_cost', 0)),
-                'total_cost': float(row.get('total_cost', 0)),
-            })
-
-        self.client.table('mpa_cost_centers').insert(records).execute()
+        records = serialize_frame(df, COST_CENTER_COLUMNS, {'batch_id': batch_id})
+        self.sync_tables(batch_id, {'mpa_cost_centers': records})
 
     def save_non_revenue_clients(self, batch_id: str, df: pd.DataFrame):
         """Save non-revenue clients to database."""
         if df.empty:
             return
 
-        records = []
-        for _, row in df.iterrows():
-            records.append({
-                'batch_id': batch_id,
-                'contract_code': str(row['contract_code']),
-                'project_name': str(row.get('project_name', '')) or None,
-                'hours': float(row.get('hours', 0)),
-                'labor_cost': float(row.get('labor_cost', 0)),
-                'expense_cost': float(row.get('expense_cost', 0)),
-                'total_cost': float(row.get('total_cost', 0)),
-            })
-
-        self.client.table('mpa_non_revenue_clients').insert(records).execute()
+        records = serialize_frame(df, NON_REVENUE_CLIENT_COLUMNS, {'batch_id': batch_id})
+        self.sync_tables(batch_id, {'mpa_non_revenue_clients': records})
 
     def save_hours_detail(self, batch_id: str, df: pd.DataFrame):
         """Save hours detail for drill-down."""
         if df.empty:
             return
 
-        records = []
-        for _, row in df.iterrows():
-            records.append({
-                'batch_id': batch_id,
-                'contract_code': str(row['contract_code']),
-                'staff_key': str(row['staff_key']),
-                'hours': float(row.get('hours', 0)),
-                'hourly_cost': float(row.get('hourly_cost', 0)),
-                'labor_cost': float(row.get('labor_cost', 0)),
-            })
-
-        # Insert in batches to avoid payload limits
-        batch_size = 500
-        for i in range(0, len(records), batch_size):
-            batch = records[i:i + batch_size]
-            self.client.table('mpa_hours_detail').insert(batch).execute()
+        records = serialize_frame(df, HOURS_DETAIL_COLUMNS, {'batch_id': batch_id})
+        self.sync_tables(batch_id, {'mpa_hours_detail': records})
 
     def save_expenses_detail(self, batch_id: str, df: pd.DataFrame):
         """Save expenses detail for drill-down."""
         if df.empty:
             return
 
-        records = []
-        for _, row in df.iterrows():
-            expense_date = None
-            if pd.notna(row.get('expense_date')):
-                expense_date = pd.to_datetime(row['expense_date']).strftime('%Y-%m-%d')
-
-            records.append({
-                'batch_id': batch_id,
-                'contract_code': str(row['contract_code']),
-                'expense_date': expense_date,
-                'amount': float(row.get('amount', 0)),
-                'notes': str(row.get('notes', '')) or None,
-            })
-
-        # Insert in batches
-        batch_size = 500
-        for i in range(0, len(records), batch_size):
-            batch = records[i:i + batch_size]
-            self.client.table('mpa_expenses_detail').insert(batch).execute()
+        records = serialize_frame(df, EXPENSES_DETAIL_COLUMNS, {'batch_id': batch_id})
+        self.sync_tables(batch_id, {'mpa_expenses_detail': records})
 
     def save_pools_detail(self, batch_id: str, pools: Dict[str, float], tagged_revenue: Dict[str, float]):
         """Save pools detail for audit trail."""
-        record = {
-            'batch_id': batch_id,
-            'sga_from_pnl': float(pools.get('sga_from_pnl', 0)),
-            'data_from_pnl': float(pools.get('data_from_pnl', 0)),
-            'workplace_from_pnl': float(pools.get('workplace_from_pnl', 0)),
-            'nil_excluded': float(pools.get('nil_excluded', 0)),
-            'sga_from_cc': float(pools.get('sga_from_cc', 0)),
-            'data_from_cc': float(pools.get('data_from_cc', 0)),
-            'total_revenue': float(tagged_revenue.get('total_revenue', 0)),
-            'data_tagged_revenue': float(tagged_revenue.get('data_tagged_revenue', 0)),
-            'wellness_tagged_revenue': float(tagged_revenue.get('wellness_tagged_revenue', 0)),
-        }
+        record = {'batch_id': batch_id, **pools_record(pools, tagged_revenue)}
+
+        # One row per batch: replace the previous run's row when reprocessing
+        self.delete_rows('mpa_pools_detail', {'batch_id': batch_id})
+        self.insert_rows('mpa_pools_detail', [record])
+
+    def save_rollups(self, batch_id: str, rollups: List[Dict[str, Any]]) -> int:
+        """
+        Refresh a batch's dashboard rollups (see rollups.compute_rollups).
+
+        Returns:
+            Number of rollup rows written
+        """
+        records = [{'batch_id': batch_id, **record} for record in rollups]
+
+        # Rollups are derived from the batch's results, so replace them wholesale
+        self.delete_rows('mpa_batch_rollups', {'batch_id': batch_id})
+        if records:
+            self.insert_rows('mpa_batch_rollups', records)
+        return len(records)
+
+    def find_completed_batch(
+        self,
+        input_fingerprint: str,
+        exclude_batch_id: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Most recently processed completed batch with the given input fingerprint.
+
+        Args:
+            input_fingerprint: See process.input_fingerprint
+            exclude_batch_id: Batch to ignore (usually the one being processed)
+        """
+        rows = self.select_rows('mpa_analysis_batches', '*', {
+            'input_fingerprint': input_fingerprint,
+            'status': 'completed',
+        })
+        rows = [row for row in rows if row['id'] != exclude_batch_id]
+        if not rows:
+            return None
+        return max(rows, key=lambda row: str(row.get('processed_at') or ''))
 
-        self.client.table('mpa_pools_detail').insert(record).execute()
+    def copy_batch_results(self, source_batch_id: str, target_batch_id: str) -> Dict[str, int]:
+        """
+        Replace a batch's results with a copy of a completed batch's and
+        complete it, atomically. Parquet detail files are not copied.
+
+        Returns:
+            Rows copied per table
+        """
+        return self._copy_results(source_batch_id, target_batch_id)
 
     def get_batch(self, batch_id: str) -> Optional[Dict[str, Any]]:
         """Get batch details by ID."""
-        response = self.client.table('mpa_analysis_batches').select('*').eq('id', batch_id).execute()
-        if response.data and len(response.data) > 0:
-            return response.data[0]
+        rows = self.select_rows('mpa_analysis_batches', '*', {'id': batch_id})
+        if rows:
+            return rows[0]
         return None
+
+
+# ============================================
+# Warm client cache
+# ============================================
+
+_client: Optional[SupabaseClient] = None
+_client_checked_at = 0.0
+_client_lock = threading.Lock()
+_client_metrics: Dict[str, Any] = {
+    'created': 0,
+    'reused': 0,
+    'reconnects': 0,
+    'health_checks': 0,
+    'health_failures': 0,
+    'last_connect_ms': None,
+    'total_connect_ms': 0.0,
+}
+
+
+def _health_interval() -> float:
+    return float(os.environ.get('MPA_CLIENT_HEALTH_SECONDS', '60'))
+
+
+def default_client() -> SupabaseClient:
+    """
+    Build the configured backend.
+
+    MPA_BACKEND=local uses the embedded SQLite + directory store
+    (local_backend.LocalClient, rooted at MPA_LOCAL_DIR); anything else
+    connects to Supabase.
+    """
+    if os.environ.get('MPA_BACKEND', '').strip().lower() == 'local':
+        try:
+            from .local_backend import LocalClient
+        except ImportError:
+            from local_backend import LocalClient
+        return LocalClient()
+    return SupabaseClient()
+
+
+def get_client(factory: Optional[Callable[[], SupabaseClient]] = None) -> SupabaseClient:
+    """
+    Return the process-wide client, creating it on first use.
+
+    Warm serverless instances and the worker reuse one client, so its
+    keep-alive HTTP connections (and TLS sessions) survive across requests.
+    A client idle for longer than MPA_CLIENT_HEALTH_SECONDS (default 60) is
+    pinged before reuse and replaced if the ping fails.
+
+    Args:
+        factory: Builds a new client (default_client() by default)
+    """
+    global _client, _client_checked_at
+
+    with _client_lock:
+        now = time.monotonic()
+        if _client is not None and now - _client_checked_at > _health_interval():
+            _client_metrics['health_checks'] += 1
+            if not _client.ping():
+                _client_metrics['health_failures'] += 1
+                _client_metrics['reconnects'] += 1
+                _client = None
+
+        if _client is None:
+            _client = (factory or default_client)()
+            connect_ms = getattr(_client, 'connect_ms', None)
+            _client_metrics['created'] += 1
+            _client_metrics['last_connect_ms'] = connect_ms
+            _client_metrics['total_connect_ms'] = round(_client_metrics['total_connect_ms'] + (connect_ms or 0), 2)
+        else:
+            _client_metrics['reused'] += 1
+
+        _client_checked_at = now
+        return _client
+
+
+def reset_client():
+    """Drop the cached client so the next get_client() reconnects."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client_metrics['reconnects'] += 1
+        _client = None
+
+
+def client_metrics() -> Dict[str, Any]:
+    """Connection setup counters for this process."""
+    with _client_lock:
+        return dict(_client_metrics)
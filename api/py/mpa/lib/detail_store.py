@@ -0,0 +1,190 @@
+"""
+Parquet Detail Store for Monthly Performance Analysis
+
+Optional home for the drill-down detail tables (hours by person, expense
+line items), which are the largest MPA write cost and table growth:
+- One zstd-compressed Parquet file per table per batch in storage:
+  mpa_detail/<batch_id>/<table>.parquet
+- Rows are sorted by contract_code and written in small row groups, so a
+  drill-down for one code reads only the row groups whose min/max
+  statistics can contain it (predicate pushdown)
+- Summary tables (revenue/cost centers, pools, batch) stay in Postgres
+
+Enabled with MPA_DETAIL_STORE=parquet; the batch's detail_store column
+records where its detail lives so readers know where to look.
+
+Only the Python query endpoint (api/py/mpa/query.py) reads these files so
+far. The dashboard's drill-down route (src/app/api/mpa/batches/[id]/detail/
+[type]/[code]/route.ts) still reads mpa_hours_detail and mpa_expenses_detail
+directly, so for Parquet batches it shows no hours or expense rows. Keep the
+default (postgres) where that UI is used.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    # Without pyarrow detail rows stay in Postgres
+    pa = None
+    pq = None
+    HAS_PYARROW = False
+
+try:
+    from .db import EXPENSES_DETAIL_COLUMNS, HOURS_DETAIL_COLUMNS
+except ImportError:
+    from db import EXPENSES_DETAIL_COLUMNS, HOURS_DETAIL_COLUMNS
+
+DETAIL_FOLDER = 'mpa_detail'
+
+# Detail table -> column specs (same specs as the Postgres serializer)
+DETAIL_TABLES = {
+    'mpa_hours_detail': HOURS_DETAIL_COLUMNS,
+    'mpa_expenses_detail': EXPENSES_DETAIL_COLUMNS,
+}
+
+ROW_GROUP_SIZE = 2048
+
+
+def detail_store_mode() -> str:
+    """'parquet' if MPA_DETAIL_STORE=parquet and pyarrow is available, else 'postgres'."""
+    mode = os.environ.get('MPA_DETAIL_STORE', 'postgres').strip().lower()
+    return 'parquet' if mode == 'parquet' and HAS_PYARROW else 'postgres'
+
+
+def detail_path(batch_id: str, table: str) -> str:
+    """Storage path of a batch's detail file."""
+    return f"{DETAIL_FOLDER}/{batch_id}/{table}.parquet"
+
+
+def _typed_frame(df: pd.DataFrame, columns: List[tuple]) -> pd.DataFrame:
+    """Project and cast a detail frame to its column specs."""
+    typed = {}
+    for name, kind, default in columns:
+        if name not in df.columns:
+            typed[name] = pd.Series([default] * len(df), index=df.index)
+            continue
+        series = df[name]
+        if kind == 'key':
+            typed[name] = series.astype(str)
+        elif kind == 'float':
+            typed[name] = pd.to_numeric(series, errors='coerce').astype('float64').fillna(default)
+        elif kind == 'date':
+            typed[name] = pd.to_datetime(series, errors='coerce').dt.date
+        else:
+            typed[name] = series.where(series.notna() & (series.astype(str) != ''), default)
+    return pd.DataFrame(typed)
+
+
+def encode_detail(df: pd.DataFrame, columns: List[tuple]) -> bytes:
+    """Encode a detail frame as Parquet sorted by contract_code."""
+    typed = _typed_frame(df, columns).sort_values('contract_code', kind='stable')
+    table = pa.Table.from_pandas(typed, preserve_index=False)
+    buffer = BytesIO()
+    pq.write_table(
+        table,
+        buffer,
+        compression='zstd',
+        row_group_size=ROW_GROUP_SIZE,
+        write_statistics=True,
+    )
+    return buffer.getvalue()
+
+
+class DetailStore:
+    """
+    Reads and writes batch detail tables as Parquet in storage.
+
+    Downloaded files are kept in a small in-process LRU (keyed by path and
+    storage fingerprint), so repeated drill-downs on a warm instance do not
+    re-download.
+
+    Args:
+        db: SupabaseClient (or LocalClient) providing the storage methods
+        cache_files: Number of downloaded files to keep in memory
+    """
+
+    _cache: 'OrderedDict[tuple, bytes]' = OrderedDict()
+    _cache_lock = threading.Lock()
+
+    def __init__(self, db, cache_files: int = 8):
+        if not HAS_PYARROW:
+            raise ImportError("pyarrow is required for the Parquet detail store")
+        self.db = db
+        self.cache_files = cache_files
+
+    def write(self, batch_id: str, table: str, df: pd.DataFrame) -> int:
+        """Write one detail table for a batch. Returns the row count."""
+        self.db.upload_file(detail_path(batch_id, table), encode_detail(df, DETAIL_TABLES[table]))
+        return len(df)
+
+    def write_batch(self, batch_id: str, hours_detail: pd.DataFrame, expenses_detail: pd.DataFrame) -> Dict[str, int]:
+        """Write both detail tables for a batch."""
+        return {
+            'mpa_hours_detail': self.write(batch_id, 'mpa_hours_detail', hours_detail),
+            'mpa_expenses_detail': self.write(batch_id, 'mpa_expenses_detail', expenses_detail),
+        }
+
+    def _file(self, batch_id: str, table: str) -> bytes:
+        path = detail_path(batch_id, table)
+        key = (path, self.db.file_fingerprint(path))
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        content = self.db.download_file(path).getvalue()
+        with self._cache_lock:
+            self._cache[key] = content
+            while len(self._cache) > self.cache_files:
+                self._cache.popitem(last=False)
+        return content
+
+    def query(
+        self,
+        batch_id: str,
+        table: str,
+        contract_codes: Optional[List[str]] = None,
+        columns: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        """
+        Read detail rows for a batch, optionally for some contract codes.
+
+        Args:
+            batch_id: Batch UUID
+            table: 'mpa_hours_detail' or 'mpa_expenses_detail'
+            contract_codes: Codes to keep (pushed down to row-group statistics)
+            columns: Columns to read (default: all)
+
+        Returns:
+            DataFrame of matching rows
+        """
+        if table not in DETAIL_TABLES:
+            raise ValueError(f"Unknown detail table: {table}")
+
+        filters = None
+        if contract_codes:
+            filters = [('contract_code', 'in', list(contract_codes))]
+
+        source = pa.BufferReader(self._file(batch_id, table))
+        return pq.read_table(source, columns=columns, filters=filters).to_pandas()
+
+    def to_records(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """JSON-ready records (dates as YYYY-MM-DD) for API responses."""
+        out = df.copy()
+        if 'expense_date' in out.columns:
+            dates = pd.to_datetime(out['expense_date'], errors='coerce')
+            out['expense_date'] = dates.dt.strftime('%Y-%m-%d').astype(object).where(dates.notna(), None)
+        return out.astype(object).where(out.notna(), None).to_dict('records')
+
+    def delete_batch(self, batch_id: str):
+        """Remove a batch's detail files."""
+        self.db.remove_files([detail_path(batch_id, table) for table in DETAIL_TABLES])
@@ -0,0 +1,233 @@
+"""
+Incremental Month-to-Date Runs for Monthly Performance Analysis
+
+Daily runs of an open month's batch that ingest only the Harvest rows that
+changed since the batch's last run (MPA_INCREMENTAL=on, or "incremental":
+true per request):
+- Every ingested hours and expense row is identified by a fingerprint of
+  its values (plus an occurrence number, so identical entries stay
+  distinct) and kept in the batch's ledger, stored with the running
+  aggregates as a checkpoint archive: mpa_incremental/<batch_id>/state.zip
+- An uploaded row is new if its date is after the last ingested date or
+  its fingerprint is not in the ledger. Ledger rows dated within the
+  upload's date range that it no longer contains (edited or deleted
+  entries) are retracted, so either the month-to-date export or just the
+  latest days can be uploaded
+- Running hours per (contract_code, staff_key) are updated from the new
+  and retracted rows only. Downstream stages read these aggregates, and
+  the expense ledger (the expense drill-down), instead of the Harvest
+  rows, so pricing, allocations and margins are recomputed per group
+
+The state is saved by the persist stage, after validation has passed, so a
+rejected upload leaves it untouched. Results equal a full run over the same
+rows up to floating-point summation order.
+"""
+
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    from .checkpoints import decode_output, encode_output
+    from .schema import apply_schema
+except ImportError:
+    from checkpoints import decode_output, encode_output
+    from schema import apply_schema
+
+INCREMENTAL_FOLDER = 'mpa_incremental'
+
+HOURS_KEYS = ['contract_code', 'staff_key']
+
+# Frames and counters stored in the state archive
+STATE_KEYS = ('hours_rows', 'hours', 'expense_rows', 'runs')
+
+
+def incremental_enabled() -> bool:
+    """True when MPA_INCREMENTAL is on."""
+    return os.environ.get('MPA_INCREMENTAL', '').strip().lower() in ('1', 'on', 'true')
+
+
+def state_path(batch_id: str) -> str:
+    """Storage path of a batch's month-to-date state."""
+    return f"{INCREMENTAL_FOLDER}/{batch_id}/state.zip"
+
+
+def empty_state() -> Dict[str, Any]:
+    """State of a batch that has not had an incremental run yet."""
+    return {'hours_rows': None, 'hours': None, 'expense_rows': None, 'runs': 0}
+
+
+def _normalized(series: pd.Series) -> pd.Series:
+    """Column values in a dtype-independent form (typed and untyped loads hash alike)."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype('float64')
+    return series.astype(object).fillna('').astype(str)
+
+
+def row_fingerprints(df: pd.DataFrame) -> pd.Series:
+    """
+    64-bit fingerprint of every row's values.
+
+    Repeats of an identical row get an occurrence number mixed in, so two
+    equal time entries are two ledger rows rather than one.
+    """
+    values = pd.DataFrame({column: _normalized(df[column]) for column in df.columns}, index=df.index)
+    base = pd.util.hash_pandas_object(values, index=False)
+    occurrence = base.groupby(base).cumcount()
+    return pd.util.hash_pandas_object(
+        pd.DataFrame({'row': base, 'occurrence': occurrence}), index=False,
+    )
+
+
+def merge_rows(
+    ledger: Optional[pd.DataFrame],
+    rows: pd.DataFrame,
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Merge an upload's rows into a ledger.
+
+    Args:
+        ledger: Previously ingested rows with a 'fingerprint' column (None if none)
+        rows: Loader output for the upload (with a 'date' column)
+
+    Returns:
+        Tuple of the new rows, the retracted ledger rows and the new ledger
+    """
+    rows = rows.assign(fingerprint=row_fingerprints(rows).to_numpy())
+    if ledger is None or ledger.empty:
+        return rows, rows.iloc[0:0], rows.reset_index(drop=True)
+
+    # Rows dated after everything ingested so far are new without a lookup
+    new = (rows['date'] > ledger['date'].max()).to_numpy()
+    earlier = ~new
+    new[earlier] = ~rows['fingerprint'][earlier].isin(ledger['fingerprint']).to_numpy()
+
+    # Ledger rows on dates the upload covers must still be in it
+    dates = rows['date'].dropna()
+    covered = np.zeros(len(ledger), dtype=bool)
+    if not dates.empty:
+        covered |= ledger['date'].between(dates.min(), dates.max()).to_numpy()
+    if rows['date'].isna().any():
+        covered |= ledger['date'].isna().to_numpy()
+    retracted = covered.copy()
+    retracted[covered] = ~ledger['fingerprint'][covered].isin(rows['fingerprint']).to_numpy()
+
+    added = rows[new]
+    kept = ledger[~retracted]
+    merged = pd.concat([f for f in (kept, added) if not f.empty] or [kept], ignore_index=True)
+    return added, ledger[retracted], merged
+
+
+def update_hours(
+    totals: Optional[pd.DataFrame],
+    added: pd.DataFrame,
+    retracted: pd.DataFrame,
+) -> pd.DataFrame:
+    """
+    Running hours per (contract_code, staff_key) after adding and retracting rows.
+
+    Groups keep the project name they were first seen with; groups whose
+    rows were all retracted are dropped.
+    """
+    names = [c for c in ('project_name',) if c in added.columns or c in retracted.columns]
+    changes = pd.concat([
+        added[HOURS_KEYS + names + ['hours']].assign(rows=1),
+        retracted[HOURS_KEYS + names + ['hours']].assign(hours=-retracted['hours'], rows=-1),
+    ], ignore_index=True)
+    if changes.empty:
+        return changes if totals is None else totals
+
+    frames = [f for f in (totals, changes) if f is not None and not f.empty]
+    aggregations = {'hours': ('hours', 'sum'), 'rows': ('rows', 'sum')}
+    aggregations.update({name: (name, 'first') for name in names})
+    combined = pd.concat(frames, ignore_index=True).groupby(HOURS_KEYS, as_index=False).agg(**aggregations)
+    return combined[combined['rows'] > 0].reset_index(drop=True)
+
+
+def ingest_upload(state: Dict[str, Any], hours_df: pd.DataFrame, expenses_df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    New month-to-date state after ingesting an upload.
+
+    Args:
+        state: Current state (IncrementalStore.load)
+        hours_df: Harvest hours loaded from the upload
+        expenses_df: Filtered expenses loaded from the upload
+
+    Returns:
+        The new state (STATE_KEYS) plus the counts of added and retracted rows
+    """
+    hours_added, hours_retracted, hours_rows = merge_rows(state['hours_rows'], hours_df)
+    expenses_added, expenses_retracted, expense_rows = merge_rows(state['expense_rows'], expenses_df)
+    return {
+        'hours_rows': hours_rows,
+        'hours': update_hours(state['hours'], hours_added, hours_retracted),
+        'expense_rows': expense_rows,
+        'runs': state['runs'] + 1,
+        'hours_added': len(hours_added),
+        'hours_retracted': len(hours_retracted),
+        'expenses_added': len(expenses_added),
+        'expenses_retracted': len(expenses_retracted),
+    }
+
+
+def ingest_logs(state: Dict[str, Any]) -> List[str]:
+    """Log lines describing an ingest."""
+    return [
+        f"Month-to-date run {state['runs']}: "
+        f"{state['hours_added']} new and {state['hours_retracted']} retracted hours rows, "
+        f"{state['expenses_added']} new and {state['expenses_retracted']} retracted expense rows",
+        f"Month to date: {len(state['hours_rows'])} hours rows in {len(state['hours'])} "
+        f"(contract_code, staff_key) groups, {len(state['expense_rows'])} expense rows",
+    ]
+
+
+def month_to_date_hours(state: Dict[str, Any], typed: bool = False) -> pd.DataFrame:
+    """Running hours per (contract_code, staff_key), shaped like HarvestHoursLoader output."""
+    hours = state['hours'].drop(columns='rows')
+    return apply_schema(hours, 'hours') if typed else hours
+
+
+def month_to_date_expenses(state: Dict[str, Any], typed: bool = False) -> pd.DataFrame:
+    """Every ingested expense row, shaped like HarvestExpensesLoader output."""
+    expenses = state['expense_rows'].drop(columns='fingerprint')
+    return apply_schema(expenses, 'expenses') if typed else expenses
+
+
+class IncrementalStore:
+    """
+    Month-to-date state of one batch in storage.
+
+    Args:
+        db: SupabaseClient (or LocalClient) providing the storage methods
+        batch_id: Batch UUID
+    """
+
+    def __init__(self, db, batch_id: str):
+        self.db = db
+        self.path = state_path(batch_id)
+
+    def fingerprint(self) -> Optional[str]:
+        """Storage fingerprint of the state (None before the first incremental run)."""
+        folder, _, name = self.path.rpartition('/')
+        try:
+            if name not in self.db.list_files(folder):
+                return None
+        except Exception:
+            return None
+        return self.db.file_fingerprint(self.path)
+
+    def load(self) -> Dict[str, Any]:
+        """The stored state, or empty_state() if there is none."""
+        if self.fingerprint() is None:
+            return empty_state()
+        state, _ = decode_output(self.db.download_file(self.path).getvalue())
+        return state
+
+    def save(self, state: Dict[str, Any]):
+        """Store a state returned by ingest_upload()."""
+        content = encode_output({key: state[key] for key in STATE_KEYS}, [])
+        self.db.upload_file(self.path, content, 'application/zip')
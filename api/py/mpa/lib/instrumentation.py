@@ -0,0 +1,172 @@
+"""
+Performance Instrumentation for Monthly Performance Analysis
+
+Records structured timings for each pipeline stage, loader and database call:
+- Wall time and CPU time (milliseconds)
+- Input and output row counts
+- Process max RSS after the block (always; cheap)
+- Peak traced memory above the starting point (tracemalloc, opt-in)
+
+Results are stored as JSON on mpa_analysis_batches.metrics and returned in
+the process response so performance can be trended across months.
+tracemalloc slows allocation-heavy Excel parsing several-fold, so it is
+only enabled with MPA_TRACE_MEMORY=on (e.g. for one slow batch).
+"""
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+
+def max_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process so far."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return int(rss if sys.platform == 'darwin' else rss * 1024)
+
+
+def count_rows(value: Any) -> Optional[int]:
+    """Row count of a DataFrame/list argument or result, else None."""
+    if hasattr(value, 'shape') and hasattr(value, 'columns'):
+        return int(len(value))
+    if isinstance(value, (list, tuple)):
+        return len(value)
+    return None
+
+
+class _Frame:
+    def __init__(self, start_current: int):
+        self.start_current = start_current
+        self.max_peak = start_current
+
+
+class Instrumentation:
+    """
+    Collects measurement records for one batch run.
+
+    Nested measurements are supported: an outer stage's peak includes the
+    peaks of the database calls made inside it.
+    """
+
+    def __init__(self, trace_memory: Optional[bool] = None):
+        if trace_memory is None:
+            trace_memory = os.environ.get('MPA_TRACE_MEMORY', '').lower() in ('1', 'on', 'true')
+        self.trace_memory = trace_memory
+        self.records: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started_tracing = False
+        self._wall_start = time.perf_counter()
+
+    def start(self):
+        """Begin tracing memory (no-op if disabled or already tracing)."""
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._wall_start = time.perf_counter()
+
+    def stop(self):
+        """Stop tracing memory if this instance started it."""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _stack(self) -> List[_Frame]:
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def measure(self, kind: str, name: str, rows_in: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Measure a block of work.
+
+        Yields the record dict so callers can set 'rows_out' (or other fields)
+        before the block exits.
+        """
+        record: Dict[str, Any] = {'kind': kind, 'name': name, 'rows_in': rows_in, 'rows_out': None}
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        stack = self._stack()
+
+        if tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1].max_peak = max(stack[-1].max_peak, peak)
+            tracemalloc.reset_peak()
+            stack.append(_Frame(current))
+
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield record
+        finally:
+            record['wall_ms'] = round((time.perf_counter() - wall_start) * 1000, 2)
+            record['cpu_ms'] = round((time.thread_time() - cpu_start) * 1000, 2)
+            record['max_rss_bytes'] = max_rss_bytes()
+            if tracing and stack:
+                frame = stack.pop()
+                peak = max(tracemalloc.get_traced_memory()[1], frame.max_peak)
+                record['peak_bytes'] = max(0, peak - frame.start_current)
+                if stack:
+                    stack[-1].max_peak = max(stack[-1].max_peak, peak)
+            with self._lock:
+                self.records.append(record)
+
+    def wrap(self, target: Any, kind: str = 'db') -> Any:
+        """Proxy whose method calls are measured (e.g. a SupabaseClient)."""
+        return _InstrumentedProxy(target, self, kind)
+
+    def to_json(self) -> Dict[str, Any]:
+        """JSON-serializable summary for storage on the batch record."""
+        with self._lock:
+            records = list(self.records)
+        totals: Dict[str, Dict[str, float]] = {}
+        for rec in records:
+            bucket = totals.setdefault(rec['kind'], {'count': 0, 'wall_ms': 0.0, 'cpu_ms': 0.0})
+            bucket['count'] += 1
+            bucket['wall_ms'] = round(bucket['wall_ms'] + rec['wall_ms'], 2)
+            bucket['cpu_ms'] = round(bucket['cpu_ms'] + rec['cpu_ms'], 2)
+        peaks = [rec['peak_bytes'] for rec in records if 'peak_bytes' in rec]
+        return {
+            'version': 1,
+            'wall_ms': round((time.perf_counter() - self._wall_start) * 1000, 2),
+            'peak_bytes': max(peaks) if peaks else None,
+            'max_rss_bytes': max_rss_bytes(),
+            'totals': totals,
+            'records': records,
+        }
+
+
+class _InstrumentedProxy:
+    """Forwards attribute access, measuring every method call."""
+
+    def __init__(self, target: Any, instrumentation: Instrumentation, kind: str):
+        self._target = target
+        self._instrumentation = instrumentation
+        self._kind = kind
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._target, name)
+        if not callable(attr) or name.startswith('_'):
+            return attr
+
+        def measured(*args, **kwargs):
+            rows_in = next((n for n in (count_rows(a) for a in args) if n is not None), None)
+            with self._instrumentation.measure(self._kind, name, rows_in=rows_in) as record:
+                result = attr(*args, **kwargs)
+                record['rows_out'] = count_rows(result)
+                return result
+
+        return measured
@@ -0,0 +1,208 @@
+"""
+Batch Job Queue for Monthly Performance Analysis
+
+Lets batches be processed by a background worker instead of inside the
+HTTP request:
+- POST /api/mpa/process with "async": true marks the batch 'queued'
+- Workers claim queued batches with a time-limited lease
+- A running job renews its lease with heartbeats
+- Transient failures are re-queued with exponential backoff
+- Batches whose lease expired (crashed worker) become claimable again
+
+Two implementations share the same interface:
+- SupabaseBatchQueue: mpa_analysis_batches + claim/heartbeat SQL functions
+- InMemoryBatchQueue: local stand-in for tests and offline runs
+"""
+
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+
+class BatchQueue:
+    """Interface for claiming and settling MPA batch jobs."""
+
+    def enqueue(self, batch_id: str):
+        """Mark a batch as queued for background processing."""
+        raise NotImplementedError
+
+    def claim(self, worker_id: str, lease_seconds: int) -> Optional[Dict[str, Any]]:
+        """Claim the oldest claimable batch, or return None if there is none."""
+        raise NotImplementedError
+
+    def heartbeat(self, batch_id: str, worker_id: str, lease_seconds: int) -> bool:
+        """Extend the lease. Returns False if the worker no longer holds it."""
+        raise NotImplementedError
+
+    def complete(self, batch_id: str, worker_id: str):
+        """Release the lease after a successful run."""
+        raise NotImplementedError
+
+    def fail(
+        self,
+        batch_id: str,
+        worker_id: str,
+        error_message: str,
+        retry_at: Optional[datetime] = None,
+    ):
+        """Release the lease; re-queue at retry_at, or mark failed if None."""
+        raise NotImplementedError
+
+
+class SupabaseBatchQueue(BatchQueue):
+    """
+    Queue backed by mpa_analysis_batches (see 006_mpa_job_queue.sql).
+
+    Args:
+        db: SupabaseClient, or a function returning one (e.g. get_client) that
+            is called per operation, so a long-lived worker follows reconnects
+    """
+
+    def __init__(self, db):
+        self._db = db
+
+    @property
+    def db(self):
+        return self._db() if callable(self._db) else self._db
+
+    def enqueue(self, batch_id: str):
+        self.db.update_rows('mpa_analysis_batches', {
+            'status': 'queued',
+            'error_message': None,
+            'attempts': 0,
+            'next_attempt_at': None,
+            'updated_at': datetime.utcnow().isoformat(),
+        }, {'id': batch_id})
+
+    def claim(self, worker_id: str, lease_seconds: int) -> Optional[Dict[str, Any]]:
+        response = self.db.client.rpc('mpa_claim_batch', {
+            'p_worker_id': worker_id,
+            'p_lease_seconds': lease_seconds,
+        }).execute()
+        if response.data:
+            return response.data[0]
+        return None
+
+    def heartbeat(self, batch_id: str, worker_id: str, lease_seconds: int) -> bool:
+        response = self.db.client.rpc('mpa_heartbeat_batch', {
+            'p_batch_id': batch_id,
+            'p_worker_id': worker_id,
+            'p_lease_seconds': lease_seconds,
+        }).execute()
+        return bool(response.data)
+
+    def complete(self, batch_id: str, worker_id: str):
+        self.db.update_rows('mpa_analysis_batches', {
+            'lease_owner': None,
+            'lease_expires_at': None,
+            'updated_at': datetime.utcnow().isoformat(),
+        }, {'id': batch_id, 'lease_owner': worker_id})
+
+    def fail(
+        self,
+        batch_id: str,
+        worker_id: str,
+        error_message: str,
+        retry_at: Optional[datetime] = None,
+    ):
+        self.db.update_rows('mpa_analysis_batches', {
+            'status': 'queued' if retry_at else 'failed',
+            'error_message': error_message,
+            'next_attempt_at': retry_at.isoformat() if retry_at else None,
+            'lease_owner': None,
+            'lease_expires_at': None,
+            'updated_at': datetime.utcnow().isoformat(),
+        }, {'id': batch_id, 'lease_owner': worker_id})
+
+
+class InMemoryBatchQueue(BatchQueue):
+    """
+    Thread-safe in-process queue with the same semantics as the SQL functions.
+
+    Args:
+        batches: Batch records keyed by id (mutated in place)
+        clock: Function returning the current UTC datetime
+    """
+
+    def __init__(
+        self,
+        batches: Optional[Dict[str, Dict[str, Any]]] = None,
+        clock: Callable[[], datetime] = datetime.utcnow,
+    ):
+        self.batches = batches if batches is not None else {}
+        self.clock = clock
+        self._lock = threading.Lock()
+
+    def enqueue(self, batch_id: str):
+        with self._lock:
+            batch = self.batches[batch_id]
+            batch.update({
+                'status': 'queued',
+                'error_message': None,
+                'attempts': 0,
+                'next_attempt_at': None,
+            })
+
+    def _claimable(self, batch: Dict[str, Any], now: datetime) -> bool:
+        if batch.get('status') == 'queued':
+            retry_at = batch.get('next_attempt_at')
+            return retry_at is None or retry_at <= now
+        if batch.get('status') == 'processing' and batch.get('lease_owner'):
+            return batch['lease_expires_at'] <= now
+        return False
+
+    def claim(self, worker_id: str, lease_seconds: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            now = self.clock()
+            candidates: List[Dict[str, Any]] = [
+                b for b in self.batches.values() if self._claimable(b, now)
+            ]
+            if not candidates:
+                return None
+            batch = min(candidates, key=lambda b: str(b.get('created_at', '')))
+            batch.update({
+                'status': 'processing',
+                'lease_owner': worker_id,
+                'lease_expires_at': now + timedelta(seconds=lease_seconds),
+                'heartbeat_at': now,
+                'attempts': batch.get('attempts', 0) + 1,
+            })
+            return dict(batch)
+
+    def heartbeat(self, batch_id: str, worker_id: str, lease_seconds: int) -> bool:
+        with self._lock:
+            batch = self.batches.get(batch_id)
+            if not batch or batch.get('lease_owner') != worker_id:
+                return False
+            now = self.clock()
+            batch['heartbeat_at'] = now
+            batch['lease_expires_at'] = now + timedelta(seconds=lease_seconds)
+            return True
+
+    def complete(self, batch_id: str, worker_id: str):
+        with self._lock:
+            batch = self.batches.get(batch_id)
+            if batch and batch.get('lease_owner') == worker_id:
+                # The pipeline's save_batch_summary sets 'completed' in the database
+                batch['status'] = 'completed'
+                batch['lease_owner'] = None
+                batch['lease_expires_at'] = None
+
+    def fail(
+        self,
+        batch_id: str,
+        worker_id: str,
+        error_message: str,
+        retry_at: Optional[datetime] = None,
+    ):
+        with self._lock:
+            batch = self.batches.get(batch_id)
+            if not batch or batch.get('lease_owner') != worker_id:
+                return
+            batch.update({
+                'status': 'queued' if retry_at else 'failed',
+                'error_message': error_message,
+                'next_attempt_at': retry_at,
+                'lease_owner': None,
+                'lease_expires_at': None,
+            })
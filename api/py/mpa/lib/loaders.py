@@ -17,7 +17,12 @@ from io import BytesIO
 from pathlib import Path
 from datetime import datetime
 from calendar import monthrange
-from typing import Optional, Union, List, Dict, Any
+from typing import Optional, Union, List, Dict, Any, Iterator
+
+try:
+    from .schema import apply_schema
+except ImportError:
+    from schema import apply_schema
 
 
 def normalize_contract_code(code: str) -> str:
@@ -48,6 +53,121 @@ def get_config_path(filename: str) -> Path:
     return Path(__file__).parent.parent.parent / 'config' / filename
 
 
+# Sheet names and accepted column headers (matched case-insensitively), shared
+# by the loaders and the upload pre-flight check (sniff.py)
+PROFORMA_SHEET = 'PRO FORMA 2025'
+PNL_SHEET = 'IncomeStatement'
+
+COMPENSATION_COLUMNS = {
+    'last_name': ['Last Name', 'LastName'],
+    'base_cost': ['Base Cost Per Hour', 'Base Cost/Hour', 'Hourly Cost'],
+    'total': ['Total', 'Total Compensation', 'Monthly Total'],
+}
+
+# Strategy B components, all required when there is no total column
+COMPENSATION_COMPONENTS = {
+    'base': ['Base Compensation', 'Base', 'Base Comp'],
+    'taxes': ['Company Taxes Paid', 'Taxes', 'Company Taxes'],
+    'ichra': ['ICHRA Contribution', 'ICHRA'],
+    'k401': ['401k Match', '401k', '401K Match'],
+    'assistant': ['Executive Assistant', 'Assistant', 'Exec Assistant'],
+    'wellbeing': ['Well Being Card', 'Wellbeing', 'Well-being'],
+    'travel': ['Travel & Expenses', 'Travel', 'Travel and Expenses'],
+}
+
+# field -> (candidates, required)
+HOURS_COLUMNS = {
+    'date': (['Date', 'Spent Date', 'Work Date'], True),
+    'code': (['Project Code', 'Project', 'Code'], True),
+    'hours': (['Hours', 'Hours (h)', 'Hours (decimal)'], True),
+    'name': (['Last Name', 'LastName', 'Person'], True),
+    'project': (['Project', 'Project Name', 'Client', 'Client Name'], False),
+}
+
+EXPENSES_COLUMNS = {
+    'date': (['Date', 'Spent Date', 'Expense Date'], True),
+    'code': (['Project Code', 'Project', 'Code'], True),
+    'amount': (['Amount', 'Total Amount', 'Amount (USD)'], True),
+    'billable': (['Billable', 'Is Billable', 'Billable?'], True),
+    'notes': (['Notes', 'Description', 'Note', 'Memo'], False),
+}
+
+
+def find_column(df: pd.DataFrame, candidates: list, required: bool = False) -> Optional[str]:
+    """First column whose header matches a candidate (case-insensitive, trimmed)."""
+    for candidate in candidates:
+        for col in df.columns:
+            if str(col).strip().lower() == candidate.lower():
+                return col
+    if required:
+        raise ValueError(f"Required column not found. Tried: {candidates}")
+    return None
+
+
+def _excel_cell(value: Any) -> Any:
+    """Cell value as pd.read_excel returns it (integral floats as int, blanks as NaN)."""
+    if value is None or value == '':
+        return float('nan')
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def iter_sheet_chunks(
+    file_content: BytesIO,
+    chunk_rows: int,
+    columns: Optional[Dict[str, tuple]] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Read the first sheet of a workbook as frames of at most chunk_rows rows.
+
+    Rows are streamed from openpyxl's read-only reader, so only one chunk of
+    raw cell values is held at a time instead of the whole sheet (what
+    pd.read_excel builds before returning). The first row is the header;
+    fully blank rows are skipped.
+
+    Args:
+        file_content: Workbook bytes
+        chunk_rows: Rows per yielded frame
+        columns: Optional column spec (field -> (candidates, required)); only
+            the matching columns are kept, the others are never materialized
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(file_content, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        # Header names as pd.read_excel gives them (blank -> 'Unnamed: i', repeats -> 'name.1')
+        names: List[str] = []
+        for i, name in enumerate(header):
+            name = str(name) if name is not None else f"Unnamed: {i}"
+            base, repeat = name, 0
+            while name in names:
+                repeat += 1
+                name = f"{base}.{repeat}"
+            names.append(name)
+        positions = list(range(len(names)))
+        if columns is not None:
+            empty = pd.DataFrame(columns=names)
+            keep = {find_column(empty, candidates, required) for candidates, required in columns.values()}
+            positions = [i for i, name in enumerate(names) if name in keep]
+        selected = [names[i] for i in positions]
+
+        buffer: List[list] = []
+        for row in rows:
+            if all(value is None or value == '' for value in row):
+                continue
+            buffer.append([_excel_cell(row[i]) if i < len(row) else float('nan') for i in positions])
+            if len(buffer) >= chunk_rows:
+                yield pd.DataFrame(buffer, columns=selected)
+                buffer = []
+        if buffer or not selected:
+            yield pd.DataFrame(buffer, columns=selected)
+    finally:
+        workbook.close()
+
+
 class ProFormaLoader:
     """
     Load Pro Forma revenue file.
@@ -58,16 +178,19 @@ class ProFormaLoader:
     - Detect conflict if same code has both Data and Wellness tags
     - Dynamic month column detection
     - Section-based category headers (BEH/PAD/MAR/WWB/CMH)
+
+    With typed set the result uses the compact dtypes of schema.FRAME_SCHEMAS.
     """
 
-    def __init__(self, file_content: BytesIO, month: str):
+    def __init__(self, file_content: BytesIO, month: str, typed: bool = False):
         self.file_content = file_content
         self.month = month
+        self.typed = typed
         self.logs: List[str] = []
 
     def load(self) -> pd.DataFrame:
         """Load Pro Forma file."""
-        df = pd.read_excel(self.file_content, sheet_name='PRO FORMA 2025', header=None)
+        df = pd.read_excel(self.file_content, sheet_name=PROFORMA_SHEET, header=None)
 
         header_row_idx = self._find_header_row(df)
         header = df.iloc[header_row_idx]
@@ -129,8 +252,9 @@ class ProFormaLoader:
             f"{sum(aggregated['allocation_tag'] == '')} untagged"
         )
 
-        return aggregated[['contract_code', 'project_name', 'proforma_section',
-                           'analysis_category', 'allocation_tag', 'revenue']]
+        result = aggregated[['contract_code', 'project_name', 'proforma_section',
+                             'analysis_category', 'allocation_tag', 'revenue']]
+        return apply_schema(result, 'proforma') if self.typed else result
 
     def _find_header_row(self, df: pd.DataFrame) -> int:
         max_scan = min(10, len(df))
@@ -218,17 +342,20 @@ class CompensationLoader:
     - Strategy B (Fallback): Compute from Total or components
     - Expected hours per month: 216.67
     - Unique Last Name validation (FAIL if duplicates)
+
+    With typed set the result uses the compact dtypes of schema.FRAME_SCHEMAS.
     """
 
-    def __init__(self, file_content: BytesIO):
+    def __init__(self, file_content: BytesIO, typed: bool = False):
         self.file_content = file_content
         self.expected_hours_per_month = 216.6667
+        self.typed = typed
         self.logs: List[str] = []
 
     def load(self) -> pd.DataFrame:
         df = pd.read_excel(self.file_content)
 
-        base_cost_col = self._find_column(df, ['Base Cost Per Hour', 'Base Cost/Hour', 'Hourly Cost'])
+        base_cost_col = self._find_column(df, COMPENSATION_COLUMNS['base_cost'])
         if base_cost_col:
             self.logs.append(f"Strategy A: Read '{base_cost_col}' directly")
             result = self._load_strategy_a(df, base_cost_col)
@@ -245,10 +372,10 @@ class CompensationLoader:
             )
 
         self.logs.append(f"{len(result)} staff members, avg ${result['hourly_cost'].mean():.2f}/hr")
-        return result
+        return apply_schema(result, 'compensation') if self.typed else result
 
     def _load_strategy_a(self, df: pd.DataFrame, cost_col: str) -> pd.DataFrame:
-        last_name_col = self._find_column(df, ['Last Name', 'LastName'], required=True)
+        last_name_col = self._find_column(df, COMPENSATION_COLUMNS['last_name'], required=True)
         return pd.DataFrame({
             'staff_key': df[last_name_col].astype(str).str.strip(),
             'hourly_cost': pd.to_numeric(df[cost_col], errors='coerce'),
@@ -256,20 +383,15 @@ class CompensationLoader:
         })
 
     def _load_strategy_b(self, df: pd.DataFrame) -> pd.DataFrame:
-        last_name_col = self._find_column(df, ['Last Name', 'LastName'], required=True)
+        last_name_col = self._find_column(df, COMPENSATION_COLUMNS['last_name'], required=True)
 
-        total_col = self._find_column(df, ['Total', 'Total Compensation', 'Monthly Total'])
+        total_col = self._find_column(df, COMPENSATION_COLUMNS['total'])
         if total_col:
             monthly_cost = pd.to_numeric(df[total_col], errors='coerce')
         else:
             components = {
-                'base': self._find_column(df, ['Base Compensation', 'Base', 'Base Comp'], required=True),
-                'taxes': self._find_column(df, ['Company Taxes Paid', 'Taxes', 'Company Taxes'], required=True),
-                'ichra': self._find_column(df, ['ICHRA Contribution', 'ICHRA'], required=True),
-                'k401': self._find_column(df, ['401k Match', '401k', '401K Match'], required=True),
-                'assistant': self._find_column(df, ['Executive Assistant', 'Assistant', 'Exec Assistant'], required=True),
-                'wellbeing': self._find_column(df, ['Well Being Card', 'Wellbeing', 'Well-being'], required=True),
-                'travel': self._find_column(df, ['Travel & Expenses', 'Travel', 'Travel and Expenses'], required=True),
+                name: self._find_column(df, candidates, required=True)
+                for name, candidates in COMPENSATION_COMPONENTS.items()
             }
             monthly_cost = sum(pd.to_numeric(df[col], errors='coerce') for col in components.values())
 
@@ -281,31 +403,61 @@ class CompensationLoader:
         })
 
     def _find_column(self, df: pd.DataFrame, candidates: list, required: bool = False) -> Optional[str]:
-        for candidate in candidates:
-            for col in df.columns:
-                if str(col).strip().lower() == candidate.lower():
-                    return col
-        if required:
-            raise ValueError(f"Required column not found. Tried: {candidates}")
-        return None
+        return find_column(df, candidates, required)
 
 
 class HarvestHoursLoader:
-    """Load Harvest Hours time tracking file."""
+    """
+    Load Harvest Hours time tracking file.
 
-    def __init__(self, file_content: BytesIO, month: str):
+    With chunk_rows set the sheet is read and converted chunk by chunk
+    (iter_sheet_chunks) to bound memory on large months; the result is the same.
+    With typed set the result uses the compact dtypes of schema.FRAME_SCHEMAS.
+    """
+
+    def __init__(
+        self,
+        file_content: BytesIO,
+        month: str,
+        chunk_rows: Optional[int] = None,
+        typed: bool = False,
+    ):
         self.file_content = file_content
         self.month = month
+        self.chunk_rows = chunk_rows
+        self.typed = typed
         self.logs: List[str] = []
 
     def load(self) -> pd.DataFrame:
-        df = pd.read_excel(self.file_content)
+        month_start, month_end = self._get_month_range(self.month)
+        if self.chunk_rows:
+            chunks = iter_sheet_chunks(self.file_content, self.chunk_rows, HOURS_COLUMNS)
+        else:
+            chunks = [pd.read_excel(self.file_content)]
+
+        parts = []
+        outside = 0
+        for df in chunks:
+            result = self._convert(df)
+            outside_month = (result['date'] < month_start) | (result['date'] > month_end)
+            outside += int(outside_month.sum())
+            parts.append(result[~outside_month])
+        result = parts[0] if len(parts) == 1 else pd.concat(parts, ignore_index=True)
 
-        date_col = self._find_column(df, ['Date', 'Spent Date', 'Work Date'], required=True)
-        code_col = self._find_column(df, ['Project Code', 'Project', 'Code'], required=True)
-        hours_col = self._find_column(df, ['Hours', 'Hours (h)', 'Hours (decimal)'], required=True)
-        name_col = self._find_column(df, ['Last Name', 'LastName', 'Person'], required=True)
-        project_col = self._find_column(df, ['Project', 'Project Name', 'Client', 'Client Name'], required=False)
+        if outside > 0:
+            self.logs.append(f"{outside} Harvest Hours rows outside month range (excluded)")
+            result = result[result['date'].notna()]
+
+        self.logs.append(f"Harvest Hours: {len(result)} rows, {result['hours'].sum():.1f} total hours")
+        return apply_schema(result, 'hours') if self.typed else result
+
+    def _convert(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Raw sheet rows -> typed hours rows (all dates)."""
+        date_col = self._find_column(df, *HOURS_COLUMNS['date'])
+        code_col = self._find_column(df, *HOURS_COLUMNS['code'])
+        hours_col = self._find_column(df, *HOURS_COLUMNS['hours'])
+        name_col = self._find_column(df, *HOURS_COLUMNS['name'])
+        project_col = self._find_column(df, *HOURS_COLUMNS['project'])
 
         result = pd.DataFrame({
             'date': pd.to_datetime(df[date_col]),
@@ -316,24 +468,10 @@ class HarvestHoursLoader:
 
         if project_col:
             result['project_name'] = df[project_col].astype(str).str.strip()
-
-        month_start, month_end = self._get_month_range(self.month)
-        outside_month = result[(result['date'] < month_start) | (result['date'] > month_end)]
-        if len(outside_month) > 0:
-            self.logs.append(f"{len(outside_month)} Harvest Hours rows outside month range (excluded)")
-            result = result[(result['date'] >= month_start) & (result['date'] <= month_end)]
-
-        self.logs.append(f"Harvest Hours: {len(result)} rows, {result['hours'].sum():.1f} total hours")
         return result
 
     def _find_column(self, df: pd.DataFrame, candidates: list, required: bool = False) -> Optional[str]:
-        for candidate in candidates:
-            for col in df.columns:
-                if str(col).strip().lower() == candidate.lower():
-                    return col
-        if required:
-            raise ValueError(f"Required column not found. Tried: {candidates}")
-        return None
+        return find_column(df, candidates, required)
 
     def _get_month_range(self, month: str) -> tuple:
         m = re.match(r"([A-Za-z]+)(\d{4})", month)
@@ -365,20 +503,48 @@ class HarvestExpensesLoader:
     - Billable = Yes -> exclude (reimbursable)
     - Billable = No -> include (non-reimbursable)
     - Billable = blank -> warn + include (conservative)
+
+    With chunk_rows set the sheet is read and converted chunk by chunk
+    (iter_sheet_chunks) to bound memory on large months; the result is the same.
+    With typed set the result uses the compact dtypes of schema.FRAME_SCHEMAS.
     """
 
-    def __init__(self, file_content: BytesIO):
+    def __init__(self, file_content: BytesIO, chunk_rows: Optional[int] = None, typed: bool = False):
         self.file_content = file_content
+        self.chunk_rows = chunk_rows
+        self.typed = typed
         self.logs: List[str] = []
 
     def load(self) -> pd.DataFrame:
-        df = pd.read_excel(self.file_content)
+        if self.chunk_rows:
+            chunks = iter_sheet_chunks(self.file_content, self.chunk_rows, EXPENSES_COLUMNS)
+            base = pd.concat([self._convert(df) for df in chunks], ignore_index=True)
+        else:
+            base = self._convert(pd.read_excel(self.file_content))
+
+        reimbursable = base[base['billable_bool'] == True]
+        non_reimbursable = base[base['billable_bool'] == False]
+        unknown = base[base['billable_bool'].isna()]
 
-        date_col = self._find_column(df, ['Date', 'Spent Date', 'Expense Date'], required=True)
-        code_col = self._find_column(df, ['Project Code', 'Project', 'Code'], required=True)
-        amount_col = self._find_column(df, ['Amount', 'Total Amount', 'Amount (USD)'], required=True)
-        billable_col = self._find_column(df, ['Billable', 'Is Billable', 'Billable?'], required=True)
-        notes_col = self._find_column(df, ['Notes', 'Description', 'Note', 'Memo'], required=False)
+        if len(unknown) > 0:
+            self.logs.append(f"{len(unknown)} expenses have unknown Billable value (included as non-reimbursable)")
+
+        included = pd.concat([non_reimbursable, unknown], ignore_index=True)
+        excluded_count = len(reimbursable)
+        if excluded_count > 0:
+            self.logs.append(f"Excluded {excluded_count} reimbursable expenses (Billable=Yes)")
+
+        out = included[['date', 'contract_code', 'amount', 'notes']].copy()
+        out['was_reimbursable'] = False
+        return apply_schema(out, 'expenses') if self.typed else out
+
+    def _convert(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Raw sheet rows -> typed expense rows with the parsed Billable flag."""
+        date_col = self._find_column(df, *EXPENSES_COLUMNS['date'])
+        code_col = self._find_column(df, *EXPENSES_COLUMNS['code'])
+        amount_col = self._find_column(df, *EXPENSES_COLUMNS['amount'])
+        billable_col = self._find_column(df, *EXPENSES_COLUMNS['billable'])
+        notes_col = self._find_column(df, *EXPENSES_COLUMNS['notes'])
 
         base = pd.DataFrame({
             'date': pd.to_datetime(df[date_col]),
@@ -403,31 +569,10 @@ class HarvestExpensesLoader:
             return None
 
         base['billable_bool'] = base['billable'].apply(parse_billable)
-
-        reimbursable = base[base['billable_bool'] == True]
-        non_reimbursable = base[base['billable_bool'] == False]
-        unknown = base[base['billable_bool'].isna()]
-
-        if len(unknown) > 0:
-            self.logs.append(f"{len(unknown)} expenses have unknown Billable value (included as non-reimbursable)")
-
-        included = pd.concat([non_reimbursable, unknown], ignore_index=True)
-        excluded_count = len(reimbursable)
-        if excluded_count > 0:
-            self.logs.append(f"Excluded {excluded_count} reimbursable expenses (Billable=Yes)")
-
-        out = included[['date', 'contract_code', 'amount', 'notes']].copy()
-        out['was_reimbursable'] = False
-        return out
+        return base
 
     def _find_column(self, df: pd.DataFrame, candidates: list, required: bool = False) -> Optional[str]:
-        for candidate in candidates:
-            for col in df.columns:
-                if str(col).strip().lower() == candidate.lower():
-                    return col
-        if required:
-            raise ValueError(f"Required column not found. Tried: {candidates}")
-        return None
+        return find_column(df, candidates, required)
 
 
 class PnLLoader:
@@ -446,7 +591,7 @@ class PnLLoader:
         self.logs: List[str] = []
 
     def load(self) -> pd.DataFrame:
-        df = pd.read_excel(self.file_content, sheet_name='IncomeStatement', header=0)
+        df = pd.read_excel(self.file_content, sheet_name=PNL_SHEET, header=0)
 
         total_col_idx = self._find_total_column(df)
         tags_config = pd.read_csv(get_config_path('pnl_account_tags.csv'))
@@ -0,0 +1,587 @@
+"""
+Local Embedded Backend for Monthly Performance Analysis
+
+Offline stand-in for SupabaseClient so full batches can run (and be
+load-tested) without the network:
+- Results in an embedded SQLite database following the MPA schema
+  (005_monthly_performance_analysis.sql plus later MPA migrations)
+- Uploaded files in a directory tree mirroring the storage bucket
+
+Only the table and storage primitives are overridden; batch operations,
+serialization, diffing and the bulk writer are inherited unchanged.
+
+Enable for the process endpoint with MPA_BACKEND=local (data under
+MPA_LOCAL_DIR, default .mpa_local), or use api/py/mpa/run_local.py.
+Queued batches still need the Supabase claim functions, so the worker
+is not supported on this backend.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from io import BytesIO
+from typing import Any, Dict, List, Optional
+
+try:
+    from .db import (
+        SupabaseClient,
+        REVENUE_CENTER_COLUMNS,
+        COST_CENTER_COLUMNS,
+        NON_REVENUE_CLIENT_COLUMNS,
+        HOURS_DETAIL_COLUMNS,
+        EXPENSES_DETAIL_COLUMNS,
+    )
+except ImportError:
+    from db import (
+        SupabaseClient,
+        REVENUE_CENTER_COLUMNS,
+        COST_CENTER_COLUMNS,
+        NON_REVENUE_CLIENT_COLUMNS,
+        HOURS_DETAIL_COLUMNS,
+        EXPENSES_DETAIL_COLUMNS,
+    )
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mpa_analysis_batches (
+    id TEXT PRIMARY KEY,
+    period_id TEXT,
+    month_name TEXT NOT NULL,
+    status TEXT DEFAULT 'pending',
+    error_message TEXT,
+    proforma_file_path TEXT,
+    compensation_file_path TEXT,
+    hours_file_path TEXT,
+    expenses_file_path TEXT,
+    pnl_file_path TEXT,
+    total_revenue REAL,
+    total_labor_cost REAL,
+    total_expense_cost REAL,
+    total_margin_dollars REAL,
+    overall_margin_percent REAL,
+    sga_pool REAL,
+    data_pool REAL,
+    workplace_pool REAL,
+    revenue_center_count INTEGER DEFAULT 0,
+    cost_center_count INTEGER DEFAULT 0,
+    non_revenue_client_count INTEGER DEFAULT 0,
+    validation_passed INTEGER DEFAULT 0,
+    validation_errors TEXT,
+    created_by TEXT NOT NULL,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    processed_at TEXT,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    lease_owner TEXT,
+    lease_expires_at TEXT,
+    heartbeat_at TEXT,
+    attempts INTEGER DEFAULT 0,
+    next_attempt_at TEXT,
+    metrics TEXT,
+    detail_store TEXT DEFAULT 'postgres',
+    result_mode TEXT DEFAULT 'full',
+    input_fingerprint TEXT
+);
+
+CREATE TABLE IF NOT EXISTS mpa_revenue_centers (
+    id TEXT PRIMARY KEY,
+    batch_id TEXT NOT NULL REFERENCES mpa_analysis_batches(id) ON DELETE CASCADE,
+    contract_code TEXT NOT NULL,
+    project_name TEXT,
+    proforma_section TEXT,
+    analysis_category TEXT,
+    allocation_tag TEXT,
+    revenue REAL NOT NULL DEFAULT 0,
+    hours REAL DEFAULT 0,
+    labor_cost REAL DEFAULT 0,
+    expense_cost REAL DEFAULT 0,
+    sga_allocation REAL DEFAULT 0,
+    data_allocation REAL DEFAULT 0,
+    workplace_allocation REAL DEFAULT 0,
+    margin_dollars REAL DEFAULT 0,
+    margin_percent REAL DEFAULT 0,
+    row_hash TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_mpa_rev_batch ON mpa_revenue_centers(batch_id);
+
+CREATE TABLE IF NOT EXISTS mpa_cost_centers (
+    id TEXT PRIMARY KEY,
+    batch_id TEXT NOT NULL REFERENCES mpa_analysis_batches(id) ON DELETE CASCADE,
+    contract_code TEXT NOT NULL,
+    description TEXT,
+    pool TEXT DEFAULT 'SGA',
+    hours REAL DEFAULT 0,
+    labor_cost REAL DEFAULT 0,
+    expense_cost REAL DEFAULT 0,
+    total_cost REAL DEFAULT 0,
+    row_hash TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_mpa_cc_batch ON mpa_cost_centers(batch_id);
+
+CREATE TABLE IF NOT EXISTS mpa_non_revenue_clients (
+    id TEXT PRIMARY KEY,
+    batch_id TEXT NOT NULL REFERENCES mpa_analysis_batches(id) ON DELETE CASCADE,
+    contract_code TEXT NOT NULL,
+    project_name TEXT,
+    hours REAL DEFAULT 0,
+    labor_cost REAL DEFAULT 0,
+    expense_cost REAL DEFAULT 0,
+    total_cost REAL DEFAULT 0,
+    row_hash TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_mpa_nrc_batch ON mpa_non_revenue_clients(batch_id);
+
+CREATE TABLE IF NOT EXISTS mpa_hours_detail (
+    id TEXT PRIMARY KEY,
+    batch_id TEXT NOT NULL REFERENCES mpa_analysis_batches(id) ON DELETE CASCADE,
+    contract_code TEXT NOT NULL,
+    staff_key TEXT NOT NULL,
+    hours REAL NOT NULL DEFAULT 0,
+    hourly_cost REAL DEFAULT 0,
+    labor_cost REAL DEFAULT 0,
+    row_hash TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_mpa_hours_batch_code ON mpa_hours_detail(batch_id, contract_code);
+
+CREATE TABLE IF NOT EXISTS mpa_expenses_detail (
+    id TEXT PRIMARY KEY,
+    batch_id TEXT NOT NULL REFERENCES mpa_analysis_batches(id) ON DELETE CASCADE,
+    contract_code TEXT NOT NULL,
+    expense_date TEXT,
+    amount REAL NOT NULL DEFAULT 0,
+    notes TEXT,
+    row_hash TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_mpa_exp_batch_code ON mpa_expenses_detail(batch_id, contract_code);
+
+CREATE TABLE IF NOT EXISTS mpa_pools_detail (
+    id TEXT PRIMARY KEY,
+    batch_id TEXT NOT NULL REFERENCES mpa_analysis_batches(id) ON DELETE CASCADE,
+    sga_from_pnl REAL DEFAULT 0,
+    data_from_pnl REAL DEFAULT 0,
+    workplace_from_pnl REAL DEFAULT 0,
+    nil_excluded REAL DEFAULT 0,
+    sga_from_cc REAL DEFAULT 0,
+    data_from_cc REAL DEFAULT 0,
+    total_revenue REAL DEFAULT 0,
+    data_tagged_revenue REAL DEFAULT 0,
+    wellness_tagged_revenue REAL DEFAULT 0,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_mpa_pools_batch ON mpa_pools_detail(batch_id);
+
+CREATE TABLE IF NOT EXISTS mpa_batch_rollups (
+    id TEXT PRIMARY KEY,
+    batch_id TEXT NOT NULL REFERENCES mpa_analysis_batches(id) ON DELETE CASCADE,
+    month_name TEXT NOT NULL,
+    rollup TEXT NOT NULL,
+    group_key TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    revenue REAL DEFAULT 0,
+    hours REAL DEFAULT 0,
+    labor_cost REAL DEFAULT 0,
+    expense_cost REAL DEFAULT 0,
+    sga_allocation REAL DEFAULT 0,
+    data_allocation REAL DEFAULT 0,
+    workplace_allocation REAL DEFAULT 0,
+    margin_dollars REAL DEFAULT 0,
+    margin_percent REAL DEFAULT 0,
+    code_count INTEGER DEFAULT 0,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (batch_id, rollup, group_key)
+);
+"""
+
+# JSONB columns in Postgres, stored as JSON text here
+JSON_COLUMNS = {'validation_errors', 'metrics'}
+
+# persist_batch payload sections -> (table, column specs)
+PAYLOAD_TABLES = {
+    'revenue_centers': ('mpa_revenue_centers', REVENUE_CENTER_COLUMNS),
+    'cost_centers': ('mpa_cost_centers', COST_CENTER_COLUMNS),
+    'non_revenue_clients': ('mpa_non_revenue_clients', NON_REVENUE_CLIENT_COLUMNS),
+    'hours_detail': ('mpa_hours_detail', HOURS_DETAIL_COLUMNS),
+    'expenses_detail': ('mpa_expenses_detail', EXPENSES_DETAIL_COLUMNS),
+}
+
+# Tables copied by copy_batch_results, and the batch columns copied with them
+COPY_TABLES = [table for table, _ in PAYLOAD_TABLES.values()] + ['mpa_pools_detail', 'mpa_batch_rollups']
+COPIED_BATCH_COLUMNS = [
+    'total_revenue', 'total_labor_cost', 'total_expense_cost', 'total_margin_dollars',
+    'overall_margin_percent', 'sga_pool', 'data_pool', 'workplace_pool',
+    'revenue_center_count', 'cost_center_count', 'non_revenue_client_count',
+    'validation_passed', 'validation_errors', 'detail_store', 'result_mode', 'input_fingerprint',
+]
+
+# Batch file path columns by upload type
+FILE_COLUMNS = {
+    'proforma': 'proforma_file_path',
+    'compensation': 'compensation_file_path',
+    'hours': 'hours_file_path',
+    'expenses': 'expenses_file_path',
+    'pnl': 'pnl_file_path',
+}
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _encode(column: str, value: Any) -> Any:
+    if column in JSON_COLUMNS or isinstance(value, (dict, list)):
+        return None if value is None else json.dumps(value, default=str)
+    if isinstance(value, bool):
+        return int(value)
+    return value
+
+
+def _decode(row: sqlite3.Row) -> Dict[str, Any]:
+    record = dict(row)
+    for column in JSON_COLUMNS & record.keys():
+        if record[column] is not None:
+            record[column] = json.loads(record[column])
+    if 'validation_passed' in record and record['validation_passed'] is not None:
+        record['validation_passed'] = bool(record['validation_passed'])
+    return record
+
+
+class LocalClient(SupabaseClient):
+    """
+    SupabaseClient backed by SQLite and a local directory.
+
+    Args:
+        directory: Root for mpa.sqlite3 and storage/ (default MPA_LOCAL_DIR or .mpa_local)
+    """
+
+    supports_queue = False
+
+    def __init__(self, directory: Optional[str] = None):
+        started = time.perf_counter()
+        self.directory = directory or os.environ.get('MPA_LOCAL_DIR', '.mpa_local')
+        self.bucket = 'uploads'
+        self.storage_root = os.path.join(self.directory, 'storage', self.bucket)
+        os.makedirs(self.storage_root, exist_ok=True)
+
+        self.client = None
+        self.conn = sqlite3.connect(
+            os.path.join(self.directory, 'mpa.sqlite3'),
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA foreign_keys=ON')
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.RLock()
+
+        # SQLite serializes writes, so extra writer threads only contend
+        self.write_concurrency = 1
+        self.write_retries = 0
+        self.write_backoff_seconds = 0.0
+        self.connect_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def ping(self) -> bool:
+        try:
+            with self._lock:
+                self.conn.execute('SELECT 1')
+            return True
+        except sqlite3.Error:
+            return False
+
+    # ============================================
+    # Directory file store
+    # ============================================
+
+    def _storage_path(self, path: str) -> str:
+        root = os.path.normpath(self.storage_root)
+        full = os.path.normpath(os.path.join(root, path))
+        if full != root and not full.startswith(root + os.sep):
+            raise ValueError(f"Invalid storage path: {path}")
+        return full
+
+    def download_file(self, path: str) -> BytesIO:
+        with open(self._storage_path(path), 'rb') as f:
+            return BytesIO(f.read())
+
+    def upload_file(self, path: str, content: bytes, content_type: str = 'application/octet-stream'):
+        full = self._storage_path(path)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        tmp = f"{full}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(content)
+        os.replace(tmp, full)
+
+    def list_files(self, folder: str) -> List[str]:
+        full = self._storage_path(folder)
+        if not os.path.isdir(full):
+            return []
+        return sorted(name for name in os.listdir(full) if os.path.isfile(os.path.join(full, name)))
+
+    def remove_files(self, paths: List[str]):
+        for path in paths or []:
+            try:
+                os.remove(self._storage_path(path))
+            except FileNotFoundError:
+                pass
+
+    def file_fingerprint(self, path: str) -> str:
+        stat = os.stat(self._storage_path(path))
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+    def file_content_hash(self, path: str) -> str:
+        digest = hashlib.sha256()
+        with open(self._storage_path(path), 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    # ============================================
+    # SQLite table primitives
+    # ============================================
+
+    @staticmethod
+    def _where(filters: Optional[Dict[str, Any]]) -> tuple:
+        clauses, params = [], []
+        for column, value in (filters or {}).items():
+            if isinstance(value, (list, tuple, set)):
+                value = list(value)
+                if not value:
+                    clauses.append('0')
+                    continue
+                clauses.append(f"{_quote(column)} IN ({','.join('?' * len(value))})")
+                params.extend(value)
+            else:
+                clauses.append(f"{_quote(column)} = ?")
+                params.append(value)
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+    def select_rows(
+        self,
+        table: str,
+        columns: str = '*',
+        filters: Optional[Dict[str, Any]] = None,
+        order: Optional[str] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        selected = '*' if columns.strip() == '*' else ', '.join(_quote(c.strip()) for c in columns.split(','))
+        where, params = self._where(filters)
+        sql = f"SELECT {selected} FROM {_quote(table)}{where}"
+        if order:
+            sql += f" ORDER BY {_quote(order)}"
+        if limit is not None:
+            sql += ' LIMIT ? OFFSET ?'
+            params += [limit, offset]
+        with self._lock:
+            return [_decode(row) for row in self.conn.execute(sql, params).fetchall()]
+
+    def select_page(
+        self,
+        table: str,
+        columns: str,
+        filters: Optional[Dict[str, Any]],
+        sort: str,
+        descending: bool = False,
+        after: Optional[tuple] = None,
+        limit: int = 100,
+    ) -> List[Dict[str, Any]]:
+        selected = '*' if columns.strip() == '*' else ', '.join(_quote(c.strip()) for c in columns.split(','))
+        where, params = self._where(filters)
+        if after is not None:
+            value, last_id = after
+            op = '<' if descending else '>'
+            keyset = f"({_quote(sort)} {op} ? OR ({_quote(sort)} = ? AND id > ?))" if sort != 'id' else f"id {op} ?"
+            where += (' AND ' if where else ' WHERE ') + keyset
+            params += [value, value, last_id] if sort != 'id' else [last_id]
+        order = f"{_quote(sort)} {'DESC' if descending else 'ASC'}" + (', id ASC' if sort != 'id' else '')
+        sql = f"SELECT {selected} FROM {_quote(table)}{where} ORDER BY {order} LIMIT ?"
+        with self._lock:
+            return [_decode(row) for row in self.conn.execute(sql, params + [limit]).fetchall()]
+
+    def _insert_sql(self, table: str, columns: List[str], upsert: bool) -> str:
+        sql = (
+            f"INSERT INTO {_quote(table)} ({', '.join(_quote(c) for c in columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})"
+        )
+        if upsert:
+            updates = ', '.join(f"{_quote(c)} = excluded.{_quote(c)}" for c in columns if c != 'id')
+            sql += f" ON CONFLICT(id) DO UPDATE SET {updates}"
+        return sql
+
+    def _write(self, table: str, records: List[Dict[str, Any]], upsert: bool):
+        if not records:
+            return
+        columns = ['id'] + [c for c in records[0] if c != 'id']
+        rows = [
+            [record.get('id') or str(uuid.uuid4())] + [_encode(c, record.get(c)) for c in columns[1:]]
+            for record in records
+        ]
+        with self._lock:
+            self.conn.execute('BEGIN')
+            try:
+                self.conn.executemany(self._insert_sql(table, columns, upsert), rows)
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    def insert_rows(self, table: str, records: List[Dict[str, Any]]):
+        self._write(table, records, upsert=False)
+
+    def upsert_rows(self, table: str, records: List[Dict[str, Any]]):
+        self._write(table, records, upsert=True)
+
+    def update_rows(self, table: str, values: Dict[str, Any], filters: Dict[str, Any]):
+        assignments = ', '.join(f"{_quote(c)} = ?" for c in values)
+        where, params = self._where(filters)
+        with self._lock:
+            self.conn.execute(
+                f"UPDATE {_quote(table)} SET {assignments}{where}",
+                [_encode(c, v) for c, v in values.items()] + params,
+            )
+
+    def delete_rows(self, table: str, filters: Dict[str, Any]):
+        where, params = self._where(filters)
+        with self._lock:
+            self.conn.execute(f"DELETE FROM {_quote(table)}{where}", params)
+
+    def count_rows(self, table: str, batch_id: str) -> int:
+        with self._lock:
+            row = self.conn.execute(f"SELECT COUNT(*) FROM {_quote(table)} WHERE batch_id = ?", [batch_id]).fetchone()
+        return int(row[0])
+
+    def _persist(self, batch_id: str, payload: Dict[str, Any]) -> Dict[str, int]:
+        """SQLite equivalent of mpa_persist_batch: replace all results in one transaction."""
+        counts: Dict[str, int] = {}
+        batch_values = dict(payload.get('batch') or {})
+        batch_values.update({
+            'status': 'completed',
+            'processed_at': datetime.utcnow().isoformat(),
+            'updated_at': datetime.utcnow().isoformat(),
+        })
+
+        with self._lock:
+            self.conn.execute('BEGIN')
+            try:
+                for table, _ in PAYLOAD_TABLES.values():
+                    self.conn.execute(f"DELETE FROM {_quote(table)} WHERE batch_id = ?", [batch_id])
+                self.conn.execute('DELETE FROM mpa_pools_detail WHERE batch_id = ?', [batch_id])
+
+                for section, (table, specs) in PAYLOAD_TABLES.items():
+                    columns = ['id', 'batch_id'] + [name for name, _, _ in specs]
+                    rows = [[str(uuid.uuid4()), batch_id] + list(row) for row in payload.get(section) or []]
+                    self.conn.executemany(self._insert_sql(table, columns, upsert=False), rows)
+                    counts[table] = len(rows)
+
+                pools = payload.get('pools_detail') or {}
+                columns = ['id', 'batch_id'] + list(pools)
+                self.conn.execute(
+                    self._insert_sql('mpa_pools_detail', columns, upsert=False),
+                    [str(uuid.uuid4()), batch_id] + list(pools.values()),
+                )
+
+                assignments = ', '.join(f"{_quote(c)} = ?" for c in batch_values)
+                cursor = self.conn.execute(
+                    f"UPDATE mpa_analysis_batches SET {assignments} WHERE id = ?",
+                    [_encode(c, v) for c, v in batch_values.items()] + [batch_id],
+                )
+                if cursor.rowcount == 0:
+                    raise RuntimeError(f"MPA batch {batch_id} not found")
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+        return counts
+
+    def _copy_results(self, source_batch_id: str, target_batch_id: str) -> Dict[str, int]:
+        """SQLite equivalent of mpa_copy_batch_results."""
+        counts: Dict[str, int] = {}
+        with self._lock:
+            source = self.conn.execute(
+                "SELECT * FROM mpa_analysis_batches WHERE id = ? AND status = 'completed'", [source_batch_id]
+            ).fetchone()
+            if source is None:
+                raise RuntimeError(f"MPA batch {source_batch_id} not found or not completed")
+
+            self.conn.execute('BEGIN')
+            try:
+                for table in COPY_TABLES:
+                    columns = [
+                        row['name'] for row in self.conn.execute(f"PRAGMA table_info({_quote(table)})")
+                        if row['name'] not in ('id', 'batch_id', 'created_at')
+                    ]
+                    rows = self.conn.execute(
+                        f"SELECT {', '.join(_quote(c) for c in columns)} FROM {_quote(table)} WHERE batch_id = ?",
+                        [source_batch_id],
+                    ).fetchall()
+                    self.conn.execute(f"DELETE FROM {_quote(table)} WHERE batch_id = ?", [target_batch_id])
+                    self.conn.executemany(
+                        self._insert_sql(table, ['id', 'batch_id'] + columns, upsert=False),
+                        [[str(uuid.uuid4()), target_batch_id] + list(row) for row in rows],
+                    )
+                    counts[table] = len(rows)
+
+                values = {column: source[column] for column in COPIED_BATCH_COLUMNS}
+                values.update({
+                    'error_message': None,
+                    'status': 'completed',
+                    'processed_at': datetime.utcnow().isoformat(),
+                    'updated_at': datetime.utcnow().isoformat(),
+                })
+                assignments = ', '.join(f"{_quote(c)} = ?" for c in values)
+                cursor = self.conn.execute(
+                    f"UPDATE mpa_analysis_batches SET {assignments} WHERE id = ?",
+                    list(values.values()) + [target_batch_id],
+                )
+                if cursor.rowcount == 0:
+                    raise RuntimeError(f"MPA batch {target_batch_id} not found")
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+        return counts
+
+    # ============================================
+    # Offline helpers
+    # ============================================
+
+    def create_batch(
+        self,
+        month_name: str,
+        files: Dict[str, bytes],
+        created_by: str = 'local@offline',
+    ) -> Dict[str, Any]:
+        """
+        Store the five input files and create a pending batch for them.
+
+        Args:
+            month_name: Month identifier, e.g. 'November2025'
+            files: File contents keyed by 'proforma', 'compensation', 'hours', 'expenses', 'pnl'
+            created_by: Attribution stored on the batch
+
+        Returns:
+            The new batch record
+        """
+        missing = [name for name in FILE_COLUMNS if name not in files]
+        if missing:
+            raise ValueError(f"Missing files: {', '.join(missing)}")
+
+        batch_id = str(uuid.uuid4())
+        timestamp = datetime.utcnow().strftime('%Y-%m-%dT%H-%M-%S')
+        record = {'id': batch_id, 'month_name': month_name, 'status': 'pending', 'created_by': created_by}
+        for name, column in FILE_COLUMNS.items():
+            path = f"mpa_{name}/{timestamp}_{batch_id}"
+            self.upload_file(path, files[name])
+            record[column] = path
+
+        self.insert_rows('mpa_analysis_batches', [record])
+        return self.get_batch(batch_id)
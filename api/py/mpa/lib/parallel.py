@@ -0,0 +1,129 @@
+"""
+Partitioned Direct-Cost Aggregation for Monthly Performance Analysis
+
+Map-reduce path for large (year-long or multi-entity) Harvest exports:
+- Hours and expense rows are partitioned by a hash of contract_code, so
+  every contract code, and every (contract_code, staff_key) group, lives in
+  exactly one partition
+- Each worker process joins its hours with the (small, broadcast)
+  compensation table and pre-aggregates by (contract_code, staff_key) and
+  contract_code, and sums its expenses by contract_code
+- The partials are concatenated and sorted by key; since no group spans
+  partitions, the result equals the single-process computation
+
+Enabled with MPA_AGGREGATE_WORKERS=<n> (or 'auto' for one per CPU) and
+used only above PARALLEL_MIN_ROWS rows, below which pickling partitions to
+the workers costs more than the aggregation itself. Where process pools
+are unavailable (e.g. no /dev/shm on some serverless runtimes) the
+single-process path is used.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Set, Tuple
+
+import pandas as pd
+
+try:
+    from .computations import (
+        aggregate_expenses,
+        aggregate_labor,
+        build_expense_detail,
+        calculate_expense_costs,
+        calculate_labor_costs,
+        missing_compensation_logs,
+    )
+except ImportError:
+    from computations import (
+        aggregate_expenses,
+        aggregate_labor,
+        build_expense_detail,
+        calculate_expense_costs,
+        calculate_labor_costs,
+        missing_compensation_logs,
+    )
+
+# Hours + expense rows below which the single-process path is used
+PARALLEL_MIN_ROWS = 200000
+
+
+def aggregate_workers() -> int:
+    """Worker processes for direct-cost aggregation (MPA_AGGREGATE_WORKERS, default 1)."""
+    value = os.environ.get('MPA_AGGREGATE_WORKERS', '1').strip().lower()
+    if value == 'auto':
+        return os.cpu_count() or 1
+    return max(1, int(value or 1))
+
+
+def partition_by_code(df: pd.DataFrame, partitions: int) -> List[pd.DataFrame]:
+    """Split rows into partitions by contract_code hash, keeping row order within each."""
+    buckets = pd.util.hash_pandas_object(df['contract_code'].astype(str), index=False) % partitions
+    return [df[(buckets == i).to_numpy()] for i in range(partitions)]
+
+
+def _aggregate_partition(
+    hours_df: pd.DataFrame,
+    comp_df: pd.DataFrame,
+    expenses_df: pd.DataFrame,
+) -> Tuple[pd.DataFrame, pd.DataFrame, Set[str], float, pd.DataFrame]:
+    """Map step: labor and expense aggregates of one partition."""
+    labor_by_project, hours_detail, missing_staff, missing_hours = aggregate_labor(hours_df, comp_df)
+    return labor_by_project, hours_detail, missing_staff, missing_hours, aggregate_expenses(expenses_df)
+
+
+def _combine(frames: List[pd.DataFrame], keys: List[str]) -> pd.DataFrame:
+    """Reduce step: concatenate per-partition aggregates in groupby key order."""
+    non_empty = [f for f in frames if not f.empty]
+    if not non_empty:
+        return frames[0]
+    combined = pd.concat(non_empty, ignore_index=True)
+    return combined.sort_values(keys, kind='stable').reset_index(drop=True)
+
+
+def calculate_direct_costs(
+    hours_df: pd.DataFrame,
+    comp_df: pd.DataFrame,
+    expenses_df: pd.DataFrame,
+    workers: Optional[int] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame, List[str], pd.DataFrame, pd.DataFrame]:
+    """
+    Labor and expense costs, partitioned across worker processes when large.
+
+    Same results as calculate_labor_costs + calculate_expense_costs.
+
+    Args:
+        hours_df: Harvest hours data (contract_code, staff_key, hours)
+        comp_df: Compensation data (staff_key, hourly_cost)
+        expenses_df: Filtered expenses data (contract_code, amount, ...)
+        workers: Worker processes (default: aggregate_workers())
+
+    Returns:
+        Tuple of labor by contract_code, hours detail, log messages,
+        expense cost by contract_code and expense detail
+    """
+    workers = aggregate_workers() if workers is None else workers
+    if workers <= 1 or len(hours_df) + len(expenses_df) < PARALLEL_MIN_ROWS:
+        labor_by_project, hours_detail, logs = calculate_labor_costs(hours_df, comp_df)
+        expense_by_project, expense_detail = calculate_expense_costs(expenses_df)
+        return labor_by_project, hours_detail, logs, expense_by_project, expense_detail
+
+    rates = comp_df[['staff_key', 'hourly_cost']]
+    hours_parts = partition_by_code(hours_df, workers)
+    expense_parts = partition_by_code(expenses_df, workers)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            partials = list(pool.map(_aggregate_partition, hours_parts, [rates] * workers, expense_parts))
+    except (OSError, NotImplementedError, BrokenProcessPool) as e:
+        print(f"Process pool unavailable ({e}); aggregating in one process")
+        return calculate_direct_costs(hours_df, comp_df, expenses_df, workers=1)
+
+    labor_by_project = _combine([p[0] for p in partials], ['contract_code'])
+    hours_detail = _combine([p[1] for p in partials], ['contract_code', 'staff_key'])
+    missing_staff = set().union(*(p[2] for p in partials))
+    missing_hours = sum(p[3] for p in partials)
+    expense_by_project = _combine([p[4] for p in partials], ['contract_code'])
+
+    logs = missing_compensation_logs(missing_staff, missing_hours)
+    logs.append(f"Aggregated direct costs in {workers} partitions by contract_code")
+    return labor_by_project, hours_detail, logs, expense_by_project, build_expense_detail(expenses_df)
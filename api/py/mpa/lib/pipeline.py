@@ -0,0 +1,411 @@
+"""
+Stage Pipeline for Monthly Performance Analysis
+
+Expresses the analysis as a DAG of named stages so re-runs only recompute
+what changed:
+- Each stage declares its upstream stages and the external params it reads
+- A stage key hashes the stage name, config fingerprint, its params and the
+  keys of its upstream stages (so a change propagates downstream only)
+- Cacheable stage outputs are memoized in a StageCache under that key
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Bump when pipeline logic changes so memoized outputs are not reused
+CODE_VERSION = 'mpa-3.0.3'
+
+
+def get_config_path(filename: str = '') -> Path:
+    """Get path to config file relative to this module."""
+    return Path(__file__).parent.parent.parent / 'config' / filename
+
+
+_fingerprint_memo: Dict[Tuple, str] = {}
+
+
+def config_fingerprint() -> str:
+    """
+    Hash of every config file plus the code version.
+
+    Any edit to cost centers, category mapping, P&L tags or settings
+    invalidates all memoized stage outputs. The hash is memoized per file
+    size/mtime so warm processes do not re-read the config each run.
+    """
+    files = sorted(p for p in get_config_path().iterdir() if p.is_file())
+    signature = tuple((p.name, p.stat().st_size, p.stat().st_mtime_ns) for p in files)
+    if signature in _fingerprint_memo:
+        return _fingerprint_memo[signature]
+
+    digest = hashlib.sha256(CODE_VERSION.encode())
+    for path in files:
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    _fingerprint_memo.clear()
+    _fingerprint_memo[signature] = digest.hexdigest()
+    return _fingerprint_memo[signature]
+
+
+class Stage:
+    """A named pipeline step with declared inputs."""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[..., Any],
+        deps: Iterable[str] = (),
+        params: Iterable[str] = (),
+        cacheable: bool = True,
+    ):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.params = tuple(params)
+        self.cacheable = cacheable
+
+
+class StageCache:
+    """In-memory stage output cache (base implementation)."""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[Any, List[str]]] = {}
+
+    def contains(self, key: str) -> bool:
+        """Check for a stage key without loading its output."""
+        return key in self._entries
+
+    def get(self, key: str) -> Optional[Tuple[Any, List[str]]]:
+        """Return (output, logs) for a stage key, or None on miss."""
+        return self._entries.get(key)
+
+    def put(self, key: str, output: Any, logs: List[str]):
+        """Store a stage output and the logs it produced."""
+        self._entries[key] = (output, logs)
+
+
+class DiskStageCache(StageCache):
+    """
+    Pickle-per-key stage cache in a local directory.
+
+    Survives across warm serverless invocations (/tmp) and local worker runs.
+    Oldest entries are pruned beyond max_entries.
+    """
+
+    def __init__(self, directory: str, max_entries: int = 256):
+        super().__init__()
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.pkl"
+
+    def contains(self, key: str) -> bool:
+        return self._path(key).exists()
+
+    def get(self, key: str) -> Optional[Tuple[Any, List[str]]]:
+        path = self._path(key)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            # Corrupt or partially written entry - treat as a miss
+            return None
+
+    def put(self, key: str, output: Any, logs: List[str]):
+        # A unique temp file per writer: workers running batches with the
+        # same files write the same load-stage keys concurrently
+        tmp_path = None
+        try:
+            with tempfile.NamedTemporaryFile(
+                dir=self.directory, prefix=f"{key}.", suffix='.tmp', delete=False,
+            ) as f:
+                tmp_path = f.name
+                pickle.dump((output, logs), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except Exception as e:
+            # An entry that cannot be written is a miss next time, not a failed run
+            print(f"MPA stage cache write for {key[:12]} failed: {e}")
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+            return
+        self._prune()
+
+    def _prune(self):
+        entries = []
+        for path in self.directory.glob('*.pkl'):
+            try:
+                entries.append((path.stat().st_mtime, path))
+            except OSError:
+                # Pruned by another writer meanwhile
+                pass
+        entries = [path for _, path in sorted(entries)]
+        for path in entries[:max(0, len(entries) - self.max_entries)]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+class TieredStageCache(StageCache):
+    """
+    Chain of caches checked in order (e.g. local disk, then batch checkpoints).
+
+    Hits in a later tier are copied into the earlier tiers; puts go to all.
+    """
+
+    def __init__(self, *tiers: StageCache):
+        super().__init__()
+        self.tiers = [t for t in tiers if t is not None]
+
+    def contains(self, key: str) -> bool:
+        return any(t.contains(key) for t in self.tiers)
+
+    def get(self, key: str) -> Optional[Tuple[Any, List[str]]]:
+        for idx, tier in enumerate(self.tiers):
+            entry = tier.get(key)
+            if entry is not None:
+                for earlier in self.tiers[:idx]:
+                    earlier.put(key, *entry)
+                return entry
+        return None
+
+    def put(self, key: str, output: Any, logs: List[str]):
+        for tier in self.tiers:
+            tier.put(key, output, logs)
+
+
+def default_stage_cache() -> Optional[StageCache]:
+    """
+    Stage cache configured from the environment.
+
+    MPA_STAGE_CACHE=off disables memoization; MPA_STAGE_CACHE_DIR overrides
+    the cache directory (defaults to the system temp dir).
+    """
+    if os.environ.get('MPA_STAGE_CACHE', '').lower() in ('0', 'off', 'false'):
+        return None
+    directory = os.environ.get(
+        'MPA_STAGE_CACHE_DIR',
+        os.path.join(tempfile.gettempdir(), 'mpa_stage_cache'),
+    )
+    return DiskStageCache(directory)
+
+
+class Pipeline:
+    """
+    DAG of stages executed in dependency order with memoized outputs.
+
+    Stage functions receive their upstream outputs and params as keyword
+    arguments plus a `logs` list to append messages to.
+    """
+
+    def __init__(self, fingerprint: Optional[str] = None):
+        self.stages: 'OrderedDict[str, Stage]' = OrderedDict()
+        self.fingerprint = fingerprint or config_fingerprint()
+
+    def stage(
+        self,
+        name: str,
+        deps: Iterable[str] = (),
+        params: Iterable[str] = (),
+        cacheable: bool = True,
+    ):
+        """Decorator registering a function as a stage."""
+        def decorator(func):
+            self.add(Stage(name, func, deps, params, cacheable))
+            return func
+        return decorator
+
+    def add(self, stage: Stage):
+        """Register a stage. Upstream stages must already be registered."""
+        if stage.name in self.stages:
+            raise ValueError(f"Duplicate stage name: {stage.name}")
+        unknown = [d for d in stage.deps if d not in self.stages]
+        if unknown:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown stages: {', '.join(unknown)}")
+        self.stages[stage.name] = stage
+
+    def stage_keys(self, params: Dict[str, Any]) -> Dict[str, str]:
+        """Compute the memoization key of every stage for the given params."""
+        keys: Dict[str, str] = {}
+        for name, stage in self.stages.items():
+            payload = {
+                'stage': name,
+                'fingerprint': self.fingerprint,
+                'params': {p: params.get(p) for p in stage.params},
+                'deps': [keys[d] for d in stage.deps],
+            }
+            encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+            keys[name] = hashlib.sha256(encoded).hexdigest()
+        return keys
+
+    def run(
+        self,
+        params: Dict[str, Any],
+        cache: Optional[StageCache] = None,
+        deadline: Optional[float] = None,
+        on_event: Optional[Callable[[Dict[str, Any]], None]] = None,
+        instrumentation: Optional[Any] = None,
+        on_output: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        release: bool = False,
+        keep: Iterable[str] = (),
+    ) -> 'PipelineRun':
+        """
+        Execute stages in registration (topological) order.
+
+        Only stages that are not cached are executed, and cached outputs are
+        only loaded when a stage that must execute depends on them.
+
+        Args:
+            params: External inputs (batch id, month, file identities, ...)
+            cache: Optional StageCache for memoized outputs
+            deadline: Optional time.monotonic() value; no new stage is started
+                after it passes and the run is returned incomplete
+            on_event: Optional callback receiving progress events:
+                {'event': 'plan', 'execute': [...]}
+                {'event': 'stage_start', 'stage': name}
+                {'event': 'stage_end', 'stage': name, 'cached': bool,
+                 'elapsed_ms': float, 'rows': int | {frame: int}}
+            instrumentation: Optional Instrumentation; each executed stage is
+                measured as kind 'stage'
+            on_output: Optional callback(stage, outputs) called whenever a
+                stage's output becomes available (executed or loaded from
+                cache), before anything downstream runs; raising from it
+                aborts the run (e.g. ValidationGate)
+            release: Drop a stage's output from run.outputs as soon as no
+                stage still to execute depends on it, bounding peak memory.
+                Callbacks then only see the outputs still held.
+            keep: Stages whose outputs are never released (read after the run)
+
+        Returns:
+            PipelineRun with outputs, logs and which stages ran, were reused
+            or are still pending
+        """
+        keys = self.stage_keys(params)
+        run = PipelineRun(keys)
+
+        to_execute = [
+            name for name, stage in self.stages.items()
+            if not stage.cacheable or cache is None or not cache.contains(keys[name])
+        ]
+        emit = on_event or (lambda event: None)
+        emit({'event': 'plan', 'execute': list(to_execute)})
+
+        keep = set(keep)
+        waiting = {name: 0 for name in self.stages}
+        if release:
+            for name in to_execute:
+                for dep in self.stages[name].deps:
+                    waiting[dep] += 1
+
+        def materialize(name: str):
+            if name in run.outputs:
+                return
+            stage = self.stages[name]
+
+            started = time.perf_counter()
+            entry = cache.get(keys[name]) if cache is not None and stage.cacheable else None
+            if entry is not None:
+                output, stage_logs = entry
+                run.reused.append(name)
+            else:
+                for dep in stage.deps:
+                    materialize(dep)
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise _DeadlineReached()
+                emit({'event': 'stage_start', 'stage': name})
+                started = time.perf_counter()
+                stage_logs = []
+                kwargs = {d: run.outputs[d] for d in stage.deps}
+                kwargs.update({p: params.get(p) for p in stage.params})
+                if instrumentation is not None:
+                    rows_in = sum(total_rows(run.outputs[d]) for d in stage.deps)
+                    with instrumentation.measure('stage', name, rows_in=rows_in) as record:
+                        output = stage.func(logs=stage_logs, **kwargs)
+                        record['rows_out'] = total_rows(output)
+                else:
+                    output = stage.func(logs=stage_logs, **kwargs)
+                run.executed.append(name)
+                if cache is not None and stage.cacheable:
+                    cache.put(keys[name], output, stage_logs)
+
+            run.outputs[name] = output
+            run.logs.extend(stage_logs)
+            emit({
+                'event': 'stage_end',
+                'stage': name,
+                'cached': entry is not None,
+                'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+                'rows': output_rows(output),
+            })
+            if on_output is not None:
+                on_output(name, run.outputs)
+
+            if release and name in to_execute:
+                for dep in stage.deps:
+                    waiting[dep] -= 1
+                    if waiting[dep] <= 0 and dep not in keep:
+                        run.outputs.pop(dep, None)
+
+        try:
+            for name in to_execute:
+                materialize(name)
+        except _DeadlineReached:
+            pass
+
+        done = set(run.executed) | set(run.reused)
+        run.pending = [n for n in to_execute if n not in done]
+        # Cached stages nothing downstream needed are reused without loading
+        run.reused.extend(n for n in self.stages if n not in done and n not in run.pending)
+        return run
+
+
+def output_rows(output: Any) -> Any:
+    """Row count of a stage output: int for a frame, {name: int} for a dict of frames."""
+    if hasattr(output, 'shape') and hasattr(output, 'columns'):
+        return int(len(output))
+    if isinstance(output, dict):
+        counts = {k: int(len(v)) for k, v in output.items() if hasattr(v, 'columns')}
+        return counts or None
+    return None
+
+
+def total_rows(output: Any) -> int:
+    """Total rows across the frames of a stage output."""
+    rows = output_rows(output)
+    if isinstance(rows, dict):
+        return sum(rows.values())
+    return rows or 0
+
+
+class _DeadlineReached(Exception):
+    """Raised inside Pipeline.run when the time budget is exhausted."""
+
+
+class PipelineRun:
+    """Outputs and bookkeeping from one Pipeline.run call."""
+
+    def __init__(self, keys: Dict[str, str]):
+        self.keys = keys
+        self.outputs: Dict[str, Any] = {}
+        self.logs: List[str] = []
+        self.executed: List[str] = []
+        self.reused: List[str] = []
+        self.pending: List[str] = []
+
+    @property
+    def complete(self) -> bool:
+        """True when every stage has run or been reused."""
+        return not self.pending
@@ -0,0 +1,262 @@
+"""
+Polars Execution Engine for Monthly Performance Analysis
+
+Optional engine for the direct-cost, pool and allocation stages, selected
+with MPA_ENGINE=polars (requires `pip install polars`):
+- Each stage is one lazy query plan over the Harvest, compensation and
+  classification frames, collected together (pl.collect_all) so shared
+  subplans run once and the plan executes multi-threaded
+- Only key and numeric columns cross into Polars; results are joined back
+  onto the pandas frames by row position, so every other column, dtype and
+  row order is untouched and SupabaseClient receives the same frames as
+  with the pandas engine
+
+Results match computations.py and allocations.py up to floating-point
+summation order (checked by compare_engines.py).
+"""
+
+import functools
+import os
+from typing import Any, Dict, List, Tuple
+
+import pandas as pd
+
+try:
+    import polars as pl
+    HAS_POLARS = True
+except ImportError:
+    # Without polars every stage runs on the pandas engine
+    pl = None
+    HAS_POLARS = False
+
+try:
+    from .computations import build_expense_detail, missing_compensation_logs
+except ImportError:
+    from computations import build_expense_detail, missing_compensation_logs
+
+ENGINES = ('pandas', 'polars')
+
+# Allocation column, allocation_tag value (None = every revenue center), pool key, label
+ALLOCATIONS = (
+    ('sga_allocation', None, 'sga_pool', 'SG&A'),
+    ('data_allocation', 'Data', 'data_pool', 'Data'),
+    ('workplace_allocation', 'Wellness', 'workplace_pool', 'Workplace'),
+)
+
+
+def engine_mode() -> str:
+    """'polars' if MPA_ENGINE=polars and polars is installed, else 'pandas'."""
+    mode = os.environ.get('MPA_ENGINE', 'pandas').strip().lower()
+    return 'polars' if mode == 'polars' and HAS_POLARS else 'pandas'
+
+
+def _lazy(df: pd.DataFrame, text: Tuple[str, ...] = (), numbers: Tuple[str, ...] = ()) -> 'pl.LazyFrame':
+    """Key and numeric columns of a pandas frame as a typed LazyFrame."""
+    frame = pl.from_pandas(df[list(text + numbers)].reset_index(drop=True))
+    return frame.lazy().with_columns(
+        [pl.col(c).cast(pl.Utf8) for c in text] + [pl.col(c).cast(pl.Float64) for c in numbers]
+    )
+
+
+def _ordered_sum(column: str) -> 'pl.Expr':
+    """
+    Group sum added in row order. A plain group_by sum adds partial sums
+    from each thread in whichever order they finish, so the last bits of a
+    total could change between runs (and with them the row hashes of the
+    hours detail); summing each group's values as one list does not.
+    """
+    return pl.col(column).implode().list.sum()
+
+
+def _keyed_costs(keys: pd.DataFrame, *aggregates: 'pl.LazyFrame') -> 'pl.LazyFrame':
+    """Left-join per-code aggregates onto a frame's codes, in its row order, nulls as 0."""
+    plan = _lazy(keys, text=('contract_code',)).with_row_index('_row')
+    value_columns: List[str] = []
+    for aggregate in aggregates:
+        plan = plan.join(aggregate, on='contract_code', how='left')
+        value_columns.extend(c for c in aggregate.collect_schema().names() if c != 'contract_code')
+    return plan.sort('_row').select([pl.col(c).fill_null(0.0) for c in value_columns])
+
+
+def _assign(df: pd.DataFrame, values: 'pl.DataFrame') -> pd.DataFrame:
+    """Copy of df with the columns of a row-aligned Polars result set."""
+    out = df.copy()
+    for column in values.columns:
+        out[column] = values[column].to_numpy()
+    return out
+
+
+def _center_costs(centers: pd.DataFrame, labor: 'pl.DataFrame', expenses: 'pl.DataFrame') -> pd.DataFrame:
+    """Cost or non-revenue center costs: hours, labor_cost, expense_cost, total_cost."""
+    costs = _keyed_costs(centers, labor.lazy(), expenses.lazy()).with_columns(
+        (pl.col('labor_cost') + pl.col('expense_cost')).alias('total_cost')
+    ).collect()
+    return _assign(centers, costs)
+
+
+def direct_costs(
+    classified: Dict[str, pd.DataFrame],
+    hours_df: pd.DataFrame,
+    comp_df: pd.DataFrame,
+    expenses_df: pd.DataFrame,
+) -> Tuple[Dict[str, pd.DataFrame], List[str]]:
+    """
+    Polars version of the direct_costs stage.
+
+    Args:
+        classified: Output of classify_all_activity
+        hours_df: Harvest hours data (contract_code, staff_key, hours)
+        comp_df: Compensation data (staff_key, hourly_cost)
+        expenses_df: Filtered expenses data (contract_code, date, amount, notes)
+
+    Returns:
+        Tuple of the stage output (revenue_centers, cost_centers,
+        non_revenue_clients, hours_detail, expense_detail) and log messages
+    """
+    rates = _lazy(comp_df, text=('staff_key',), numbers=('hourly_cost',))
+    priced = (
+        _lazy(hours_df, text=('contract_code', 'staff_key'), numbers=('hours',))
+        .join(rates, on='staff_key', how='left', maintain_order='left')
+    )
+    missing = priced.filter(pl.col('hourly_cost').is_null())
+    labor = (
+        priced.filter(pl.col('hourly_cost').is_not_null())
+        .with_columns((pl.col('hours') * pl.col('hourly_cost')).alias('labor_cost'))
+    )
+    # pandas groupby drops null keys
+    hours_detail = (
+        labor.filter(pl.col('contract_code').is_not_null() & pl.col('staff_key').is_not_null())
+        .group_by(['contract_code', 'staff_key'])
+        .agg(_ordered_sum('hours'), pl.col('hourly_cost').first(), _ordered_sum('labor_cost'))
+        .sort(['contract_code', 'staff_key'])
+    )
+    labor_by_project = (
+        labor.filter(pl.col('contract_code').is_not_null())
+        .group_by('contract_code')
+        .agg(_ordered_sum('hours'), _ordered_sum('labor_cost'))
+    )
+    expense_by_project = (
+        _lazy(expenses_df, text=('contract_code',), numbers=('amount',))
+        .filter(pl.col('contract_code').is_not_null())
+        .group_by('contract_code')
+        .agg(_ordered_sum('amount').alias('expense_cost'))
+    )
+    # Cost and non-revenue centers are costed from the hours detail, as in pandas
+    detail_labor = hours_detail.group_by('contract_code').agg(
+        _ordered_sum('hours'), _ordered_sum('labor_cost')
+    )
+
+    revenue_costs, detail, labor_totals, expense_totals, missing_rows = pl.collect_all([
+        _keyed_costs(classified['revenue_centers'], labor_by_project, expense_by_project),
+        hours_detail,
+        detail_labor,
+        expense_by_project,
+        missing.select(pl.col('staff_key').fill_null('nan').unique().implode(), pl.col('hours').sum()),
+    ])
+
+    cost_centers = _center_costs(classified['cost_centers'], labor_totals, expense_totals)
+    non_revenue_clients = classified['non_revenue_clients']
+    if not non_revenue_clients.empty:
+        non_revenue_clients = _center_costs(non_revenue_clients, labor_totals, expense_totals)
+
+    logs = missing_compensation_logs(set(missing_rows['staff_key'][0]), float(missing_rows['hours'][0]))
+
+    return {
+        'revenue_centers': _assign(classified['revenue_centers'], revenue_costs),
+        'cost_centers': cost_centers,
+        'non_revenue_clients': non_revenue_clients,
+        'hours_detail': detail.to_pandas(),
+        'expense_detail': build_expense_detail(expenses_df),
+    }, logs
+
+
+def calculate_pools(
+    pnl_df: pd.DataFrame,
+    cost_centers_df: pd.DataFrame,
+    include_cc_in_sga: bool = True,
+) -> Dict[str, Any]:
+    """Polars version of OverheadAllocator.calculate_pools (same keys)."""
+    def bucket_sums(df, bucket, amount, names):
+        return _lazy(df, text=(bucket,), numbers=(amount,)).select(
+            [pl.when(pl.col(bucket) == name).then(pl.col(amount)).otherwise(0.0).sum().alias(name)
+             for name in names]
+        ).collect()
+
+    pnl = {'DATA': 0.0, 'WORKPLACE': 0.0, 'SGA': 0.0, 'NIL': 0.0}
+    if not pnl_df.empty:
+        totals = bucket_sums(pnl_df, 'bucket', 'amount', list(pnl))
+        pnl = {name: float(totals[name][0]) for name in pnl}
+
+    data_from_cc = 0.0
+    sga_from_cc = 0.0
+    if (include_cc_in_sga and not cost_centers_df.empty
+            and 'total_cost' in cost_centers_df.columns and 'pool' in cost_centers_df.columns):
+        totals = bucket_sums(cost_centers_df, 'pool', 'total_cost', ['DATA', 'SGA'])
+        data_from_cc = float(totals['DATA'][0])
+        sga_from_cc = float(totals['SGA'][0])
+
+    return {
+        'sga_pool': pnl['SGA'] + sga_from_cc,
+        'data_pool': pnl['DATA'] + data_from_cc,
+        'workplace_pool': pnl['WORKPLACE'],
+        'sga_from_pnl': pnl['SGA'],
+        'data_from_pnl': pnl['DATA'],
+        'workplace_from_pnl': pnl['WORKPLACE'],
+        'nil_excluded': pnl['NIL'],
+        'sga_from_cc': sga_from_cc,
+        'data_from_cc': data_from_cc,
+    }
+
+
+def allocate(revenue_df: pd.DataFrame, pools: Dict[str, Any], tolerance: float = 0.01) -> pd.DataFrame:
+    """
+    Polars version of the allocate stage's frame: the three pro-rata pool
+    allocations (OverheadAllocator.allocate_*) followed by calculate_margins.
+
+    Raises:
+        ValueError: If an allocation does not reconcile to its pool within tolerance
+    """
+    plan = _lazy(
+        revenue_df.assign(**{c: revenue_df.get(c, 0.0) for c in ('labor_cost', 'expense_cost')}),
+        text=('allocation_tag',),
+        numbers=('revenue', 'labor_cost', 'expense_cost'),
+    )
+
+    shares = []
+    for column, tag, pool_key, _ in ALLOCATIONS:
+        eligible = pl.lit(True) if tag is None else (pl.col('allocation_tag') == tag)
+        total = pl.when(eligible).then(pl.col('revenue')).otherwise(0.0).sum()
+        shares.append(
+            pl.when(eligible & (total > 0))
+            .then(pl.col('revenue') / total * float(pools[pool_key]))
+            .otherwise(0.0)
+            .fill_null(0.0)
+            .alias(column)
+        )
+    costs = ['labor_cost', 'expense_cost'] + [column for column, _, _, _ in ALLOCATIONS]
+    plan = plan.with_columns(shares).with_columns(
+        [pl.col(c).fill_null(0.0) for c in ('labor_cost', 'expense_cost')]
+    ).with_columns(
+        # Subtracted one by one, in the order calculate_margins does
+        functools.reduce(lambda total, c: total - pl.col(c), costs, pl.col('revenue')).alias('margin_dollars')
+    ).with_columns(
+        pl.when(pl.col('revenue') != 0)
+        .then(pl.col('margin_dollars') / pl.col('revenue') * 100.0)
+        .otherwise(0.0)
+        .alias('margin_percent')
+    )
+
+    allocated, totals = pl.collect_all([
+        plan.select(costs + ['margin_dollars', 'margin_percent']),
+        plan.select(
+            [pl.col(column).sum() for column, _, _, _ in ALLOCATIONS]
+            + [pl.when(pl.lit(True) if tag is None else pl.col('allocation_tag') == tag)
+               .then(pl.col('revenue')).otherwise(0.0).sum().alias(f'{column}_revenue')
+               for column, tag, _, _ in ALLOCATIONS]
+        ),
+    ])
+
+    for column, _, pool_key, label in ALLOCATIONS:
+        if totals[f'{column}_revenue'][0] > 0 and abs(totals[column][0] - float(pools[pool_key])) > tolerance:
+            raise ValueError(f"{label} allocation does not reconcile to pool within tolerance")
+    return _assign(revenue_df, allocated)
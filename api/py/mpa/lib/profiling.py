@@ -0,0 +1,131 @@
+"""
+Opt-in Profiling for Monthly Performance Analysis
+
+Captures a call profile of one batch run so a slow month can be diagnosed
+from the function environment:
+- 'cprofile': deterministic profile, written as a .pstats file
+  (open with `python -m pstats` or snakeviz)
+- 'sample': low-overhead stack sampler, written as collapsed stacks
+  (.folded; feed to flamegraph.pl or speedscope)
+
+Enabled per request ("profile": true | "cprofile" | "sample") or for every
+run with MPA_PROFILE=cprofile|sample. When neither is set, callers skip the
+profiler entirely, so leaving the hook in production costs nothing.
+"""
+
+import cProfile
+import marshal
+import os
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Optional, Tuple, Union
+
+PROFILE_FOLDER = 'mpa_profiles'
+PROFILE_MODES = ('cprofile', 'sample')
+
+
+def profile_mode(flag: Union[bool, str, None] = None) -> Optional[str]:
+    """
+    Resolve the profiling mode from a request flag and MPA_PROFILE.
+
+    Returns:
+        'cprofile', 'sample' or None (profiling disabled)
+    """
+    env_value = os.environ.get('MPA_PROFILE', '').strip().lower()
+    env_mode = env_value if env_value in PROFILE_MODES else (
+        'cprofile' if env_value in ('1', 'on', 'true') else None
+    )
+
+    if isinstance(flag, str) and flag.lower() in PROFILE_MODES:
+        return flag.lower()
+    if flag:
+        return env_mode or 'cprofile'
+    return env_mode
+
+
+class StackSampler:
+    """Samples one thread's Python stack on an interval into collapsed stacks."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self._thread_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._run, name='mpa-profile-sampler', daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[';'.join(reversed(stack))] += 1
+
+    def collapsed(self) -> bytes:
+        """Collapsed-stack text: 'root;child;leaf <count>' per line."""
+        lines = [f"{stack} {count}" for stack, count in self.counts.most_common()]
+        return ('\n'.join(lines) + '\n').encode()
+
+
+class Profiler:
+    """
+    Context manager profiling the enclosed block in the given mode.
+
+    Example:
+        with Profiler('sample') as profiler:
+            run()
+        extension, content = profiler.artifact()
+    """
+
+    def __init__(self, mode: str):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode '{mode}'. Expected one of: {', '.join(PROFILE_MODES)}")
+        self.mode = mode
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+
+    def __enter__(self) -> 'Profiler':
+        if self.mode == 'cprofile':
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = StackSampler()
+            self._sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._profile is not None:
+            self._profile.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        return False
+
+    def artifact(self) -> Tuple[str, bytes]:
+        """Return (file extension, file bytes) for the captured profile."""
+        if self._profile is not None:
+            self._profile.create_stats()
+            # Same format as Profile.dump_stats, loadable by pstats.Stats
+            return 'pstats', marshal.dumps(self._profile.stats)
+        return 'folded', self._sampler.collapsed()
+
+
+def profile_path(batch_id: str, extension: str) -> str:
+    """Storage path for a batch's profile artifact."""
+    timestamp = datetime.utcnow().strftime('%Y-%m-%dT%H-%M-%S')
+    return f"{PROFILE_FOLDER}/{batch_id}/{timestamp}.{extension}"
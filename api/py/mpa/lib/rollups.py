@@ -0,0 +1,105 @@
+"""
+Batch Rollups for Monthly Performance Analysis
+
+Dashboard aggregates precomputed from the in-memory revenue centers once a
+batch is persisted, so views read a handful of rows from mpa_batch_rollups
+instead of re-aggregating mpa_revenue_centers on every request:
+- 'category': margins by analysis_category (one row per category per
+  batch; with month_name this is the category x month grid)
+- 'section': margins by proforma_section
+- 'tag': allocation_tag totals, including the Data and Workplace pool
+  shares allocated to each tag
+- 'top_margin' / 'bottom_margin': the N codes with the highest and lowest
+  margin dollars, ranked
+"""
+
+from typing import Any, Dict, List
+
+import pandas as pd
+
+TOP_N = 10
+
+# Label for revenue centers without a category, section or tag
+UNASSIGNED = 'Unassigned'
+
+# Summed revenue center columns carried on every rollup row
+ROLLUP_METRICS = (
+    'revenue',
+    'hours',
+    'labor_cost',
+    'expense_cost',
+    'sga_allocation',
+    'data_allocation',
+    'workplace_allocation',
+    'margin_dollars',
+)
+
+# rollup name -> revenue center grouping column
+GROUP_ROLLUPS = {
+    'category': 'analysis_category',
+    'section': 'proforma_section',
+    'tag': 'allocation_tag',
+}
+
+
+def _margin_percent(revenue: float, margin_dollars: float) -> float:
+    return margin_dollars / revenue * 100 if revenue > 0 else 0.0
+
+
+def _group_records(revenue_centers: pd.DataFrame, rollup: str, column: str) -> List[Dict[str, Any]]:
+    """One record per value of column, ordered by revenue."""
+    keys = revenue_centers[column] if column in revenue_centers.columns else pd.Series(index=revenue_centers.index, dtype=object)
+    keys = keys.where(keys.notna() & (keys.astype(str) != ''), UNASSIGNED).astype(str)
+
+    metrics = revenue_centers.reindex(columns=list(ROLLUP_METRICS)).apply(pd.to_numeric, errors='coerce').fillna(0.0)
+    grouped = metrics.groupby(keys, sort=False)
+    totals = grouped.sum().assign(code_count=grouped.size()).sort_values('revenue', ascending=False)
+
+    records = []
+    for rank, (key, row) in enumerate(totals.iterrows(), start=1):
+        record = {'rollup': rollup, 'group_key': key, 'rank': rank}
+        record.update({metric: float(row[metric]) for metric in ROLLUP_METRICS})
+        record['margin_percent'] = _margin_percent(record['revenue'], record['margin_dollars'])
+        record['code_count'] = int(row['code_count'])
+        records.append(record)
+    return records
+
+
+def _ranked_codes(revenue_centers: pd.DataFrame, rollup: str, ascending: bool, top_n: int) -> List[Dict[str, Any]]:
+    """Top (or bottom) codes by margin dollars."""
+    ranked = revenue_centers.sort_values(['margin_dollars', 'contract_code'], ascending=[ascending, True]).head(top_n)
+
+    records = []
+    for rank, row in enumerate(ranked.itertuples(index=False), start=1):
+        record = {'rollup': rollup, 'group_key': str(row.contract_code), 'rank': rank}
+        record.update({metric: float(getattr(row, metric, 0.0) or 0.0) for metric in ROLLUP_METRICS})
+        record['margin_percent'] = float(getattr(row, 'margin_percent', 0.0) or 0.0)
+        record['code_count'] = 1
+        records.append(record)
+    return records
+
+
+def compute_rollups(revenue_centers: pd.DataFrame, month_name: str, top_n: int = TOP_N) -> List[Dict[str, Any]]:
+    """
+    Compute all dashboard rollups for a batch.
+
+    Args:
+        revenue_centers: Allocated revenue centers (with margins)
+        month_name: Batch month, repeated on every row for cross-month views
+        top_n: Number of codes in the top/bottom margin rollups
+
+    Returns:
+        mpa_batch_rollups records (without batch_id)
+    """
+    if revenue_centers.empty:
+        return []
+
+    records: List[Dict[str, Any]] = []
+    for rollup, column in GROUP_ROLLUPS.items():
+        records.extend(_group_records(revenue_centers, rollup, column))
+    records.extend(_ranked_codes(revenue_centers, 'top_margin', False, top_n))
+    records.extend(_ranked_codes(revenue_centers, 'bottom_margin', True, top_n))
+
+    for record in records:
+        record['month_name'] = month_name
+    return records
@@ -0,0 +1,84 @@
+"""
+Typed Frame Schemas for Monthly Performance Analysis
+
+Optional compact dtypes for the loader outputs (MPA_TYPED_SCHEMA=on):
+- Codes, staff keys and free text (notes) become Arrow-backed strings
+  (string[pyarrow]) instead of Python str objects: a few bytes per value
+  plus the characters, rather than ~50 bytes of object overhead each
+- Harvest project names, repeated on every hours row, become a categorical
+- Numeric columns get an explicit dtype. Hours and money stay float64:
+  float32 cannot hold two-decimal values exactly (7.33 becomes
+  7.3299999237), which would change the stored hours and labor costs
+
+Values are unchanged, so every stage computes the same results; the
+string and categorical dtypes carry through groupbys, filters and merges
+between typed frames into the hours and expense detail. frame_memory()
+measures a frame's deep memory per column for the loader metrics and
+memory_report.py.
+"""
+
+import os
+from typing import Dict
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401 - required by the string[pyarrow] dtype
+    STRING_DTYPE = 'string[pyarrow]'
+except ImportError:
+    # Without pyarrow strings use pandas' own string dtype (still not object)
+    STRING_DTYPE = 'string'
+
+# Loader output -> column dtypes ('string' means STRING_DTYPE)
+FRAME_SCHEMAS: Dict[str, Dict[str, str]] = {
+    'proforma': {
+        'contract_code': 'string',
+        'project_name': 'string',
+        'proforma_section': 'string',
+        'analysis_category': 'string',
+        'allocation_tag': 'string',
+        'revenue': 'float64',
+    },
+    'compensation': {
+        'staff_key': 'string',
+        'hourly_cost': 'float64',
+        'strategy_used': 'string',
+    },
+    'hours': {
+        'date': 'datetime64[ns]',
+        'contract_code': 'string',
+        'staff_key': 'string',
+        'hours': 'float64',
+        'project_name': 'category',
+    },
+    'expenses': {
+        'date': 'datetime64[ns]',
+        'contract_code': 'string',
+        'amount': 'float64',
+        'notes': 'string',
+        'was_reimbursable': 'bool',
+    },
+}
+
+
+def typed_schema_enabled() -> bool:
+    """True when MPA_TYPED_SCHEMA is on."""
+    return os.environ.get('MPA_TYPED_SCHEMA', '').strip().lower() in ('1', 'on', 'true')
+
+
+def apply_schema(df: pd.DataFrame, frame: str) -> pd.DataFrame:
+    """Cast the columns of a loader output to its FRAME_SCHEMAS dtypes (others untouched)."""
+    dtypes = {
+        column: STRING_DTYPE if dtype == 'string' else dtype
+        for column, dtype in FRAME_SCHEMAS[frame].items()
+        if column in df.columns
+    }
+    return df.astype(dtypes)
+
+
+def frame_memory(df: pd.DataFrame) -> Dict[str, int]:
+    """Deep memory in bytes per column, plus 'total' (index included)."""
+    usage = df.memory_usage(deep=True)
+    report = {str(column): int(usage[column]) for column in df.columns}
+    report['total'] = int(usage.sum())
+    return report
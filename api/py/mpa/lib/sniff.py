@@ -0,0 +1,230 @@
+"""
+Upload Pre-flight Checks for Monthly Performance Analysis
+
+Reads only the workbook metadata (sheet names) and the first rows of each
+source file to catch, in milliseconds, the problems that would otherwise
+fail a batch after the pipeline has started:
+- Missing sheet ('PRO FORMA 2025', 'IncomeStatement')
+- Pro Forma header row, month column or total revenue row not found
+- Required columns missing (resolved with the loaders' own aliases)
+- P&L Total column not found
+- Harvest rows that all fall outside the batch month
+
+Each file gets a verdict {ok, errors, warnings, sheet, columns, ...}; the
+full pipeline still performs every check on the complete data.
+"""
+
+import time
+from io import BytesIO
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+
+try:
+    from .loaders import (
+        COMPENSATION_COLUMNS,
+        COMPENSATION_COMPONENTS,
+        EXPENSES_COLUMNS,
+        HOURS_COLUMNS,
+        PNL_SHEET,
+        PROFORMA_SHEET,
+        HarvestHoursLoader,
+        PnLLoader,
+        ProFormaLoader,
+        find_column,
+    )
+except ImportError:
+    from loaders import (
+        COMPENSATION_COLUMNS,
+        COMPENSATION_COMPONENTS,
+        EXPENSES_COLUMNS,
+        HOURS_COLUMNS,
+        PNL_SHEET,
+        PROFORMA_SHEET,
+        HarvestHoursLoader,
+        PnLLoader,
+        ProFormaLoader,
+        find_column,
+    )
+
+FILE_TYPES = ('proforma', 'compensation', 'hours', 'expenses', 'pnl')
+
+# Rows read per sheet; covers the Pro Forma header (10) and total revenue (20) scans
+SNIFF_ROWS = 25
+
+
+def _verdict(file_type: str) -> Dict[str, Any]:
+    return {'file': file_type, 'ok': True, 'errors': [], 'warnings': [], 'sheet': None, 'columns': {}}
+
+
+def _resolve_columns(df: pd.DataFrame, spec: Dict[str, Tuple[list, bool]], verdict: Dict[str, Any]):
+    """Resolve every field of a column spec, recording all missing required ones."""
+    for field, (candidates, required) in spec.items():
+        column = find_column(df, candidates)
+        if column is not None:
+            verdict['columns'][field] = str(column)
+        elif required:
+            verdict['errors'].append(f"Required column not found. Tried: {candidates}")
+
+
+def _check_month_dates(df: pd.DataFrame, column: Optional[str], month: Optional[str], verdict: Dict[str, Any]):
+    """Warn when none of the sampled rows fall inside the batch month."""
+    if not month or column is None:
+        return
+    start, end = HarvestHoursLoader(None, month)._get_month_range(month)
+    dates = pd.to_datetime(df[column], errors='coerce').dropna()
+    if len(dates) > 0 and not ((dates >= start) & (dates <= end)).any():
+        verdict['warnings'].append(
+            f"First {len(dates)} rows are dated {dates.min():%Y-%m-%d} to {dates.max():%Y-%m-%d}, "
+            f"outside {month}; they would be excluded"
+        )
+
+
+def _sniff_proforma(excel: pd.ExcelFile, month: Optional[str], verdict: Dict[str, Any]):
+    if PROFORMA_SHEET not in excel.sheet_names:
+        verdict['errors'].append(f"Sheet '{PROFORMA_SHEET}' not found (sheets: {', '.join(excel.sheet_names)})")
+        return
+    verdict['sheet'] = PROFORMA_SHEET
+    df = excel.parse(PROFORMA_SHEET, header=None, nrows=SNIFF_ROWS)
+    loader = ProFormaLoader(None, month or '')
+
+    try:
+        header_row = loader._find_header_row(df)
+        verdict['headerRow'] = header_row
+    except ValueError as e:
+        verdict['errors'].append(str(e))
+        return
+
+    if month:
+        try:
+            month_column = loader._find_month_column(df.iloc[header_row], month)
+            verdict['columns']['month'] = str(df.iloc[header_row, month_column])
+            verdict['monthColumn'] = month_column
+        except ValueError as e:
+            verdict['errors'].append(str(e))
+    else:
+        verdict['warnings'].append("No month given; month column not checked")
+
+    try:
+        verdict['totalRevenueRow'] = loader._find_total_revenue_row(df)
+    except ValueError as e:
+        verdict['errors'].append(str(e))
+
+
+def _sniff_compensation(excel: pd.ExcelFile, month: Optional[str], verdict: Dict[str, Any]):
+    verdict['sheet'] = excel.sheet_names[0]
+    df = excel.parse(0, nrows=SNIFF_ROWS)
+
+    _resolve_columns(df, {'last_name': (COMPENSATION_COLUMNS['last_name'], True)}, verdict)
+    for field in ('base_cost', 'total'):
+        column = find_column(df, COMPENSATION_COLUMNS[field])
+        if column is not None:
+            verdict['columns'][field] = str(column)
+            verdict['strategy'] = 'A' if field == 'base_cost' else 'B'
+            return
+
+    # Strategy B from components: every component is required
+    verdict['strategy'] = 'B'
+    _resolve_columns(df, {name: (candidates, True) for name, candidates in COMPENSATION_COMPONENTS.items()}, verdict)
+
+
+def _sniff_hours(excel: pd.ExcelFile, month: Optional[str], verdict: Dict[str, Any]):
+    verdict['sheet'] = excel.sheet_names[0]
+    df = excel.parse(0, nrows=SNIFF_ROWS)
+    _resolve_columns(df, HOURS_COLUMNS, verdict)
+    _check_month_dates(df, verdict['columns'].get('date'), month, verdict)
+
+
+def _sniff_expenses(excel: pd.ExcelFile, month: Optional[str], verdict: Dict[str, Any]):
+    verdict['sheet'] = excel.sheet_names[0]
+    df = excel.parse(0, nrows=SNIFF_ROWS)
+    _resolve_columns(df, EXPENSES_COLUMNS, verdict)
+
+
+def _sniff_pnl(excel: pd.ExcelFile, month: Optional[str], verdict: Dict[str, Any]):
+    if PNL_SHEET not in excel.sheet_names:
+        verdict['errors'].append(f"Sheet '{PNL_SHEET}' not found (sheets: {', '.join(excel.sheet_names)})")
+        return
+    verdict['sheet'] = PNL_SHEET
+    df = excel.parse(PNL_SHEET, header=0, nrows=SNIFF_ROWS)
+    try:
+        total_column = PnLLoader(None)._find_total_column(df)
+        verdict['columns']['total'] = str(df.columns[total_column])
+    except ValueError as e:
+        verdict['errors'].append(str(e))
+
+
+SNIFFERS = {
+    'proforma': _sniff_proforma,
+    'compensation': _sniff_compensation,
+    'hours': _sniff_hours,
+    'expenses': _sniff_expenses,
+    'pnl': _sniff_pnl,
+}
+
+
+def sniff_file(file_type: str, content: bytes, month: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Pre-flight check one source file.
+
+    Args:
+        file_type: One of FILE_TYPES
+        content: Workbook bytes
+        month: Batch month (e.g. 'November2025') for month column/date checks
+
+    Returns:
+        Verdict dict: ok, errors, warnings, sheet, resolved columns, elapsedMs
+    """
+    if file_type not in SNIFFERS:
+        raise ValueError(f"Unknown file type '{file_type}'. Expected one of: {', '.join(FILE_TYPES)}")
+
+    started = time.perf_counter()
+    verdict = _verdict(file_type)
+    try:
+        excel = pd.ExcelFile(BytesIO(content))
+    except Exception as e:
+        excel = None
+        verdict['errors'].append(f"Not a readable Excel workbook: {e}")
+
+    if excel is not None:
+        try:
+            with excel:
+                SNIFFERS[file_type](excel, month, verdict)
+        except ValueError as e:
+            # Invalid month format, or a sheet pandas cannot parse
+            verdict['errors'].append(str(e))
+
+    verdict['ok'] = not verdict['errors']
+    verdict['elapsedMs'] = round((time.perf_counter() - started) * 1000, 1)
+    return verdict
+
+
+def sniff_files(files: Dict[str, Optional[bytes]], month: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Pre-flight check a set of source files.
+
+    Args:
+        files: File type -> workbook bytes (None when not uploaded)
+        month: Batch month
+
+    Returns:
+        {'ok': bool, 'files': {type: verdict}, 'elapsedMs': float}
+    """
+    started = time.perf_counter()
+    verdicts: Dict[str, Any] = {}
+    for file_type in FILE_TYPES:
+        if file_type not in files:
+            continue
+        if files[file_type] is None:
+            verdict = _verdict(file_type)
+            verdict['ok'] = False
+            verdict['errors'].append("File not uploaded")
+            verdicts[file_type] = verdict
+        else:
+            verdicts[file_type] = sniff_file(file_type, files[file_type], month)
+
+    return {
+        'ok': all(v['ok'] for v in verdicts.values()),
+        'files': verdicts,
+        'elapsedMs': round((time.perf_counter() - started) * 1000, 1),
+    }
@@ -0,0 +1,189 @@
+"""
+Bounded-Memory Execution for Monthly Performance Analysis
+
+Keeps peak memory of a run under a configured budget (MPA_MEMORY_BUDGET_MB)
+on large months:
+- Harvest sheets are read and converted in chunks (iter_sheet_chunks)
+- Stage outputs are dropped as soon as no remaining stage reads them
+  (Pipeline.run(release=True))
+- Large intermediates that only a late stage reads (the hours and expense
+  detail frames) are spilled to Arrow IPC files and memory-mapped back
+- Detail rows are streamed to persistence one chunk at a time
+
+Peak RSS is compared against the budget after the run and reported in the
+batch metrics ('memory').
+"""
+
+import os
+import shutil
+import tempfile
+import uuid
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    HAS_PYARROW = True
+except ImportError:
+    # Without pyarrow frames stay in memory; release and streaming still apply
+    pa = None
+    HAS_PYARROW = False
+
+try:
+    from .instrumentation import max_rss_bytes
+except ImportError:
+    from instrumentation import max_rss_bytes
+
+# Rows per chunk for sheet reads, spilled frames and streamed detail writes
+DEFAULT_CHUNK_ROWS = 20000
+
+
+def default_memory_budget_mb() -> Optional[float]:
+    """Memory budget from MPA_MEMORY_BUDGET_MB, or None (unbounded mode)."""
+    value = os.environ.get('MPA_MEMORY_BUDGET_MB', '').strip()
+    return float(value) if value else None
+
+
+class SpilledFrame:
+    """
+    A DataFrame written to an Arrow IPC file and memory-mapped on access.
+
+    Exposes columns, shape and len() like a DataFrame so row counting and
+    instrumentation work unchanged; use as_frame() / iter_frame_chunks()
+    to read it.
+    """
+
+    def __init__(self, path: str, columns: list, rows: int):
+        self.path = path
+        self.columns = pd.Index(columns)
+        self.shape = (rows, len(columns))
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    @property
+    def empty(self) -> bool:
+        return self.shape[0] == 0
+
+    def table(self) -> 'pa.Table':
+        """The spilled table, memory-mapped (no copy until columns are read)."""
+        return pa.ipc.open_file(pa.memory_map(self.path, 'r')).read_all()
+
+    def to_pandas(self) -> pd.DataFrame:
+        return self.table().to_pandas()
+
+    def iter_chunks(self, rows: int) -> Iterator[pd.DataFrame]:
+        table = self.table()
+        for start in range(0, max(len(self), 1), rows):
+            yield table.slice(start, rows).to_pandas()
+
+
+def as_frame(value: Any) -> pd.DataFrame:
+    """A DataFrame for a DataFrame or SpilledFrame."""
+    return value.to_pandas() if isinstance(value, SpilledFrame) else value
+
+
+def iter_frame_chunks(value: Any, rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Frames of at most `rows` rows from a DataFrame or SpilledFrame."""
+    if isinstance(value, SpilledFrame):
+        yield from value.iter_chunks(rows)
+        return
+    for start in range(0, max(len(value), 1), rows):
+        yield value.iloc[start:start + rows]
+
+
+class SpillStore:
+    """
+    Temporary directory of spilled frames, removed by close().
+
+    Args:
+        directory: Parent directory (default: system temp dir)
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = tempfile.mkdtemp(prefix='mpa_spill_', dir=directory)
+
+    def spill(self, df: pd.DataFrame, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Any:
+        """
+        Write a frame to disk and return its SpilledFrame.
+
+        Frames Arrow cannot represent (e.g. mixed-type object columns) are
+        returned unchanged, as is everything when pyarrow is missing.
+        """
+        if not HAS_PYARROW:
+            return df
+        path = os.path.join(self.directory, f"{uuid.uuid4().hex}.arrow")
+        try:
+            # Converted chunk by chunk so only one chunk's Arrow copy exists
+            schema = pa.Schema.from_pandas(df, preserve_index=False)
+            with pa.OSFile(path, 'wb') as sink:
+                with pa.ipc.new_file(sink, schema) as writer:
+                    for start in range(0, len(df), chunk_rows):
+                        chunk = df.iloc[start:start + chunk_rows]
+                        writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+            return df
+        return SpilledFrame(path, list(df.columns), len(df))
+
+    def close(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class MemoryBudget:
+    """
+    Memory-budget settings and spill hook for one run.
+
+    Pass as Pipeline.run(on_output=budget) (alongside release=True): once a
+    stage listed in spill_frames produces its output, those frames are
+    replaced by SpilledFrames. The stage cache has already stored the
+    in-memory output by then.
+
+    Args:
+        budget_mb: Peak RSS budget in MB (includes the interpreter and libraries)
+        spill_frames: Stage name -> frame keys of its dict output to spill
+        chunk_rows: Rows per chunk for sheet reads and streamed writes
+        directory: Parent directory for spill files
+    """
+
+    def __init__(
+        self,
+        budget_mb: float,
+        spill_frames: Optional[Dict[str, Iterable[str]]] = None,
+        chunk_rows: int = DEFAULT_CHUNK_ROWS,
+        directory: Optional[str] = None,
+    ):
+        self.budget_mb = budget_mb
+        self.spill_frames = {stage: tuple(keys) for stage, keys in (spill_frames or {}).items()}
+        self.chunk_rows = chunk_rows
+        self.store = SpillStore(directory)
+        self.spilled: Dict[str, int] = {}
+
+    def __call__(self, stage: str, outputs: Dict[str, Any]):
+        keys = self.spill_frames.get(stage)
+        if not keys or not isinstance(outputs.get(stage), dict):
+            return
+        # New dict: the original may be shared with an in-memory stage cache
+        output = dict(outputs[stage])
+        for key in keys:
+            if isinstance(output.get(key), pd.DataFrame):
+                output[key] = self.store.spill(output[key], self.chunk_rows)
+                if isinstance(output[key], SpilledFrame):
+                    self.spilled[f"{stage}.{key}"] = len(output[key])
+        outputs[stage] = output
+
+    def report(self) -> Dict[str, Any]:
+        """Peak RSS against the budget, plus what was spilled."""
+        peak = max_rss_bytes()
+        peak_mb = round(peak / (1024 * 1024), 1) if peak is not None else None
+        return {
+            'budget_mb': self.budget_mb,
+            'peak_rss_mb': peak_mb,
+            'within_budget': peak_mb is None or peak_mb <= self.budget_mb,
+            'chunk_rows': self.chunk_rows,
+            'spilled': dict(self.spilled),
+        }
+
+    def close(self):
+        """Remove the spill files."""
+        self.store.close()
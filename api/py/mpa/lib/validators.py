@@ -4,10 +4,21 @@ Validation Rules for Monthly Performance Analysis
 Implements FAIL and WARN validation checks:
 - FAIL: Critical errors that block processing
 - WARN: Issues that continue with logging
+
+Checks are rules registered on a ValidationEngine and run against one
+shared ValidationContext (code/staff key sets and column totals built once
+per batch), with per-rule timings reported on the result.
+
+Rules that declare the pipeline stages whose output they read can also run
+early through a ValidationGate, failing the batch before later stages (and
+the database writes) are reached.
 """
 
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
 import pandas as pd
-from typing import List, Dict, Any
 
 
 class ValidationResult:
@@ -17,6 +28,8 @@ class ValidationResult:
         self.passes: List[str] = []
         self.warnings: List[str] = []
         self.failures: List[str] = []
+        # Rule name -> run time in milliseconds
+        self.timings: Dict[str, float] = {}
 
     def add_pass(self, message: str):
         """Record a passing validation."""
@@ -38,6 +51,12 @@ class ValidationResult:
         """Generate summary report."""
         return f"PASS: {len(self.passes)} | WARN: {len(self.warnings)} | FAIL: {len(self.failures)}"
 
+    def timing_summary(self, top: int = 3) -> str:
+        """Total rule time and the slowest rules."""
+        slowest = sorted(self.timings.items(), key=lambda item: item[1], reverse=True)[:top]
+        detail = ', '.join(f"{name} {ms:.1f}ms" for name, ms in slowest)
+        return f"{len(self.timings)} rules in {sum(self.timings.values()):.1f}ms ({detail})"
+
     def to_json(self) -> List[Dict[str, str]]:
         """Convert to JSON-serializable format for database storage."""
         items = []
@@ -50,228 +69,429 @@ class ValidationResult:
         return items
 
 
-class DataCompletenessValidator:
-    """
-    Validate data completeness.
-
-    FAIL conditions:
-    - Required files missing
-    - Required columns missing
-    - Pro Forma sheet missing
-    - Month column not found
-    - No project codes found
-    """
-
-    @staticmethod
-    def validate(data: dict, results: ValidationResult):
-        """Run basic data completeness checks using available data."""
-        required_keys = ['revenue_centers', 'cost_centers', 'non_revenue_clients', 'proforma', 'pools', 'hours', 'expenses', 'compensation', 'pnl']
-        missing = [k for k in required_keys if k not in data]
-        if missing:
-            results.add_failure(f"Missing required data keys: {', '.join(missing)}")
-            return
-
-        if getattr(data['revenue_centers'], 'empty', True):
-            results.add_failure("No revenue centers found")
-        else:
-            results.add_pass("Revenue centers loaded")
-
-        if 'sga_pool' in data['pools'] and 'data_pool' in data['pools'] and 'workplace_pool' in data['pools']:
-            results.add_pass("Overhead pools calculated")
-        else:
-            results.add_failure("Overhead pools missing required keys (sga_pool, data_pool, workplace_pool)")
-
-        if getattr(data['compensation'], 'empty', True):
-            results.add_failure("Compensation data missing or empty")
-        else:
-            results.add_pass("Compensation loaded")
-        if getattr(data['hours'], 'empty', True):
-            results.add_warning("Harvest Hours is empty")
-        if getattr(data['expenses'], 'empty', True):
-            results.add_warning("Harvest Expenses is empty")
-
-
-class KeyIntegrityValidator:
+class ValidationContext:
     """
-    Validate key integrity.
+    Data shared by every rule of one validation run.
 
-    FAIL conditions:
-    - Duplicate Last Name in Compensation
-    - Staff in Harvest Hours missing from Compensation
-    - Allocation tag conflict (both Data and Wellness for same code)
-    - Code is both Revenue Center and Cost Center
+    Contract code / staff key sets and column totals are built once per
+    frame on first use and reused by all rules, instead of each check
+    re-running .astype(str) over the same columns.
     """
 
-    @staticmethod
-    def validate(data: dict, results: ValidationResult):
-        """Run key integrity checks feasible with provided data."""
-        comp = data.get('compensation')
-        if comp is not None and not comp.empty:
-            dups = comp[comp['staff_key'].duplicated(keep=False)]
-            if len(dups) > 0:
-                dup_names = ', '.join(sorted(set(dups['staff_key'].astype(str))))
-                results.add_failure(f"Duplicate Last Names in Compensation: {dup_names}")
+    def __init__(self, data: dict, tolerance: float = 0.01):
+        self.data = data
+        self.tolerance = tolerance
+        self._sets: Dict[Tuple[str, str], FrozenSet[str]] = {}
+        self._sums: Dict[Tuple[str, str], float] = {}
+
+    def frame(self, key: str) -> Optional[pd.DataFrame]:
+        """The frame for a data key, or None when missing or empty."""
+        df = self.data.get(key)
+        if df is None or getattr(df, 'empty', True):
+            return None
+        return df
+
+    def keys(self, key: str, column: str) -> FrozenSet[str]:
+        """Distinct values of a key column as strings (empty if unavailable)."""
+        if (key, column) not in self._sets:
+            df = self.frame(key)
+            if df is None or column not in df.columns:
+                values: FrozenSet[str] = frozenset()
             else:
-                results.add_pass("Unique Last Names in Compensation")
+                # Stringify the distinct values only, not every row
+                values = frozenset(map(str, df[column].unique()))
+            self._sets[(key, column)] = values
+        return self._sets[(key, column)]
 
-        hours = data.get('hours')
-        if hours is not None and comp is not None and not hours.empty and not comp.empty:
-            missing_staff = set(hours['staff_key'].astype(str)) - set(comp['staff_key'].astype(str))
-            if missing_staff:
-                results.add_warning(f"Harvest Hours staff missing in Compensation: {', '.join(sorted(missing_staff))}")
-            else:
-                results.add_pass("All Harvest Hours staff have compensation records")
+    def codes(self, key: str) -> FrozenSet[str]:
+        """Contract codes of a frame."""
+        return self.keys(key, 'contract_code')
 
-        rev_codes = set(data['revenue_centers'].get('contract_code', pd.Series(dtype=str)))
-        cc_codes = set(data['cost_centers'].get('contract_code', pd.Series(dtype=str)))
-        conflict = rev_codes.intersection(cc_codes)
-        if conflict:
-            results.add_failure(f"Codes appear as both revenue and cost centers: {', '.join(sorted(conflict))}")
-        else:
-            results.add_pass("No revenue/cost center code conflicts")
+    def staff(self, key: str) -> FrozenSet[str]:
+        """Staff keys of a frame."""
+        return self.keys(key, 'staff_key')
 
+    def total(self, key: str, column: str) -> float:
+        """Sum of a numeric column."""
+        if (key, column) not in self._sums:
+            self._sums[(key, column)] = self.data[key][column].sum()
+        return self._sums[(key, column)]
 
-class PoolReasonablenessValidator:
-    """
-    Validate overhead pool sizes are reasonable.
 
-    WARN conditions:
-    - SG&A pool > 100% of revenue (possible but suspicious)
+class ValidationFailed(ValueError):
+    """Raised when a validation run has FAIL results; carries the results."""
+
+    def __init__(self, results: ValidationResult, stage: str):
+        self.results = results
+        self.stage = stage
+        super().__init__(f"Validation failed after {stage}: {'; '.join(results.failures)}")
 
-    FAIL conditions:
-    - SG&A pool > 200% of revenue (likely P&L extraction error)
+
+class ValidationRule:
     """
+    A named check and the data it reads.
 
-    @staticmethod
-    def validate(data: dict, results: ValidationResult):
-        """Check pool sizes against revenue."""
-        pools = data.get('pools')
-        revenue_df = data.get('revenue_centers')
-
-        if pools and revenue_df is not None and not revenue_df.empty:
-            total_revenue = revenue_df['revenue'].sum()
-            sga_pool = pools.get('sga_pool', 0)
-
-            if total_revenue > 0:
-                sga_ratio = sga_pool / total_revenue
-
-                if sga_ratio > 2.0:
-                    results.add_failure(
-                        f"SG&A pool (${sga_pool:,.2f}) is {sga_ratio:.1f}x revenue (${total_revenue:,.2f}) - "
-                        "likely P&L extraction error (income/subtotals included)"
-                    )
-                elif sga_ratio > 1.0:
-                    results.add_warning(
-                        f"SG&A pool (${sga_pool:,.2f}) is {sga_ratio:.1f}x revenue (${total_revenue:,.2f}) - "
-                        "verify this is expected"
-                    )
-                else:
-                    results.add_pass(f"SG&A pool is {sga_ratio:.1%} of revenue (reasonable)")
-
-
-class MathematicalValidator:
+    Args:
+        name: Unique rule name
+        func: Called as func(ctx, results)
+        needs: Data keys the rule reads; the rule is skipped without them
+        stages: Pipeline stages whose output provides those keys. Rules with
+            stages run as soon as those outputs exist (see ValidationGate);
+            rules without run only in the full validation.
     """
-    Validate mathematical reconciliations.
 
-    Checks (with tolerance):
-    - Sum(project revenues) == Pro Forma total revenue (+/-$0.01)
-    - Sum(SG&A allocations) == SG&A pool (+/-$0.01)
-    - Sum(Data allocations) == Data pool (+/-$0.01)
-    - Sum(Workplace allocations) == Workplace pool (+/-$0.01)
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[ValidationContext, ValidationResult], None],
+        needs: Iterable[str] = (),
+        stages: Iterable[str] = (),
+    ):
+        self.name = name
+        self.func = func
+        self.needs = tuple(needs)
+        self.stages = tuple(stages)
+
+
+class ValidationEngine:
     """
+    Ordered registry of validation rules.
 
-    def __init__(self, tolerance: float = 0.01):
-        self.tolerance = tolerance
+    Rules run in registration order against one shared ValidationContext;
+    a rule is skipped when a data key it needs is absent. Each rule's run
+    time is recorded in ValidationResult.timings.
 
-    def validate(self, data: dict, results: ValidationResult):
-        """Run reconciliation checks using revenue_centers and pools."""
-        rev = data['revenue_centers']
-        pools = data['pools']
-        if getattr(rev, 'empty', True):
-            return
-
-        if 'proforma' in data and not getattr(data['proforma'], 'empty', True):
-            proforma_total = data['proforma']['revenue'].sum() if 'revenue' in data['proforma'].columns else None
-            if proforma_total is not None:
-                diff_rev = abs(rev['revenue'].sum() - float(proforma_total))
-                if diff_rev <= self.tolerance:
-                    results.add_pass(f"Revenue sum matches Pro Forma (+/-{self.tolerance})")
-                else:
-                    results.add_failure(f"Revenue sum does not match Pro Forma (diff ${diff_rev:,.2f})")
-
-        for col, key in [('sga_allocation', 'sga_pool'), ('data_allocation', 'data_pool'), ('workplace_allocation', 'workplace_pool')]:
-            if col in rev.columns and key in pools:
-                diff = abs(rev[col].sum() - float(pools[key]))
-                if diff <= self.tolerance:
-                    results.add_pass(f"{col.replace('_', ' ').title()} sums to pool (+/-{self.tolerance})")
-                else:
-                    results.add_failure(f"{col.replace('_', ' ').title()} does not sum to pool (diff ${diff:,.2f})")
-
-
-class ReasonablenessValidator:
+    Register rules with the decorator:
+
+        @engine.rule('my_check', needs=('revenue_centers',), stages=('classify',))
+        def my_check(ctx, results):
+            ...
     """
-    Validate reasonableness (warnings only).
-
-    WARN conditions:
-    - Harvest rows outside month date range
-    - Unknown Billable values in expenses
-    - Pro Forma code has revenue but no Harvest hours
-    - Harvest code not in Pro Forma and not in cost centers
-    - P&L account not matched by tagging rules
+
+    def __init__(self):
+        self.rules: 'OrderedDict[str, ValidationRule]' = OrderedDict()
+
+    def rule(self, name: str, needs: Iterable[str] = (), stages: Iterable[str] = ()):
+        """Decorator registering a function as a rule."""
+        def decorator(func):
+            self.add(ValidationRule(name, func, needs, stages))
+            return func
+        return decorator
+
+    def add(self, rule: ValidationRule):
+        """Register a rule after the existing ones."""
+        if rule.name in self.rules:
+            raise ValueError(f"Duplicate validation rule: {rule.name}")
+        self.rules[rule.name] = rule
+
+    def run(
+        self,
+        data: dict,
+        tolerance: float = 0.01,
+        rules: Optional[Iterable[str]] = None,
+    ) -> ValidationResult:
+        """Run every applicable rule (or only the named ones) and collect the results."""
+        selected = None if rules is None else set(rules)
+        context = ValidationContext(data, tolerance)
+        results = ValidationResult()
+        for rule in self.rules.values():
+            if selected is not None and rule.name not in selected:
+                continue
+            if any(key not in data for key in rule.needs):
+                continue
+            started = time.perf_counter()
+            rule.func(context, results)
+            results.timings[rule.name] = round((time.perf_counter() - started) * 1000, 3)
+        return results
+
+
+class ValidationGate:
     """
+    Runs staged rules during a pipeline run, as soon as their inputs exist.
 
-    @staticmethod
-    def validate(data: dict, results: ValidationResult):
-        """Reasonableness checks based on provided data."""
-        rev = data.get('revenue_centers')
-        hours = data.get('hours')
-        cc = data.get('cost_centers')
-        pnl = data.get('pnl')
-
-        if rev is not None and not rev.empty:
-            if 'hours' in rev.columns:
-                no_hours = rev[rev['hours'].fillna(0) == 0]
-                if len(no_hours) > 0:
-                    codes = ', '.join(sorted(no_hours['contract_code'].astype(str).tolist())[:5])
-                    results.add_warning(f"{len(no_hours)} revenue centers have revenue but no hours: {codes}...")
-
-        if hours is not None and not hours.empty and rev is not None:
-            rev_codes = set(rev['contract_code'].astype(str))
-            cc_codes = set(cc['contract_code'].astype(str)) if cc is not None and not cc.empty else set()
-            hrs_codes = set(hours['contract_code'].astype(str))
-            missing_rev = hrs_codes - rev_codes - cc_codes
-            if missing_rev:
-                codes = ', '.join(sorted(missing_rev)[:5])
-                results.add_warning(f"{len(missing_rev)} codes have hours but no revenue (non-revenue clients): {codes}...")
-
-        if pnl is not None and not pnl.empty and {'matched_by', 'bucket'}.issubset(set(pnl.columns)):
-            unmatched = pnl[(pnl['matched_by'] == 'default') & (pnl['bucket'] == 'SGA')]
-            if len(unmatched) > 0:
-                accounts = ', '.join(sorted(unmatched['account_name'].astype(str).tolist())[:5])
-                results.add_warning(f"{len(unmatched)} P&L accounts defaulted to SG&A (unmatched): {accounts}...")
-            else:
-                results.add_pass("All P&L accounts matched by tagging rules or assigned appropriately")
+    Pass as Pipeline.run(on_output=gate). After each stage output becomes
+    available, every rule whose declared stages are all available (and that
+    has not run yet) is run on the data those stages provide. The first
+    FAIL raises ValidationFailed, aborting the run before any later stage.
 
+    Args:
+        build_data: Called as build_data(outputs, stages) -> validation data
+        engine: Rule registry (default: default_engine)
+        tolerance: Tolerance for mathematical checks
+    """
 
-def run_all_validations(data: dict, tolerance: float = 0.01) -> ValidationResult:
+    def __init__(
+        self,
+        build_data: Callable[[Dict[str, Any], Iterable[str]], dict],
+        engine: Optional['ValidationEngine'] = None,
+        tolerance: float = 0.01,
+    ):
+        self.build_data = build_data
+        self.engine = engine or default_engine
+        self.tolerance = tolerance
+        self.checked: List[str] = []
+
+    def __call__(self, stage: str, outputs: Dict[str, Any]):
+        for rule in self.engine.rules.values():
+            if not rule.stages or rule.name in self.checked:
+                continue
+            if any(name not in outputs for name in rule.stages):
+                continue
+            self.checked.append(rule.name)
+            results = self.engine.run(self.build_data(outputs, rule.stages), self.tolerance, rules=[rule.name])
+            if results.has_failures():
+                raise ValidationFailed(results, stage)
+
+
+default_engine = ValidationEngine()
+
+
+# ============================================
+# Data completeness
+# FAIL: required data missing, no revenue centers, pools incomplete,
+#       compensation empty
+# WARN: Harvest hours or expenses empty
+# ============================================
+
+@default_engine.rule('data_completeness')
+def data_completeness(ctx: ValidationContext, results: ValidationResult):
+    """Run basic data completeness checks using available data."""
+    data = ctx.data
+    required_keys = ['revenue_centers', 'cost_centers', 'non_revenue_clients', 'proforma', 'pools', 'hours', 'expenses', 'compensation', 'pnl']
+    missing = [k for k in required_keys if k not in data]
+    if missing:
+        results.add_failure(f"Missing required data keys: {', '.join(missing)}")
+        return
+
+    if ctx.frame('revenue_centers') is None:
+        results.add_failure("No revenue centers found")
+    else:
+        results.add_pass("Revenue centers loaded")
+
+    if 'sga_pool' in data['pools'] and 'data_pool' in data['pools'] and 'workplace_pool' in data['pools']:
+        results.add_pass("Overhead pools calculated")
+    else:
+        results.add_failure("Overhead pools missing required keys (sga_pool, data_pool, workplace_pool)")
+
+    if ctx.frame('compensation') is None:
+        results.add_failure("Compensation data missing or empty")
+    else:
+        results.add_pass("Compensation loaded")
+    if ctx.frame('hours') is None:
+        results.add_warning("Harvest Hours is empty")
+    if ctx.frame('expenses') is None:
+        results.add_warning("Harvest Expenses is empty")
+
+
+# ============================================
+# Key integrity
+# FAIL: duplicate Last Name in Compensation; code is both a revenue and
+#       a cost center
+# WARN: Harvest Hours staff missing from Compensation
+# ============================================
+
+@default_engine.rule(
+    'unique_staff_keys',
+    needs=('compensation',),
+    stages=('load_compensation',),
+)
+def unique_staff_keys(ctx: ValidationContext, results: ValidationResult):
+    """Compensation must have one row per staff key."""
+    comp = ctx.frame('compensation')
+    if comp is None:
+        return
+    dups = comp[comp['staff_key'].duplicated(keep=False)]
+    if len(dups) > 0:
+        dup_names = ', '.join(sorted(set(dups['staff_key'].astype(str))))
+        results.add_failure(f"Duplicate Last Names in Compensation: {dup_names}")
+    else:
+        results.add_pass("Unique Last Names in Compensation")
+
+
+@default_engine.rule(
+    'hours_staff_in_compensation',
+    needs=('hours', 'compensation'),
+    stages=('load_hours', 'load_compensation'),
+)
+def hours_staff_in_compensation(ctx: ValidationContext, results: ValidationResult):
+    """Every staff key in Harvest Hours should have a compensation record."""
+    if ctx.frame('hours') is None or ctx.frame('compensation') is None:
+        return
+    missing_staff = ctx.staff('hours') - ctx.staff('compensation')
+    if missing_staff:
+        results.add_warning(f"Harvest Hours staff missing in Compensation: {', '.join(sorted(missing_staff))}")
+    else:
+        results.add_pass("All Harvest Hours staff have compensation records")
+
+
+@default_engine.rule(
+    'revenue_cost_center_conflict',
+    needs=('revenue_centers', 'cost_centers'),
+    stages=('classify',),
+)
+def revenue_cost_center_conflict(ctx: ValidationContext, results: ValidationResult):
+    """A code cannot be both a revenue center and a cost center."""
+    conflict = ctx.codes('revenue_centers') & ctx.codes('cost_centers')
+    if conflict:
+        results.add_failure(f"Codes appear as both revenue and cost centers: {', '.join(sorted(conflict))}")
+    else:
+        results.add_pass("No revenue/cost center code conflicts")
+
+
+# ============================================
+# Pool reasonableness
+# WARN: SG&A pool > 100% of revenue (possible but suspicious)
+# FAIL: SG&A pool > 200% of revenue (likely P&L extraction error)
+# ============================================
+
+@default_engine.rule(
+    'sga_pool_reasonableness',
+    needs=('pools', 'revenue_centers'),
+    stages=('classify', 'pools'),
+)
+def sga_pool_reasonableness(ctx: ValidationContext, results: ValidationResult):
+    """Check the SG&A pool size against revenue."""
+    pools = ctx.data['pools']
+    if not pools or ctx.frame('revenue_centers') is None:
+        return
+
+    total_revenue = ctx.total('revenue_centers', 'revenue')
+    sga_pool = pools.get('sga_pool', 0)
+    if total_revenue <= 0:
+        return
+
+    sga_ratio = sga_pool / total_revenue
+    if sga_ratio > 2.0:
+        results.add_failure(
+            f"SG&A pool (${sga_pool:,.2f}) is {sga_ratio:.1f}x revenue (${total_revenue:,.2f}) - "
+            "likely P&L extraction error (income/subtotals included)"
+        )
+    elif sga_ratio > 1.0:
+        results.add_warning(
+            f"SG&A pool (${sga_pool:,.2f}) is {sga_ratio:.1f}x revenue (${total_revenue:,.2f}) - "
+            "verify this is expected"
+        )
+    else:
+        results.add_pass(f"SG&A pool is {sga_ratio:.1%} of revenue (reasonable)")
+
+
+# ============================================
+# Mathematical reconciliation (+/- tolerance)
+# - Sum(project revenues) == Pro Forma total revenue
+# - Sum(SG&A / Data / Workplace allocations) == the pool
+# ============================================
+
+@default_engine.rule(
+    'proforma_revenue_reconciliation',
+    needs=('revenue_centers', 'proforma'),
+    stages=('load_proforma', 'classify'),
+)
+def proforma_revenue_reconciliation(ctx: ValidationContext, results: ValidationResult):
+    """Revenue center revenue must sum to the Pro Forma total."""
+    proforma = ctx.frame('proforma')
+    if ctx.frame('revenue_centers') is None or proforma is None or 'revenue' not in proforma.columns:
+        return
+
+    diff_rev = abs(ctx.total('revenue_centers', 'revenue') - float(ctx.total('proforma', 'revenue')))
+    if diff_rev <= ctx.tolerance:
+        results.add_pass(f"Revenue sum matches Pro Forma (+/-{ctx.tolerance})")
+    else:
+        results.add_failure(f"Revenue sum does not match Pro Forma (diff ${diff_rev:,.2f})")
+
+
+@default_engine.rule(
+    'pool_allocation_reconciliation',
+    needs=('revenue_centers', 'pools'),
+    stages=('allocate', 'pools'),
+)
+def pool_allocation_reconciliation(ctx: ValidationContext, results: ValidationResult):
+    """Each pool's allocations must sum to the pool."""
+    rev = ctx.frame('revenue_centers')
+    pools = ctx.data['pools']
+    if rev is None:
+        return
+
+    for col, key in [('sga_allocation', 'sga_pool'), ('data_allocation', 'data_pool'), ('workplace_allocation', 'workplace_pool')]:
+        if col in rev.columns and key in pools:
+            diff = abs(ctx.total('revenue_centers', col) - float(pools[key]))
+            if diff <= ctx.tolerance:
+                results.add_pass(f"{col.replace('_', ' ').title()} sums to pool (+/-{ctx.tolerance})")
+            else:
+                results.add_failure(f"{col.replace('_', ' ').title()} does not sum to pool (diff ${diff:,.2f})")
+
+
+# ============================================
+# Reasonableness (warnings only)
+# - Pro Forma code has revenue but no Harvest hours
+# - Harvest code not in Pro Forma and not in cost centers
+# - P&L account not matched by tagging rules
+# ============================================
+
+@default_engine.rule(
+    'revenue_without_hours',
+    needs=('revenue_centers',),
+    stages=('direct_costs',),
+)
+def revenue_without_hours(ctx: ValidationContext, results: ValidationResult):
+    """Revenue centers with no Harvest hours."""
+    rev = ctx.frame('revenue_centers')
+    if rev is None or 'hours' not in rev.columns:
+        return
+    no_hours = rev[rev['hours'].fillna(0) == 0]
+    if len(no_hours) > 0:
+        codes = ', '.join(sorted(no_hours['contract_code'].astype(str).tolist())[:5])
+        results.add_warning(f"{len(no_hours)} revenue centers have revenue but no hours: {codes}...")
+
+
+@default_engine.rule(
+    'hours_without_revenue',
+    needs=('hours', 'revenue_centers'),
+    stages=('load_hours', 'classify'),
+)
+def hours_without_revenue(ctx: ValidationContext, results: ValidationResult):
+    """Codes with hours that are neither revenue nor cost centers."""
+    if ctx.frame('hours') is None or ctx.data['revenue_centers'] is None:
+        return
+    missing_rev = ctx.codes('hours') - ctx.codes('revenue_centers') - ctx.codes('cost_centers')
+    if missing_rev:
+        codes = ', '.join(sorted(missing_rev)[:5])
+        results.add_warning(f"{len(missing_rev)} codes have hours but no revenue (non-revenue clients): {codes}...")
+
+
+@default_engine.rule(
+    'pnl_tagging',
+    needs=('pnl',),
+    stages=('load_pnl',),
+)
+def pnl_tagging(ctx: ValidationContext, results: ValidationResult):
+    """P&L accounts that fell through to the SG&A default."""
+    pnl = ctx.frame('pnl')
+    if pnl is None or not {'matched_by', 'bucket'}.issubset(set(pnl.columns)):
+        return
+    unmatched = pnl[(pnl['matched_by'] == 'default') & (pnl['bucket'] == 'SGA')]
+    if len(unmatched) > 0:
+        accounts = ', '.join(sorted(unmatched['account_name'].astype(str).tolist())[:5])
+        results.add_warning(f"{len(unmatched)} P&L accounts defaulted to SG&A (unmatched): {accounts}...")
+    else:
+        results.add_pass("All P&L accounts matched by tagging rules or assigned appropriately")
+
+
+def run_all_validations(
+    data: dict,
+    tolerance: float = 0.01,
+    engine: Optional[ValidationEngine] = None,
+) -> ValidationResult:
     """
     Run all validation checks.
 
     Args:
         data: Dictionary containing all loaded data
         tolerance: Tolerance for mathematical checks
+        engine: Rule registry to run (default: default_engine)
 
     Returns:
-        ValidationResult with all checks
+        ValidationResult with all checks and per-rule timings
 
     Note: Does NOT raise on failures - caller should check has_failures()
     """
-    results = ValidationResult()
-
-    DataCompletenessValidator.validate(data, results)
-    KeyIntegrityValidator.validate(data, results)
-    PoolReasonablenessValidator.validate(data, results)
-    MathematicalValidator(tolerance).validate(data, results)
-    ReasonablenessValidator.validate(data, results)
-
-    return results
+    return (engine or default_engine).run(data, tolerance)
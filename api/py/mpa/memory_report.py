@@ -0,0 +1,81 @@
+"""
+Monthly Performance Analysis - Frame Memory Report
+
+Loads a month's workbooks twice, with the default loader dtypes and with
+the typed schema (lib/schema.py, MPA_TYPED_SCHEMA=on), and prints the deep
+memory of every column of each frame before and after.
+
+Usage:
+    python api/py/mpa/memory_report.py --month November2025 \
+        --hours Hours.xlsx --expenses Expenses.xlsx \
+        [--proforma ProForma.xlsx] [--compensation Comp.xlsx]
+"""
+
+import argparse
+import os
+import sys
+from io import BytesIO
+from typing import Callable, Dict, List, Optional
+
+# Add lib directory to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+lib_dir = os.path.join(current_dir, 'lib')
+if lib_dir not in sys.path:
+    sys.path.insert(0, lib_dir)
+
+from loaders import CompensationLoader, HarvestExpensesLoader, HarvestHoursLoader, ProFormaLoader
+from schema import frame_memory
+
+
+def loaders(args) -> Dict[str, Callable]:
+    """Frame name -> loader factory taking typed, for the files given."""
+    available = {
+        'proforma': lambda f, typed: ProFormaLoader(f, args.month, typed=typed),
+        'compensation': lambda f, typed: CompensationLoader(f, typed=typed),
+        'hours': lambda f, typed: HarvestHoursLoader(f, args.month, typed=typed),
+        'expenses': lambda f, typed: HarvestExpensesLoader(f, typed=typed),
+    }
+    return {name: factory for name, factory in available.items() if getattr(args, name)}
+
+
+def _mb(size: int) -> str:
+    return f"{size / (1024 * 1024):.2f}MB"
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Compare frame memory with and without the typed schema')
+    parser.add_argument('--month', required=True, help="Month identifier, e.g. 'November2025'")
+    parser.add_argument('--hours', help='Harvest hours workbook')
+    parser.add_argument('--expenses', help='Harvest expenses workbook')
+    parser.add_argument('--proforma', help='Pro forma workbook')
+    parser.add_argument('--compensation', help='Compensation workbook')
+    args = parser.parse_args(argv)
+
+    factories = loaders(args)
+    if not factories:
+        parser.error('give at least one workbook')
+
+    before_total = after_total = 0
+    for name, factory in factories.items():
+        with open(getattr(args, name), 'rb') as f:
+            content = f.read()
+        before = factory(BytesIO(content), False).load()
+        after = factory(BytesIO(content), True).load()
+        before_usage, after_usage = frame_memory(before), frame_memory(after)
+
+        print(f"{name} ({len(before)} rows)")
+        for column in before.columns:
+            print(
+                f"  {column:<20} {str(before[column].dtype):>16} {_mb(before_usage[column]):>10}"
+                f"  -> {str(after[column].dtype):>16} {_mb(after_usage[column]):>10}"
+            )
+        print(f"  {'total':<20} {'':>16} {_mb(before_usage['total']):>10}  -> {'':>16} {_mb(after_usage['total']):>10}")
+        before_total += before_usage['total']
+        after_total += after_usage['total']
+
+    saved = 1 - after_total / before_total if before_total else 0.0
+    print(f"all frames: {_mb(before_total)} -> {_mb(after_total)} ({saved:.0%} smaller)")
+
+
+if __name__ == '__main__':
+    main()
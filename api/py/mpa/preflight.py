@@ -0,0 +1,120 @@
+"""
+Monthly Performance Analysis - Upload Pre-flight Endpoint
+
+Vercel Python Function that checks source workbooks before a batch is
+processed or queued, reading only sheet names and the first rows of each
+file (see lib/sniff.py).
+
+POST /api/mpa/preflight
+Body: { "batchId": "uuid" }
+    Checks the batch's uploaded files (month from the batch)
+
+POST /api/mpa/preflight?type=hours&month=November2025
+Body: raw workbook bytes
+    Checks one file before it is uploaded
+
+Response: { "success": true, "ok": bool, "files": {type: verdict}, "elapsedMs" }
+where each verdict lists errors (the batch would fail), warnings, the sheet
+used and the resolved column headers. A bad file is still a 200 response
+with ok = false.
+"""
+
+import json
+import os
+import sys
+import traceback
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlparse
+
+# Add lib directory to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+lib_dir = os.path.join(current_dir, 'lib')
+if lib_dir not in sys.path:
+    sys.path.insert(0, lib_dir)
+
+# Load environment from .env if running locally
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+from db import get_client
+from sniff import FILE_TYPES, sniff_file, sniff_files
+
+
+class handler(BaseHTTPRequestHandler):
+    """Vercel Python Function handler."""
+
+    def do_POST(self):
+        """Check a batch's uploaded files, or one raw workbook."""
+        try:
+            query = {key: values[-1] for key, values in parse_qs(urlparse(self.path).query).items()}
+            content_length = int(self.headers.get('Content-Length', 0))
+            body = self.rfile.read(content_length)
+
+            if query.get('type'):
+                if not body:
+                    self._send_error(400, "Workbook body is required")
+                    return
+                verdict = sniff_file(query['type'], body, query.get('month'))
+                result = {
+                    'ok': verdict['ok'],
+                    'files': {verdict['file']: verdict},
+                    'elapsedMs': verdict['elapsedMs'],
+                }
+                self._send_json(200, {'success': True, **result})
+                return
+
+            data = json.loads(body) if body else {}
+            batch_id = data.get('batchId')
+            if not batch_id:
+                self._send_error(400, "batchId or ?type= with a workbook body is required")
+                return
+
+            db = get_client()
+            batch = db.get_batch(batch_id)
+            if not batch:
+                self._send_error(404, f"Batch {batch_id} not found")
+                return
+
+            files = {}
+            for file_type in FILE_TYPES:
+                path = batch.get(f'{file_type}_file_path')
+                files[file_type] = db.download_file(path).getvalue() if path else None
+
+            result = sniff_files(files, batch.get('month_name'))
+            self._send_json(200, {'success': True, 'batchId': batch_id, **result})
+
+        except ValueError as e:
+            self._send_error(400, str(e))
+
+        except Exception as e:
+            print(f"MPA Preflight Error: {traceback.format_exc()}")
+            self._send_error(500, f"Internal error: {str(e)}")
+
+    def do_OPTIONS(self):
+        """Handle CORS preflight."""
+        self.send_response(200)
+        self._send_cors_headers()
+        self.end_headers()
+
+    def _send_json(self, status: int, data: dict):
+        """Send JSON response."""
+        body = json.dumps(data, default=str).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self._send_cors_headers()
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: int, message: str):
+        """Send error response."""
+        self._send_json(status, {'success': False, 'error': message})
+
+    def _send_cors_headers(self):
+        """Add CORS headers."""
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
@@ -4,22 +4,81 @@ Monthly Performance Analysis - Process Endpoint
 Vercel Python Function that runs the full MPA analysis pipeline.
 
 POST /api/mpa/process
-Body: { "batchId": "uuid" }
+Body: { "batchId": "uuid", "async": false, "mode": "full", "force": false,
+        "incremental": false }
+
+If a completed batch has identical inputs (same month, file contents, config
+and code version), its results are returned, copied to this batch, without
+running the pipeline; "force": true recomputes anyway.
+
+With "mode": "summary" the run stops at the headline numbers: only the batch
+summary, mpa_revenue_centers and the dashboard rollups are written
+(result_mode = 'summary'); rows a previous full run left in the other result
+tables are deleted. A later full run of the same batch reuses the cached
+stages and adds the cost centers, non-revenue clients, detail rows and pools
+detail.
+
+With "stream": true (or Accept: application/x-ndjson) the response is
+NDJSON: one line per stage start/end event with elapsed time and row
+counts as they happen, then a final {"event": "result", "status", "result"}
+line carrying the same body the non-streaming response would return.
+
+With "profile": true | "cprofile" | "sample" (or MPA_PROFILE set) the run
+is profiled and the artifact is stored at mpa_profiles/<batch_id>/.
+
+With MPA_MEMORY_BUDGET_MB set the run is bounded-memory (lib/spill.py):
+Harvest files are read in chunks, stage outputs are freed once no later
+stage reads them, the detail frames are spilled to disk until persist and
+detail rows are streamed to the database in chunks. Peak RSS against the
+budget is reported in the batch metrics as 'memory'.
+
+With MPA_TYPED_SCHEMA=on the loaders return Arrow-backed string and
+categorical columns (lib/schema.py); each loader's output size is recorded
+in the metrics as bytes_out.
+
+With "incremental": true (or MPA_INCREMENTAL=on) the batch is an open
+month run daily (lib/incremental.py): only Harvest rows that are new or
+were retracted since its last run update the running month-to-date
+aggregates, and every later stage reads those aggregates.
+
+With MPA_ENGINE=polars (and polars installed) the direct-cost, pool and
+allocation stages run as lazy Polars query plans (lib/polars_engine.py).
+
+With "async": true the batch is queued for the background worker
+(mpa/worker.py) and the response returns immediately with its job id.
+The local backend (MPA_BACKEND=local) has no queue and answers 400.
+
+Once half the time budget (MPA_TIME_BUDGET_SECONDS, default 50s of the 60s
+function limit) has passed, completed stages are checkpointed under the
+batch id. If the budget runs out, the response is 202 with the pending
+stages; POST again with the same batchId to resume from the last completed
+stage. Runs that finish in the first half write no checkpoints.
 
 The batch must already exist in mpa_analysis_batches with file paths populated.
 This function:
 1. Downloads files from Supabase Storage
-2. Runs the analysis pipeline
-3. Saves results to database
-4. Updates batch status
+2. Runs the analysis pipeline as a stage graph (unchanged stages are
+   reused from the stage cache). Validation rules run as soon as the
+   stages they read complete; any FAIL marks the batch failed (with its
+   validation results) before later stages and before anything is written
+3. Saves results to database (MPA_PERSIST_MODE=rpc writes every table and
+   the batch summary in one transactional mpa_persist_batch call;
+   MPA_DETAIL_STORE=parquet keeps the drill-down detail as Parquet in storage)
+4. Refreshes the dashboard rollups (mpa_batch_rollups)
+5. Updates batch status
 """
 
+import hashlib
 import json
 import os
 import sys
+import time
 import traceback
 from http.server import BaseHTTPRequestHandler
 from io import BytesIO
+from typing import Callable, Iterable, Optional, Union
+
+import pandas as pd
 
 # Add lib directory to path for imports
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -43,137 +102,512 @@ from loaders import (
 )
 from classification import ProjectClassifier, classify_all_activity
 from computations import (
-    calculate_labor_costs,
-    calculate_expense_costs,
     merge_direct_costs,
     calculate_cost_center_costs,
     calculate_non_revenue_client_costs,
 )
 from allocations import OverheadAllocator, calculate_margins, get_tagged_revenue
-from validators import run_all_validations
-from db import SupabaseClient
+from rollups import compute_rollups
+from parallel import aggregate_workers, calculate_direct_costs
+import polars_engine
+from schema import frame_memory, typed_schema_enabled
+from incremental import (
+    IncrementalStore,
+    incremental_enabled,
+    ingest_logs,
+    ingest_upload,
+    month_to_date_expenses,
+    month_to_date_hours,
+)
+from validators import ValidationFailed, ValidationGate, run_all_validations
+from db import SupabaseClient, client_metrics, get_client, reset_client
+from pipeline import CODE_VERSION, Pipeline, StageCache, TieredStageCache, config_fingerprint, default_stage_cache
+from checkpoints import CheckpointStore
+from detail_store import DETAIL_TABLES, DetailStore, detail_path, detail_store_mode
+from jobs import SupabaseBatchQueue
+from instrumentation import Instrumentation
+from spill import MemoryBudget, as_frame, default_memory_budget_mb, iter_frame_chunks
+from profiling import Profiler, profile_mode, profile_path
+
+
+FILE_KEYS = {
+    'proforma': 'proforma_file_path',
+    'compensation': 'compensation_file_path',
+    'hours': 'hours_file_path',
+    'expenses': 'expenses_file_path',
+    'pnl': 'pnl_file_path',
+}
+
+# 'summary' writes only the batch summary, revenue centers and rollups
+RESULT_MODES = ('full', 'summary')
+
+# Keys of summarize(), stored as mpa_analysis_batches columns
+SUMMARY_FIELDS = (
+    'total_revenue', 'total_labor_cost', 'total_expense_cost', 'total_margin_dollars',
+    'overall_margin_percent', 'sga_pool', 'data_pool', 'workplace_pool',
+    'revenue_center_count', 'cost_center_count', 'non_revenue_client_count',
+)
 
+# Stage -> frames spilled to disk under a memory budget (read again only by persist)
+SPILL_FRAMES = {'direct_costs': ('hours_detail', 'expense_detail')}
 
-def run_analysis(db: SupabaseClient, batch: dict) -> dict:
+
+def build_pipeline(
+    db: SupabaseClient,
+    batch: dict,
+    instrumentation: Optional[Instrumentation] = None,
+    memory_budget: Optional[MemoryBudget] = None,
+    incremental: bool = False,
+) -> Pipeline:
     """
-    Run the full MPA analysis pipeline.
+    Build the MPA stage graph for a batch.
+
+    Stages:
+        load_proforma, load_compensation, load_hours, load_expenses, load_pnl
+        -> classify -> direct_costs -> pools -> allocate -> validate -> persist
+
+    Load stages are keyed by the stored file's fingerprint, so a re-upload of
+    only the P&L reuses every memoized stage that does not depend on it.
+
+    In incremental mode the Harvest files are loaded by read_hours and
+    read_expenses, ingest merges them into the batch's month-to-date state
+    (keyed by the state's fingerprint) and load_hours / load_expenses
+    return the month-to-date frames; persist saves the new state.
 
     Args:
         db: SupabaseClient instance
         batch: Batch record from database
+        instrumentation: Optional Instrumentation; loaders are measured as kind 'loader'
+        memory_budget: Optional MemoryBudget; Harvest files are then read in
+            chunks and detail rows are streamed to the database
+        incremental: Ingest only new and retracted Harvest rows into the
+            batch's month-to-date state (see lib/incremental.py)
 
     Returns:
-        Dictionary with analysis results and logs
+        Pipeline ready to run with params from pipeline_params()
+    """
+    pipeline = Pipeline()
+    instrumentation = instrumentation or Instrumentation(trace_memory=False)
+    chunk_rows = memory_budget.chunk_rows if memory_budget is not None else None
+
+    def run_loader(logs, loader):
+        with instrumentation.measure('loader', type(loader).__name__) as record:
+            df = loader.load()
+            record['rows_out'] = len(df)
+            record['bytes_out'] = frame_memory(df)['total']
+        logs.extend(loader.logs)
+        return df
+
+    @pipeline.stage('load_proforma', params=('month', 'proforma_file', 'typed_schema'))
+    def load_proforma(logs, month, proforma_file, typed_schema):
+        return run_loader(logs, ProFormaLoader(
+            db.download_file(batch['proforma_file_path']), month, typed=typed_schema,
+        ))
+
+    @pipeline.stage('load_compensation', params=('compensation_file', 'typed_schema'))
+    def load_compensation(logs, compensation_file, typed_schema):
+        return run_loader(logs, CompensationLoader(
+            db.download_file(batch['compensation_file_path']), typed=typed_schema,
+        ))
+
+    # Harvest uploads are read under other names when load_hours and
+    # load_expenses are the month-to-date frames
+    harvest_stages = ('read_hours', 'read_expenses') if incremental else ('load_hours', 'load_expenses')
+
+    @pipeline.stage(harvest_stages[0], params=('month', 'hours_file', 'typed_schema'))
+    def load_hours(logs, month, hours_file, typed_schema):
+        return run_loader(logs, HarvestHoursLoader(
+            db.download_file(batch['hours_file_path']), month, chunk_rows=chunk_rows, typed=typed_schema,
+        ))
+
+    @pipeline.stage(harvest_stages[1], params=('expenses_file', 'typed_schema'))
+    def load_expenses(logs, expenses_file, typed_schema):
+        return run_loader(logs, HarvestExpensesLoader(
+            db.download_file(batch['expenses_file_path']), chunk_rows=chunk_rows, typed=typed_schema,
+        ))
+
+    @pipeline.stage('load_pnl', params=('pnl_file',))
+    def load_pnl(logs, pnl_file):
+        return run_loader(logs, PnLLoader(db.download_file(batch['pnl_file_path'])))
+
+    if incremental:
+        @pipeline.stage('ingest', deps=('read_hours', 'read_expenses'), params=('month_state',))
+        def ingest(logs, read_hours, read_expenses, month_state):
+            state = ingest_upload(IncrementalStore(db, batch['id']).load(), read_hours, read_expenses)
+            logs.extend(ingest_logs(state))
+            return state
+
+        @pipeline.stage('load_hours', deps=('ingest',), params=('typed_schema',))
+        def load_month_hours(logs, ingest, typed_schema):
+            return month_to_date_hours(ingest, typed=typed_schema)
+
+        @pipeline.stage('load_expenses', deps=('ingest',), params=('typed_schema',))
+        def load_month_expenses(logs, ingest, typed_schema):
+            return month_to_date_expenses(ingest, typed=typed_schema)
+
+    @pipeline.stage('classify', deps=('load_proforma', 'load_hours', 'load_expenses'))
+    def classify(logs, load_proforma, load_hours, load_expenses):
+        logs.append("Files loaded successfully")
+        logs.append("Classifying projects...")
+        classifier = ProjectClassifier()
+        classified = classify_all_activity(load_proforma, load_hours, load_expenses, classifier)
+        logs.append(
+            f"Classified: {len(classified['revenue_centers'])} revenue centers, "
+            f"{len(classified['cost_centers'])} cost centers, "
+            f"{len(classified['non_revenue_clients'])} non-revenue clients"
+        )
+        return classified
+
+    @pipeline.stage('direct_costs', deps=('classify', 'load_hours', 'load_expenses', 'load_compensation'),
+                    params=('engine',))
+    def direct_costs(logs, classify, load_hours, load_expenses, load_compensation, engine):
+        logs.append("Computing direct costs...")
+        if engine == 'polars':
+            result, labor_logs = polars_engine.direct_costs(classify, load_hours, load_compensation, load_expenses)
+            logs.extend(labor_logs)
+            logs.append("Direct costs computed (polars engine)")
+            return result
+
+        # Worker processes hold copies of their partitions, so a memory
+        # budget keeps the aggregation in this process
+        labor_summary, hours_detail, labor_logs, expense_summary, expense_detail = calculate_direct_costs(
+            load_hours, load_compensation, load_expenses,
+            workers=1 if memory_budget is not None else aggregate_workers(),
+        )
+        logs.extend(labor_logs)
+
+        result = {
+            'revenue_centers': merge_direct_costs(classify['revenue_centers'], labor_summary, expense_summary),
+            'cost_centers': calculate_cost_center_costs(classify['cost_centers'], hours_detail, expense_detail),
+            'non_revenue_clients': calculate_non_revenue_client_costs(
+                classify['non_revenue_clients'], hours_detail, expense_detail
+            ),
+            'hours_detail': hours_detail,
+            'expense_detail': expense_detail,
+        }
+        logs.append("Direct costs computed")
+        return result
+
+    @pipeline.stage('pools', deps=('direct_costs', 'load_pnl'), params=('engine',))
+    def pools(logs, direct_costs, load_pnl, engine):
+        logs.append("Allocating overhead pools...")
+        if engine == 'polars':
+            return polars_engine.calculate_pools(load_pnl, direct_costs['cost_centers'], include_cc_in_sga=True)
+        allocator = OverheadAllocator()
+        return allocator.calculate_pools(load_pnl, direct_costs['cost_centers'], include_cc_in_sga=True)
+
+    @pipeline.stage('allocate', deps=('direct_costs', 'pools'), params=('engine',))
+    def allocate(logs, direct_costs, pools, engine):
+        if engine == 'polars':
+            revenue_centers = polars_engine.allocate(direct_costs['revenue_centers'], pools)
+        else:
+            allocator = OverheadAllocator()
+            revenue_centers = direct_costs['revenue_centers']
+            revenue_centers = allocator.allocate_sga(revenue_centers, pools['sga_pool'])
+            revenue_centers = allocator.allocate_data(revenue_centers, pools['data_pool'])
+            revenue_centers = allocator.allocate_workplace(revenue_centers, pools['workplace_pool'])
+            revenue_centers = calculate_margins(revenue_centers)
+
+        logs.append(
+            f"Pools allocated: SG&A ${pools['sga_pool']:,.2f}, "
+            f"Data ${pools['data_pool']:,.2f}, "
+            f"Workplace ${pools['workplace_pool']:,.2f}"
+        )
+        return {
+            'revenue_centers': revenue_centers,
+            'tagged_revenue': get_tagged_revenue(revenue_centers),
+        }
+
+    @pipeline.stage('validate', deps=(
+        'allocate', 'direct_costs', 'pools', 'load_proforma',
+        'load_hours', 'load_expenses', 'load_compensation', 'load_pnl',
+    ))
+    def validate(logs, allocate, direct_costs, pools, load_proforma,
+                 load_hours, load_expenses, load_compensation, load_pnl):
+        logs.append("Running validation checks...")
+        validation_results = run_all_validations(validation_data({
+            'load_proforma': load_proforma,
+            'load_compensation': load_compensation,
+            'load_hours': load_hours,
+            'load_expenses': load_expenses,
+            'load_pnl': load_pnl,
+            'direct_costs': direct_costs,
+            'pools': pools,
+            'allocate': allocate,
+        }))
+        logs.append(f"Validation: {validation_results.summary()}")
+        logs.append(f"Validation timing: {validation_results.timing_summary()}")
+        # FAIL results stop the batch before anything is written
+        if validation_results.has_failures():
+            raise ValidationFailed(validation_results, 'validate')
+        return validation_results
+
+    persist_deps = ('allocate', 'direct_costs', 'pools', 'validate') + (('ingest',) if incremental else ())
+
+    @pipeline.stage('persist', deps=persist_deps, params=('batch_id', 'mode', 'input_fingerprint'), cacheable=False)
+    def persist(logs, allocate, direct_costs, pools, validate, batch_id, mode, input_fingerprint, ingest=None):
+        # Validation passed, so the ingested rows become the month to date.
+        # Results are a function of the state: if a write below fails, the
+        # next run recomputes them from it.
+        if ingest is not None:
+            IncrementalStore(db, batch_id).save(ingest)
+            logs.append(f"Saved month-to-date state (run {ingest['runs']})")
+
+        revenue_centers = allocate['revenue_centers']
+        cost_centers = direct_costs['cost_centers']
+        non_revenue_clients = direct_costs['non_revenue_clients']
+
+        summary = summarize(revenue_centers, cost_centers, non_revenue_clients, pools)
+        # What the stored results are and which inputs they came from
+        result_identity = {'result_mode': mode, 'input_fingerprint': input_fingerprint}
+
+        # Dashboard rollups from the in-memory frames, written before the
+        # batch is marked completed so readers never see it without them
+        # (in rpc mode, right after the transaction that completes it)
+        rollups = compute_rollups(revenue_centers, batch['month_name'])
+
+        # Headline numbers only: rows of an earlier full run no longer match
+        # the inputs, so they are removed until a full run rewrites them
+        if mode == 'summary':
+            logs.append("Saving summary results to database...")
+            db.update_rows('mpa_analysis_batches', result_identity, {'id': batch_id})
+            if (batch.get('result_mode') or 'full') != 'summary':
+                db.clear_full_results(batch_id)
+                if batch.get('detail_store') == 'parquet':
+                    DetailStore(db).delete_batch(batch_id)
+                logs.append("Cleared the cost center, non-revenue client, detail and pools rows of the previous full run")
+            written = db.save_summary_results(batch_id, revenue_centers)
+            logs.append(
+                f"Saved summary results: {written['inserted']} inserted, {written['updated']} updated, "
+                f"{written['deleted']} deleted, {written['unchanged']} unchanged revenue centers"
+            )
+            logs.append(f"Refreshed {db.save_rollups(batch_id, rollups)} dashboard rollup rows")
+            db.save_batch_summary(batch_id, summary, validate.to_json())
+            return summary
+
+        hours_detail = direct_costs['hours_detail']
+        expense_detail = direct_costs['expense_detail']
+
+        # Detail rows go to Parquet in storage instead of Postgres when enabled
+        detail_mode = detail_store_mode()
+        if detail_mode == 'parquet':
+            # Sorted per file, so a spilled frame is read back whole here
+            detail_rows = DetailStore(db).write_batch(batch_id, as_frame(hours_detail), as_frame(expense_detail))
+            logs.append(
+                f"Wrote {sum(detail_rows.values())} detail rows to Parquet "
+                "(served by the query endpoint, not the dashboard drill-down route)"
+            )
+            hours_detail = pd.DataFrame(columns=list(hours_detail.columns))
+            expense_detail = pd.DataFrame(columns=list(expense_detail.columns))
+        previous_mode = batch.get('detail_store') or 'postgres'
+        if detail_mode != previous_mode:
+            db.update_rows('mpa_analysis_batches', {'detail_store': detail_mode}, {'id': batch_id})
+            if previous_mode == 'parquet':
+                db.remove_files([detail_path(batch_id, table) for table in DETAIL_TABLES])
+
+        logs.append("Saving results to database...")
+        if persist_mode() == 'rpc' and memory_budget is not None:
+            # The RPC payload holds every detail row at once
+            logs.append("Memory budget set: detail rows are streamed with bulk writes instead of the RPC")
+        elif persist_mode() == 'rpc':
+            # persist_batch completes the batch, so the identity of its
+            # results must already be on the row; rollups follow the commit
+            db.update_rows('mpa_analysis_batches', result_identity, {'id': batch_id})
+            written = db.persist_batch(
+                batch_id,
+                revenue_centers,
+                cost_centers,
+                non_revenue_clients,
+                hours_detail,
+                expense_detail,
+                pools,
+                allocate['tagged_revenue'],
+                summary,
+                validate.to_json(),
+            )
+            logs.append(f"Saved {sum(written.values())} rows in one transaction")
+            logs.append(f"Refreshed {db.save_rollups(batch_id, rollups)} dashboard rollup rows")
+            return summary
+
+        if memory_budget is None:
+            written = db.save_results(
+                batch_id,
+                revenue_centers,
+                cost_centers,
+                non_revenue_clients,
+                hours_detail,
+                expense_detail,
+            )
+        else:
+            # One chunk of detail rows in memory at a time
+            written = db.save_results(batch_id, revenue_centers, cost_centers, non_revenue_clients)
+            for table, detail in (('mpa_hours_detail', hours_detail), ('mpa_expenses_detail', expense_detail)):
+                rows = db.stream_rows(batch_id, table, iter_frame_chunks(detail, memory_budget.chunk_rows))
+                written[table] = {'inserted': rows, 'updated': 0, 'deleted': 0, 'unchanged': 0}
+            logs.append(f"Streamed detail rows in chunks of {memory_budget.chunk_rows}")
+        totals = {k: sum(t[k] for t in written.values()) for k in ('inserted', 'updated', 'deleted', 'unchanged')}
+        logs.append(
+            f"Saved results: {totals['inserted']} inserted, {totals['updated']} updated, "
+            f"{totals['deleted']} deleted, {totals['unchanged']} unchanged"
+        )
+        db.save_pools_detail(batch_id, pools, allocate['tagged_revenue'])
+        logs.append(f"Refreshed {db.save_rollups(batch_id, rollups)} dashboard rollup rows")
+        db.update_rows('mpa_analysis_batches', result_identity, {'id': batch_id})
+        db.save_batch_summary(batch_id, summary, validate.to_json())
+        return summary
+
+    return pipeline
+
+
+# Stage output -> validation data keys it provides (later stages override
+# earlier ones, so 'revenue_centers' is the allocated frame once it exists)
+VALIDATION_SOURCES = {
+    'load_proforma': lambda out: {'proforma': out},
+    'load_compensation': lambda out: {'compensation': out},
+    'load_hours': lambda out: {'hours': out},
+    'load_expenses': lambda out: {'expenses': out},
+    'load_pnl': lambda out: {'pnl': out},
+    'classify': lambda out: {k: out[k] for k in ('revenue_centers', 'cost_centers', 'non_revenue_clients')},
+    'direct_costs': lambda out: {k: out[k] for k in ('revenue_centers', 'cost_centers', 'non_revenue_clients')},
+    'pools': lambda out: {'pools': out},
+    'allocate': lambda out: {'revenue_centers': out['revenue_centers']},
+}
+
+
+def validation_data(outputs: dict, stages: Optional[Iterable[str]] = None) -> dict:
     """
-    batch_id = batch['id']
-    month = batch['month_name']
-    logs = []
-
-    # Phase 1: Load files
-    logs.append(f"Loading files for {month}...")
-
-    proforma_content = db.download_file(batch['proforma_file_path'])
-    compensation_content = db.download_file(batch['compensation_file_path'])
-    hours_content = db.download_file(batch['hours_file_path'])
-    expenses_content = db.download_file(batch['expenses_file_path'])
-    pnl_content = db.download_file(batch['pnl_file_path'])
-
-    # Load Pro Forma
-    proforma_loader = ProFormaLoader(proforma_content, month)
-    proforma_df = proforma_loader.load()
-    logs.extend(proforma_loader.logs)
-
-    # Load Compensation
-    comp_loader = CompensationLoader(compensation_content)
-    comp_df = comp_loader.load()
-    logs.extend(comp_loader.logs)
-
-    # Load Hours
-    hours_loader = HarvestHoursLoader(hours_content, month)
-    hours_df = hours_loader.load()
-    logs.extend(hours_loader.logs)
-
-    # Load Expenses
-    expenses_loader = HarvestExpensesLoader(expenses_content)
-    expenses_df = expenses_loader.load()
-    logs.extend(expenses_loader.logs)
-
-    # Load P&L
-    pnl_loader = PnLLoader(pnl_content)
-    pnl_df = pnl_loader.load()
-    logs.extend(pnl_loader.logs)
-
-    logs.append("Files loaded successfully")
-
-    # Phase 2: Classify projects
-    logs.append("Classifying projects...")
-    classifier = ProjectClassifier()
-    classified = classify_all_activity(proforma_df, hours_df, expenses_df, classifier)
-    revenue_centers = classified['revenue_centers']
-    cost_centers = classified['cost_centers']
-    non_revenue_clients = classified['non_revenue_clients']
-
-    logs.append(
-        f"Classified: {len(revenue_centers)} revenue centers, "
-        f"{len(cost_centers)} cost centers, "
-        f"{len(non_revenue_clients)} non-revenue clients"
-    )
-
-    # Phase 3: Compute direct costs
-    logs.append("Computing direct costs...")
-    labor_summary, hours_detail, labor_logs = calculate_labor_costs(hours_df, comp_df)
-    logs.extend(labor_logs)
-
-    expense_summary, expense_detail = calculate_expense_costs(expenses_df)
-
-    revenue_centers = merge_direct_costs(revenue_centers, labor_summary, expense_summary)
-    cost_centers = calculate_cost_center_costs(cost_centers, hours_detail, expense_detail)
-    non_revenue_clients = calculate_non_revenue_client_costs(non_revenue_clients, hours_detail, expense_detail)
-
-    logs.append("Direct costs computed")
-
-    # Phase 4: Allocate overhead
-    logs.append("Allocating overhead pools...")
-    allocator = OverheadAllocator()
-    pools = allocator.calculate_pools(pnl_df, cost_centers, include_cc_in_sga=True)
-
-    revenue_centers = allocator.allocate_sga(revenue_centers, pools['sga_pool'])
-    revenue_centers = allocator.allocate_data(revenue_centers, pools['data_pool'])
-    revenue_centers = allocator.allocate_workplace(revenue_centers, pools['workplace_pool'])
-    revenue_centers = calculate_margins(revenue_centers)
-
-    tagged_revenue = get_tagged_revenue(revenue_centers)
-
-    logs.append(
-        f"Pools allocated: SG&A ${pools['sga_pool']:,.2f}, "
-        f"Data ${pools['data_pool']:,.2f}, "
-        f"Workplace ${pools['workplace_pool']:,.2f}"
-    )
-
-    # Phase 5: Validate
-    logs.append("Running validation checks...")
-    validation_data = {
-        'revenue_centers': revenue_centers,
-        'cost_centers': cost_centers,
-        'non_revenue_clients': non_revenue_clients,
-        'proforma': proforma_df,
-        'pools': pools,
-        'hours': hours_df,
-        'expenses': expenses_df,
-        'compensation': comp_df,
-        'pnl': pnl_df,
+    Build validation data from stage outputs.
+
+    Args:
+        outputs: Stage name -> output
+        stages: Only use these stages' outputs (default: all available)
+    """
+    stages = set(outputs if stages is None else stages)
+    data = {}
+    for stage, extract in VALIDATION_SOURCES.items():
+        if stage in stages and stage in outputs:
+            data.update(extract(outputs[stage]))
+    return data
+
+
+def pipeline_params(
+    db: SupabaseClient,
+    batch: dict,
+    mode: str = 'full',
+    input_fingerprint: Optional[str] = None,
+    month_state: Optional[str] = None,
+) -> dict:
+    """
+    External pipeline inputs: batch identity, result mode, engine, schema,
+    month, file fingerprints and (incremental runs) the state fingerprint.
+    """
+    params = {
+        'batch_id': batch['id'],
+        'mode': mode,
+        'input_fingerprint': input_fingerprint,
+        'engine': polars_engine.engine_mode(),
+        'typed_schema': typed_schema_enabled(),
+        'month': batch['month_name'],
+        'month_state': month_state,
     }
-    validation_results = run_all_validations(validation_data)
-    logs.append(f"Validation: {validation_results.summary()}")
+    for name, path_key in FILE_KEYS.items():
+        params[f'{name}_file'] = db.file_fingerprint(batch[path_key])
+    return params
+
+
+def batch_fingerprint(
+    db: SupabaseClient,
+    batch: dict,
+    incremental: bool = False,
+    month_state: Optional[str] = None,
+) -> str:
+    """
+    Identity of a batch's inputs for result-level dedupe.
 
-    # Calculate summary metrics
+    Hashes the month, the content hash of each of the five files, the config
+    fingerprint and the code version: two batches with equal fingerprints
+    produce identical results. Incremental results also depend on the
+    batch's month-to-date state, so its fingerprint is included for them
+    (and a later full run never reuses them).
+    """
+    identity = {
+        'month': batch['month_name'],
+        'files': {name: db.file_content_hash(batch[path_key]) for name, path_key in FILE_KEYS.items()},
+        'config': config_fingerprint(),
+        'code_version': CODE_VERSION,
+    }
+    if incremental:
+        identity['month_state'] = month_state
+    return hashlib.sha256(json.dumps(identity, sort_keys=True).encode()).hexdigest()
+
+
+def reuse_results(db: SupabaseClient, batch: dict, fingerprint: str, mode: str) -> Optional[dict]:
+    """
+    Return stored results for identical inputs instead of running the pipeline.
+
+    A batch that is already completed with this fingerprint is returned as
+    is; otherwise the results of the latest completed batch with the same
+    fingerprint are copied to it (mpa_copy_batch_results). A full run only
+    reuses full results.
+
+    Returns:
+        The run_analysis result, or None if nothing can be reused
+    """
+    def usable(candidate: Optional[dict]) -> bool:
+        return bool(candidate) and (mode == 'summary' or (candidate.get('result_mode') or 'full') == 'full')
+
+    logs = [f"Inputs unchanged (fingerprint {fingerprint[:12]})"]
+    if batch.get('status') == 'completed' and batch.get('input_fingerprint') == fingerprint and usable(batch):
+        # The handler marked it processing; its results are still current
+        db.update_batch_status(batch['id'], 'completed')
+        source_id = batch['id']
+        logs.append("Batch already holds the results for these inputs")
+    else:
+        source = db.find_completed_batch(fingerprint, exclude_batch_id=batch['id'])
+        if not usable(source):
+            return None
+        source_id = source['id']
+        previous_store = batch.get('detail_store') or 'postgres'
+        try:
+            if source.get('detail_store') == 'parquet':
+                for table in DETAIL_TABLES:
+                    content = db.download_file(detail_path(source_id, table)).getvalue()
+                    db.upload_file(detail_path(batch['id'], table), content)
+            copied = db.copy_batch_results(source_id, batch['id'])
+        except Exception as e:
+            print(f"MPA result reuse from {source_id} failed, recomputing: {e}")
+            return None
+        if previous_store == 'parquet' and source.get('detail_store') != 'parquet':
+            db.remove_files([detail_path(batch['id'], table) for table in DETAIL_TABLES])
+        logs.append(f"Copied {sum(copied.values())} result rows from batch {source_id}")
+
+    stored = db.get_batch(batch['id'])
+    logs.append("Analysis complete!")
+    return {
+        'success': True,
+        'complete': True,
+        'mode': stored.get('result_mode') or 'full',
+        'reusedFrom': source_id,
+        'summary': {key: stored.get(key) for key in SUMMARY_FIELDS},
+        'validation': stored.get('validation_errors') or [],
+        'logs': logs,
+    }
+
+
+def summarize(
+    revenue_centers: pd.DataFrame,
+    cost_centers: pd.DataFrame,
+    non_revenue_clients: pd.DataFrame,
+    pools: dict,
+) -> dict:
+    """Calculate batch summary metrics."""
     total_revenue = float(revenue_centers['revenue'].sum())
     total_labor_cost = float(revenue_centers['labor_cost'].sum())
     total_expense_cost = float(revenue_centers['expense_cost'].sum())
     total_margin_dollars = float(revenue_centers['margin_dollars'].sum())
     overall_margin_percent = (total_margin_dollars / total_revenue * 100) if total_revenue > 0 else 0
 
-    summary = {
+    return {
         'total_revenue': total_revenue,
         'total_labor_cost': total_labor_cost,
         'total_expense_cost': total_expense_cost,
@@ -187,26 +621,225 @@ def run_analysis(db: SupabaseClient, batch: dict) -> dict:
         'non_revenue_client_count': len(non_revenue_clients),
     }
 
-    # Phase 6: Save results
-    logs.append("Saving results to database...")
-    db.save_revenue_centers(batch_id, revenue_centers)
-    db.save_cost_centers(batch_id, cost_centers)
-    db.save_non_revenue_clients(batch_id, non_revenue_clients)
-    db.save_hours_detail(batch_id, hours_detail)
-    db.save_expenses_detail(batch_id, expense_detail)
-    db.save_pools_detail(batch_id, pools, tagged_revenue)
-    db.save_batch_summary(batch_id, summary, validation_results.to_json())
 
+def run_analysis(
+    db: SupabaseClient,
+    batch: dict,
+    cache: Optional[StageCache] = None,
+    deadline: Optional[float] = None,
+    on_event: Optional[Callable[[dict], None]] = None,
+    profile: Union[bool, str, None] = None,
+    mode: str = 'full',
+    reuse: bool = True,
+    memory_budget_mb: Optional[float] = None,
+    incremental: Optional[bool] = None,
+) -> dict:
+    """
+    Run the full MPA analysis pipeline.
+
+    Stages whose inputs and config are unchanged since a previous run are
+    served from the stage cache or the batch's checkpoints instead of being
+    recomputed.
+
+    Args:
+        db: SupabaseClient instance
+        batch: Batch record from database
+        cache: StageCache for memoized stage outputs (defaults to the local
+            stage cache, backed by the batch's checkpoints when a deadline
+            is set)
+        deadline: Optional time.monotonic() value after which no new stage
+            starts; the batch can then be resumed by calling again
+        on_event: Optional callback receiving stage progress events
+        profile: Profile this run (True, 'cprofile' or 'sample'); MPA_PROFILE
+            enables it for every run. The artifact path is returned as 'profile'.
+        mode: 'full' (default) or 'summary' to write only the batch summary,
+            revenue centers and rollups (see RESULT_MODES)
+        reuse: Return the stored results of a completed batch with identical
+            inputs (see batch_fingerprint) instead of recomputing them
+        memory_budget_mb: Peak RSS budget (default MPA_MEMORY_BUDGET_MB);
+            when set the run is bounded-memory (see lib/spill.py) and the
+            peak is reported as metrics['memory']
+        incremental: Run as a daily month-to-date update of the batch
+            (default MPA_INCREMENTAL); results are never reused from
+            another run since they depend on the batch's state
+
+    Returns:
+        Dictionary with analysis results and logs. If the deadline was hit,
+        'complete' is False and 'pendingStages' lists the remaining work.
+    """
+    if mode not in RESULT_MODES:
+        raise ValueError(f"Unknown mode '{mode}'. Expected one of: {', '.join(RESULT_MODES)}")
+
+    if memory_budget_mb is None:
+        memory_budget_mb = default_memory_budget_mb()
+    if incremental is None:
+        incremental = incremental_enabled()
+
+    profiler_mode = profile_mode(profile)
+    if profiler_mode is None:
+        return _run_analysis(db, batch, cache, deadline, on_event, mode, reuse, memory_budget_mb, incremental)
+
+    profiler = Profiler(profiler_mode)
+    try:
+        with profiler:
+            result = _run_analysis(db, batch, cache, deadline, on_event, mode, reuse, memory_budget_mb, incremental)
+    finally:
+        # Failed runs are the ones worth profiling; the error propagates after the upload
+        path = _upload_profile(db, batch['id'], profiler)
+    if path is not None:
+        result['profile'] = path
+    return result
+
+
+def _upload_profile(db: SupabaseClient, batch_id: str, profiler: Profiler) -> Optional[str]:
+    """Upload a run's profile; a failed upload is logged, never raised over the run's outcome."""
+    try:
+        extension, content = profiler.artifact()
+        path = profile_path(batch_id, extension)
+        db.upload_file(path, content)
+    except Exception as e:
+        print(f"MPA profile for batch {batch_id} not written: {e}")
+        return None
+    print(f"MPA profile for batch {batch_id} written to {path}")
+    return path
+
+
+def _run_analysis(
+    db: SupabaseClient,
+    batch: dict,
+    cache: Optional[StageCache],
+    deadline: Optional[float],
+    on_event: Optional[Callable[[dict], None]],
+    mode: str,
+    reuse: bool,
+    memory_budget_mb: Optional[float],
+    incremental: bool,
+) -> dict:
+    """Unprofiled body of run_analysis."""
+    month_state = IncrementalStore(db, batch['id']).fingerprint() if incremental else None
+    fingerprint = batch_fingerprint(db, batch, incremental, month_state)
+    if reuse and not incremental:
+        reused = reuse_results(db, batch, fingerprint, mode)
+        if reused is not None:
+            return reused
+
+    instrumentation = Instrumentation()
+    instrumentation.start()
+    tracked_db = instrumentation.wrap(db)
+
+    checkpoints = None
+    if cache is None and deadline is not None:
+        # Checkpoints only pay off if the run can hit its deadline: uploads
+        # start once half the remaining budget has passed
+        started = time.monotonic()
+        checkpoints = CheckpointStore(
+            tracked_db, batch['id'], write_after=started + (deadline - started) / 2, defer=memory_budget_mb is None,
+        )
+        cache = TieredStageCache(default_stage_cache(), checkpoints)
+    elif cache is None:
+        cache = default_stage_cache()
+
+    logs = [f"Loading files for {batch['month_name']}..."]
+
+    # Rules run as soon as the stages they read are done; a FAIL aborts the
+    # run before the remaining stages and any database writes
+    gate = ValidationGate(validation_data)
+    on_output = gate
+
+    # Under a memory budget, outputs are freed once nothing downstream reads
+    # them and the detail frames wait for persist on disk
+    budget = None
+    if memory_budget_mb is not None:
+        budget = MemoryBudget(memory_budget_mb, SPILL_FRAMES)
+
+        def on_output(stage, outputs):
+            gate(stage, outputs)
+            budget(stage, outputs)
+
+    try:
+        pipeline = build_pipeline(tracked_db, batch, instrumentation, budget, incremental)
+        run = pipeline.run(
+            pipeline_params(tracked_db, batch, mode, fingerprint, month_state),
+            cache=cache,
+            deadline=deadline,
+            on_event=on_event,
+            instrumentation=instrumentation,
+            on_output=on_output,
+            release=budget is not None,
+            keep=('validate',),
+        )
+    except ValidationFailed as e:
+        db.save_validation_failure(batch['id'], e.results.to_json(), str(e))
+        raise
+    finally:
+        instrumentation.stop()
+        if budget is not None:
+            budget.close()
+    logs.extend(run.logs)
+    if gate.checked:
+        logs.append(f"Early validation: {len(gate.checked)} rules passed as their inputs became available")
+    metrics = instrumentation.to_json()
+    metrics['client'] = client_metrics()
+    if 'validate' in run.outputs:
+        metrics['validation_rules_ms'] = run.outputs['validate'].timings
+    if budget is not None:
+        metrics['memory'] = budget.report()
+        logs.append(
+            f"Memory budget: peak RSS {metrics['memory']['peak_rss_mb']} MB of {memory_budget_mb:g} MB"
+            + ("" if metrics['memory']['within_budget'] else " (exceeded)")
+        )
+
+    if run.reused:
+        logs.append(f"Reused {len(run.reused)} unchanged stages: {', '.join(run.reused)}")
+
+    if not run.complete:
+        if checkpoints is not None:
+            checkpoints.flush()
+        logs.append(f"Time budget reached; {len(run.pending)} stages pending: {', '.join(run.pending)}")
+        return {
+            'success': True,
+            'complete': False,
+            'completedStages': run.executed + run.reused,
+            'pendingStages': run.pending,
+            'metrics': metrics,
+            'logs': logs,
+        }
+
+    if checkpoints is not None:
+        try:
+            checkpoints.clear()
+        except Exception:
+            pass
+    db.save_batch_metrics(batch['id'], metrics)
     logs.append("Analysis complete!")
 
     return {
         'success': True,
-        'summary': summary,
-        'validation': validation_results.to_json(),
+        'complete': True,
+        'mode': mode,
+        'summary': run.outputs['persist'],
+        'validation': run.outputs['validate'].to_json(),
+        'metrics': metrics,
         'logs': logs,
     }
 
 
+def persist_mode() -> str:
+    """
+    How results are written (MPA_PERSIST_MODE).
+
+    'rpc': one mpa_persist_batch call, atomic (needs 008_mpa_persist_batch.sql)
+    'bulk': concurrent chunked inserts per table (default)
+    """
+    mode = os.environ.get('MPA_PERSIST_MODE', 'bulk').strip().lower()
+    return mode if mode in ('rpc', 'bulk') else 'bulk'
+
+
+def time_budget_seconds() -> float:
+    """Seconds of pipeline work allowed per invocation."""
+    return float(os.environ.get('MPA_TIME_BUDGET_SECONDS', '50'))
+
+
 class handler(BaseHTTPRequestHandler):
     """Vercel Python Function handler."""
 
@@ -223,8 +856,8 @@ class handler(BaseHTTPRequestHandler):
                 self._send_error(400, "batchId is required")
                 return
 
-            # Initialize Supabase client
-            db = SupabaseClient()
+            # Reuse the warm Supabase client (and its connections) if this instance has one
+            db = get_client()
 
             # Get batch details
             batch = db.get_batch(batch_id)
@@ -245,21 +878,59 @@ class handler(BaseHTTPRequestHandler):
                 self._send_error(400, f"Missing file paths: {', '.join(missing)}")
                 return
 
+            mode = data.get('mode') or 'full'
+            if mode not in RESULT_MODES:
+                self._send_error(400, f"Unknown mode '{mode}'. Expected one of: {', '.join(RESULT_MODES)}")
+                return
+
+            # Queue for the background worker instead of running inline
+            if data.get('async'):
+                if mode != 'full':
+                    self._send_error(400, "mode=summary runs inline; it cannot be queued")
+                    return
+                if data.get('incremental'):
+                    self._send_error(400, "incremental runs inline; set MPA_INCREMENTAL for queued runs")
+                    return
+                if not db.supports_queue:
+                    self._send_error(400, "This backend has no batch queue; run the batch inline")
+                    return
+                SupabaseBatchQueue(db).enqueue(batch_id)
+                self._send_json(202, {'success': True, 'jobId': batch_id, 'status': 'queued'})
+                return
+
             # Update status to processing
             db.update_batch_status(batch_id, 'processing')
 
-            # Run analysis
-            result = run_analysis(db, batch)
-
-            # Send success response
-            self._send_json(200, result)
+            # Stream progress events if requested
+            on_event = None
+            if data.get('stream') or 'application/x-ndjson' in self.headers.get('Accept', ''):
+                self._start_stream()
+                on_event = self._send_event
+
+            # Run analysis, stopping before the function timeout
+            deadline = time.monotonic() + time_budget_seconds()
+            result = run_analysis(
+                db, batch, deadline=deadline, on_event=on_event, profile=data.get('profile'),
+                mode=mode, reuse=not data.get('force'), incremental=data.get('incremental'),
+            )
+
+            # Send success response (202 when stages remain to be resumed)
+            self._send_json(200 if result['complete'] else 202, result)
+
+        except ValidationFailed as e:
+            # Batch already marked failed with its validation results
+            self._send_json(400, {
+                'success': False,
+                'error': str(e),
+                'failedAfterStage': e.stage,
+                'validation': e.results.to_json(),
+            })
 
         except ValueError as e:
             # Business logic error
             error_msg = str(e)
             try:
-                db = SupabaseClient()
-                db.update_batch_status(batch_id, 'failed', error_msg)
+                get_client().update_batch_status(batch_id, 'failed', error_msg)
             except Exception:
                 pass
             self._send_error(400, error_msg)
@@ -269,9 +940,10 @@ class handler(BaseHTTPRequestHandler):
             error_msg = f"Internal error: {str(e)}"
             error_trace = traceback.format_exc()
             print(f"MPA Process Error: {error_trace}")
+            # The connection may be what failed; reconnect on next use
+            reset_client()
             try:
-                db = SupabaseClient()
-                db.update_batch_status(batch_id, 'failed', error_msg)
+                get_client().update_batch_status(batch_id, 'failed', error_msg)
             except Exception:
                 pass
             self._send_error(500, error_msg)
@@ -282,8 +954,26 @@ class handler(BaseHTTPRequestHandler):
         self._send_cors_headers()
         self.end_headers()
 
+    def _start_stream(self):
+        """Begin an NDJSON streaming response."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Cache-Control', 'no-cache')
+        self._send_cors_headers()
+        self.end_headers()
+        self._streaming = True
+
+    def _send_event(self, event: dict):
+        """Write one NDJSON event line and flush it to the client."""
+        event.setdefault('ts', time.time())
+        self.wfile.write((json.dumps(event) + '\n').encode())
+        self.wfile.flush()
+
     def _send_json(self, status: int, data: dict):
-        """Send JSON response."""
+        """Send JSON response (as the final event when streaming)."""
+        if getattr(self, '_streaming', False):
+            self._send_event({'event': 'result', 'status': status, 'result': data})
+            return
         self.send_response(status)
         self.send_header('Content-Type', 'application/json')
         self._send_cors_headers()
@@ -0,0 +1,325 @@
+"""
+Monthly Performance Analysis - Drill-down Query Endpoint
+
+Vercel Python Function serving batch results page by page, so large
+batches render without loading every row.
+
+GET /api/mpa/query?batchId=uuid&resource=hours&contract_code=ABC-123
+    &columns=staff_key,hours&sort=-hours&limit=200&cursor=...&format=json
+
+Parameters:
+- resource: revenue_centers | cost_centers | non_revenue_clients | hours | expenses
+- columns: comma-separated projection (default: all columns of the resource)
+- sort: column to order by, '-' prefix for descending (ties broken by id)
+- limit: page size (default 100, max 1000)
+- cursor: nextCursor from the previous page (keyset pagination)
+- filters: equality on filterable columns, e.g. contract_code, analysis_category
+- format: json (default; gzip when the client accepts it) or arrow
+  (Arrow IPC stream, next cursor in the X-Next-Cursor header)
+
+Detail rows of batches stored as Parquet (detail_store = 'parquet') are read
+through DetailStore with the same paging semantics. Batches processed with
+mode=summary (result_mode = 'summary') only serve revenue_centers.
+"""
+
+import base64
+import gzip
+import json
+import os
+import sys
+import traceback
+from http.server import BaseHTTPRequestHandler
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+# Add lib directory to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+lib_dir = os.path.join(current_dir, 'lib')
+if lib_dir not in sys.path:
+    sys.path.insert(0, lib_dir)
+
+# Load environment from .env if running locally
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+from db import (
+    COST_CENTER_COLUMNS,
+    EXPENSES_DETAIL_COLUMNS,
+    HOURS_DETAIL_COLUMNS,
+    NON_REVENUE_CLIENT_COLUMNS,
+    REVENUE_CENTER_COLUMNS,
+    get_client,
+)
+from detail_store import DetailStore
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+# resource -> table, column specs, filterable columns, default sort
+RESOURCES: Dict[str, Dict[str, Any]] = {
+    'revenue_centers': {
+        'table': 'mpa_revenue_centers',
+        'columns': REVENUE_CENTER_COLUMNS,
+        'filters': ('contract_code', 'analysis_category', 'allocation_tag', 'proforma_section'),
+        'sort': '-revenue',
+    },
+    'cost_centers': {
+        'table': 'mpa_cost_centers',
+        'columns': COST_CENTER_COLUMNS,
+        'filters': ('contract_code', 'pool'),
+        'sort': '-total_cost',
+    },
+    'non_revenue_clients': {
+        'table': 'mpa_non_revenue_clients',
+        'columns': NON_REVENUE_CLIENT_COLUMNS,
+        'filters': ('contract_code',),
+        'sort': '-total_cost',
+    },
+    'hours': {
+        'table': 'mpa_hours_detail',
+        'columns': HOURS_DETAIL_COLUMNS,
+        'filters': ('contract_code', 'staff_key'),
+        'sort': '-hours',
+    },
+    'expenses': {
+        'table': 'mpa_expenses_detail',
+        'columns': EXPENSES_DETAIL_COLUMNS,
+        'filters': ('contract_code',),
+        'sort': '-amount',
+    },
+}
+
+
+class BatchNotFound(LookupError):
+    """Requested batch does not exist."""
+
+
+def sortable_columns(resource: Dict[str, Any]) -> List[str]:
+    """Columns safe for keyset ordering (never NULL as written by the pipeline)."""
+    return ['id'] + [name for name, kind, _ in resource['columns'] if kind in ('key', 'float')]
+
+
+def encode_cursor(row: Dict[str, Any], sort: str) -> str:
+    """Opaque cursor for the row after which the next page starts."""
+    raw = json.dumps([row.get(sort), row.get('id')], default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, Any]:
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        value, last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return value, last_id
+
+
+def parse_request(params: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Validate query parameters.
+
+    Raises:
+        ValueError: On unknown resource, column, sort or filter
+    """
+    batch_id = params.get('batchId')
+    if not batch_id:
+        raise ValueError("batchId is required")
+
+    name = params.get('resource', 'revenue_centers')
+    resource = RESOURCES.get(name)
+    if resource is None:
+        raise ValueError(f"Unknown resource '{name}'. Expected one of: {', '.join(RESOURCES)}")
+
+    all_columns = [column for column, _, _ in resource['columns']]
+    columns = [c.strip() for c in params.get('columns', '').split(',') if c.strip()] or all_columns
+    unknown = [c for c in columns if c not in all_columns]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+
+    sort = params.get('sort') or resource['sort']
+    descending = sort.startswith('-')
+    sort = sort.lstrip('-')
+    if sort not in sortable_columns(resource):
+        raise ValueError(f"Cannot sort by '{sort}'")
+
+    filters = {'batch_id': batch_id}
+    for column in resource['filters']:
+        if params.get(column):
+            filters[column] = params[column]
+
+    try:
+        limit = min(MAX_LIMIT, max(1, int(params.get('limit', DEFAULT_LIMIT))))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+
+    return {
+        'batch_id': batch_id,
+        'resource': name,
+        'table': resource['table'],
+        'columns': columns,
+        'sort': sort,
+        'descending': descending,
+        'filters': filters,
+        'limit': limit,
+        'after': decode_cursor(params['cursor']) if params.get('cursor') else None,
+        'format': params.get('format', 'json'),
+    }
+
+
+def page_frame(
+    df: pd.DataFrame,
+    sort: str,
+    descending: bool,
+    after: Optional[Tuple[Any, Any]],
+    limit: int,
+) -> pd.DataFrame:
+    """Keyset page over an in-memory frame, ordered by (sort, id)."""
+    if 'id' not in df.columns:
+        # Parquet detail has no ids; the stable row position stands in
+        df = df.reset_index(drop=True)
+        df['id'] = df.index
+    if after is not None:
+        value, last_id = after
+        ahead = df[sort] < value if descending else df[sort] > value
+        df = df[ahead | ((df[sort] == value) & (df['id'] > last_id))]
+    ordered = df.sort_values([sort, 'id'], ascending=[not descending, True], kind='stable')
+    return ordered.head(limit)
+
+
+def fetch_page(db, request: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Fetch one page of rows and the cursor for the next page.
+
+    Returns:
+        (rows with the requested columns, next cursor or None on the last page)
+    """
+    sort = request['sort']
+    projection = list(dict.fromkeys(request['columns'] + [sort, 'id']))
+
+    batch = db.select_rows('mpa_analysis_batches', 'id,detail_store,result_mode', {'id': request['batch_id']})
+    if not batch:
+        raise BatchNotFound(f"Batch {request['batch_id']} not found")
+    if batch[0].get('result_mode') == 'summary' and request['table'] != 'mpa_revenue_centers':
+        raise ValueError(
+            f"Batch {request['batch_id']} was processed in summary mode; "
+            f"run a full process to load {request['table']}"
+        )
+
+    if batch[0].get('detail_store') == 'parquet' and request['table'] in ('mpa_hours_detail', 'mpa_expenses_detail'):
+        store = DetailStore(db)
+        filters = {k: v for k, v in request['filters'].items() if k != 'batch_id'}
+        codes = [filters.pop('contract_code')] if 'contract_code' in filters else None
+        df = store.query(request['batch_id'], request['table'], contract_codes=codes)
+        for column, value in filters.items():
+            df = df[df[column] == value]
+        page = page_frame(df, sort, request['descending'], request['after'], request['limit'] + 1)
+        rows = store.to_records(page)
+    else:
+        rows = db.select_page(
+            request['table'],
+            ','.join(projection),
+            request['filters'],
+            sort,
+            descending=request['descending'],
+            after=request['after'],
+            limit=request['limit'] + 1,
+        )
+
+    # One extra row tells us whether another page exists
+    next_cursor = encode_cursor(rows[request['limit'] - 1], sort) if len(rows) > request['limit'] else None
+    rows = rows[:request['limit']]
+    return [{c: row.get(c) for c in request['columns']} for row in rows], next_cursor
+
+
+def to_arrow(rows: List[Dict[str, Any]], columns: List[str]) -> bytes:
+    """Encode rows as an Arrow IPC stream."""
+    table = pa.Table.from_pylist(rows) if rows else pa.table({c: pa.array([], pa.null()) for c in columns})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+class handler(BaseHTTPRequestHandler):
+    """Vercel Python Function handler."""
+
+    def do_GET(self):
+        """Serve one page of a batch's results."""
+        try:
+            query = parse_qs(urlparse(self.path).query)
+            request = parse_request({key: values[-1] for key, values in query.items()})
+            rows, next_cursor = fetch_page(get_client(), request)
+
+            if request['format'] == 'arrow':
+                if pa is None:
+                    raise ValueError("Arrow output requires pyarrow")
+                self._send_body(
+                    200,
+                    to_arrow(rows, request['columns']),
+                    'application/vnd.apache.arrow.stream',
+                    {'X-Next-Cursor': next_cursor or ''},
+                )
+                return
+
+            self._send_json(200, {
+                'success': True,
+                'resource': request['resource'],
+                'columns': request['columns'],
+                'rows': rows,
+                'nextCursor': next_cursor,
+            })
+
+        except BatchNotFound as e:
+            self._send_error(404, str(e))
+
+        except ValueError as e:
+            self._send_error(400, str(e))
+
+        except Exception as e:
+            print(f"MPA Query Error: {traceback.format_exc()}")
+            self._send_error(500, f"Internal error: {str(e)}")
+
+    def do_OPTIONS(self):
+        """Handle CORS preflight."""
+        self.send_response(200)
+        self._send_cors_headers()
+        self.end_headers()
+
+    def _send_body(self, status: int, body: bytes, content_type: str, headers: Optional[Dict[str, str]] = None):
+        """Send a response body, gzip-compressed when the client accepts it."""
+        if 'gzip' in self.headers.get('Accept-Encoding', '') and len(body) > 1024:
+            body = gzip.compress(body, compresslevel=5)
+            headers = dict(headers or {}, **{'Content-Encoding': 'gzip'})
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self._send_cors_headers()
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, data: dict):
+        """Send JSON response."""
+        self._send_body(status, json.dumps(data, default=str).encode(), 'application/json')
+
+    def _send_error(self, status: int, message: str):
+        """Send error response."""
+        self._send_json(status, {'success': False, 'error': message})
+
+    def _send_cors_headers(self):
+        """Add CORS headers."""
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, Authorization')
+        self.send_header('Access-Control-Expose-Headers', 'X-Next-Cursor')
@@ -0,0 +1,120 @@
+"""
+Monthly Performance Analysis - Offline Runner
+
+Runs complete batches against the local embedded backend (SQLite plus a
+storage directory) without Supabase or the network. Useful for
+reproducing a month end-to-end and for load-testing persistence.
+
+Usage:
+    python api/py/mpa/run_local.py --month November2025 \
+        --proforma ProForma.xlsx --compensation Comp.xlsx \
+        --hours Hours.xlsx --expenses Expenses.xlsx --pnl PnL.xlsx \
+        [--dir .mpa_local] [--repeat 5] [--reprocess] [--memory-budget-mb 512] \
+        [--batch BATCH_ID] [--incremental] [--reuse]
+
+Each repeat creates a new batch unless --reprocess is given, in which case
+the same batch is processed again (exercising diff-based re-persistence).
+Every run computes and persists its results: the repeats have identical
+inputs, so with --reuse runs after the first only copy the first batch's
+results (as the process endpoint does by default).
+
+With --memory-budget-mb every run is recomputed in bounded-memory mode and
+the command exits with status 1 if any run's peak RSS exceeded the budget,
+so it can gate CI on a representative month.
+
+With --batch the files replace those of an existing local batch, which is
+then processed again; with --incremental too, each day's Harvest export
+(month to date, or just the new days) is ingested into the batch's
+month-to-date state:
+
+    python api/py/mpa/run_local.py --month November2025 ... --incremental
+    python api/py/mpa/run_local.py --month November2025 ... --incremental --batch <batchId>
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import List, Optional
+
+# Add lib directory to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+lib_dir = os.path.join(current_dir, 'lib')
+if lib_dir not in sys.path:
+    sys.path.insert(0, lib_dir)
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+from local_backend import FILE_COLUMNS, LocalClient
+from process import run_analysis
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Run MPA batches against the local backend')
+    parser.add_argument('--month', required=True, help="Month identifier, e.g. 'November2025'")
+    for name in FILE_COLUMNS:
+        parser.add_argument(f'--{name}', required=True, help=f'{name} workbook')
+    parser.add_argument('--dir', default=os.environ.get('MPA_LOCAL_DIR', '.mpa_local'))
+    parser.add_argument('--repeat', type=int, default=1, help='Number of runs')
+    parser.add_argument('--reprocess', action='store_true', help='Re-run the same batch instead of new ones')
+    parser.add_argument('--memory-budget-mb', type=float, default=None,
+                        help='Run with this peak RSS budget and fail if it is exceeded')
+    parser.add_argument('--batch', help='Replace the files of this existing batch and process it again')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Ingest only new and retracted Harvest rows into the month-to-date state')
+    parser.add_argument('--reuse', action='store_true',
+                        help='Copy the results of a completed batch with identical inputs instead of recomputing')
+    args = parser.parse_args(argv)
+
+    files = {}
+    for name in FILE_COLUMNS:
+        with open(getattr(args, name), 'rb') as f:
+            files[name] = f.read()
+
+    db = LocalClient(args.dir)
+    batch = None
+    if args.batch:
+        batch = db.get_batch(args.batch)
+        if batch is None:
+            parser.error(f"batch {args.batch} not found in {args.dir}")
+        for name, column in FILE_COLUMNS.items():
+            db.upload_file(batch[column], files[name])
+        args.reprocess = True
+    timings = []
+    over_budget = False
+    for _ in range(max(1, args.repeat)):
+        if batch is None or not args.reprocess:
+            batch = db.create_batch(args.month, files)
+        db.update_batch_status(batch['id'], 'processing')
+
+        started = time.perf_counter()
+        if args.memory_budget_mb is None:
+            result = run_analysis(db, batch, reuse=args.reuse, incremental=args.incremental)
+        else:
+            result = run_analysis(
+                db, batch, reuse=False, memory_budget_mb=args.memory_budget_mb, incremental=args.incremental,
+            )
+        timings.append(round(time.perf_counter() - started, 3))
+
+        output = {
+            'batchId': batch['id'],
+            'seconds': timings[-1],
+            'summary': result.get('summary'),
+        }
+        memory = result.get('metrics', {}).get('memory')
+        if memory is not None:
+            output['memory'] = memory
+            over_budget = over_budget or not memory['within_budget']
+        print(json.dumps(output, default=str))
+
+    if len(timings) > 1:
+        print(f"runs={len(timings)} min={min(timings)}s max={max(timings)}s mean={sum(timings) / len(timings):.3f}s")
+
+    if over_budget:
+        print(f"Peak RSS exceeded the {args.memory_budget_mb:g} MB memory budget", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""
+Monthly Performance Analysis - Background Worker
+
+Long-running process that claims queued batches from mpa_analysis_batches
+and runs the analysis pipeline outside the HTTP request.
+
+POST /api/mpa/process with { "batchId": "uuid", "async": true } queues a
+batch and returns immediately; this worker then:
+1. Claims the oldest queued batch with a lease
+2. Renews the lease with heartbeats while the pipeline runs
+3. Re-queues transient failures with exponential backoff
+4. Marks business-rule failures (ValueError) and exhausted retries as failed
+
+The process stays warm between jobs: the Supabase client, config
+fingerprint and local stage cache are reused. The client is resolved
+through get_client() per job and per queue call, so an idle client is
+health-checked and one dropped by a transient failure is replaced.
+
+Usage:
+    python api/py/mpa/worker.py --concurrency 2
+"""
+
+import argparse
+import os
+import socket
+import sys
+import threading
+import traceback
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+# Add lib directory to path for imports
+current_dir = os.path.dirname(os.path.abspath(__file__))
+lib_dir = os.path.join(current_dir, 'lib')
+if lib_dir not in sys.path:
+    sys.path.insert(0, lib_dir)
+if current_dir not in sys.path:
+    sys.path.insert(0, current_dir)
+
+# Load environment from .env if running locally
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+from db import get_client, reset_client
+from jobs import BatchQueue, SupabaseBatchQueue
+from process import run_analysis
+
+
+class Worker:
+    """
+    Claims and processes MPA batches with bounded concurrency.
+
+    Args:
+        queue: BatchQueue to claim jobs from
+        concurrency: Maximum batches processed at once
+        lease_seconds: Lease length granted per claim/heartbeat
+        heartbeat_seconds: Interval between lease renewals
+        max_attempts: Claims allowed before a transient failure becomes final
+        backoff_seconds: Base delay for retries (doubles per attempt)
+        poll_seconds: Wait between claims when the queue is empty
+        runner: Pipeline entry point, run_analysis(db, batch) -> result
+        clock: Function returning the current UTC datetime
+        client: Returns the SupabaseClient (or compatible stand-in) for the
+            pipeline; called per job
+    """
+
+    def __init__(
+        self,
+        queue: BatchQueue,
+        concurrency: int = 2,
+        lease_seconds: int = 300,
+        heartbeat_seconds: int = 60,
+        max_attempts: int = 3,
+        backoff_seconds: int = 30,
+        poll_seconds: float = 5.0,
+        worker_id: Optional[str] = None,
+        runner: Callable[..., Dict[str, Any]] = run_analysis,
+        clock: Callable[[], datetime] = datetime.utcnow,
+        client: Callable[[], Any] = get_client,
+    ):
+        self.client = client
+        self.queue = queue
+        self.concurrency = max(1, concurrency)
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.poll_seconds = poll_seconds
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.runner = runner
+        self.clock = clock
+        self.outcomes: Dict[str, str] = {}
+
+    def retry_at(self, attempts: int) -> Optional[datetime]:
+        """Next retry time after a transient failure, or None if exhausted."""
+        if attempts >= self.max_attempts:
+            return None
+        delay = self.backoff_seconds * (2 ** max(0, attempts - 1))
+        return self.clock() + timedelta(seconds=delay)
+
+    def process(self, batch: Dict[str, Any]) -> str:
+        """
+        Run one claimed batch and settle its lease.
+
+        Returns:
+            Outcome: 'completed', 'retry', 'failed' or 'lost' (lease taken over)
+        """
+        batch_id = batch['id']
+        stop = threading.Event()
+        lost = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(self.heartbeat_seconds):
+                try:
+                    if not self.queue.heartbeat(batch_id, self.worker_id, self.lease_seconds):
+                        lost.set()
+                        return
+                except Exception:
+                    # A missed heartbeat is not fatal; the lease has slack
+                    pass
+
+        beat = threading.Thread(target=heartbeat, name=f"mpa-heartbeat-{batch_id}", daemon=True)
+        beat.start()
+        try:
+            self.runner(self.client(), batch)
+            outcome = 'completed'
+            error_message = None
+        except ValueError as e:
+            outcome = 'failed'
+            error_message = str(e)
+        except Exception as e:
+            print(f"MPA Worker Error ({batch_id}): {traceback.format_exc()}")
+            # The connection may be what failed; reconnect on next use
+            reset_client()
+            error_message = f"Internal error: {str(e)}"
+            outcome = 'retry'
+        finally:
+            stop.set()
+            beat.join()
+
+        if lost.is_set():
+            outcome = 'lost'
+        elif outcome == 'completed':
+            self.queue.complete(batch_id, self.worker_id)
+        else:
+            retry_at = self.retry_at(batch.get('attempts', 1)) if outcome == 'retry' else None
+            if retry_at is None:
+                outcome = 'failed'
+            self.queue.fail(batch_id, self.worker_id, error_message, retry_at)
+
+        self.outcomes[batch_id] = outcome
+        return outcome
+
+    def run(self, stop_event: Optional[threading.Event] = None, until_idle: bool = False):
+        """
+        Claim and process batches until stopped.
+
+        Args:
+            stop_event: Set to stop claiming new work (running jobs finish)
+            until_idle: Return once the queue is empty and all jobs are done
+        """
+        stop_event = stop_event or threading.Event()
+        active: List[Future] = []
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='mpa-job') as pool:
+            while not stop_event.is_set():
+                active = [f for f in active if not f.done()]
+
+                claimed = False
+                while len(active) < self.concurrency:
+                    try:
+                        batch = self.queue.claim(self.worker_id, self.lease_seconds)
+                    except Exception as e:
+                        # Keep polling; the next claim gets a fresh client
+                        print(f"MPA Worker claim failed: {e}")
+                        reset_client()
+                        batch = None
+                    if batch is None:
+                        break
+                    claimed = True
+                    active.append(pool.submit(self.process, batch))
+
+                if not claimed:
+                    if until_idle and not active:
+                        break
+                    stop_event.wait(self.poll_seconds if not active else min(self.poll_seconds, 0.5))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Process queued MPA batches')
+    parser.add_argument('--concurrency', type=int, default=int(os.environ.get('MPA_WORKER_CONCURRENCY', '2')))
+    parser.add_argument('--lease-seconds', type=int, default=300)
+    parser.add_argument('--heartbeat-seconds', type=int, default=60)
+    parser.add_argument('--max-attempts', type=int, default=3)
+    parser.add_argument('--backoff-seconds', type=int, default=30)
+    parser.add_argument('--poll-seconds', type=float, default=5.0)
+    parser.add_argument('--until-idle', action='store_true', help='Exit once the queue is empty')
+    args = parser.parse_args(argv)
+
+    if not get_client().supports_queue:
+        parser.error('the configured backend (MPA_BACKEND) has no batch queue')
+    worker = Worker(
+        SupabaseBatchQueue(get_client),
+        concurrency=args.concurrency,
+        lease_seconds=args.lease_seconds,
+        heartbeat_seconds=args.heartbeat_seconds,
+        max_attempts=args.max_attempts,
+        backoff_seconds=args.backoff_seconds,
+        poll_seconds=args.poll_seconds,
+    )
+    print(f"MPA worker {worker.worker_id} started (concurrency {worker.concurrency})")
+    try:
+        worker.run(until_idle=args.until_idle)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+-- Migration: 006_mpa_job_queue.sql
+-- Purpose: Background processing of MPA batches with leases, heartbeats and retries
+-- Created: 2026-10-19
+
+-- ============================================
+-- QUEUE COLUMNS ON MPA ANALYSIS BATCHES
+-- status gains 'queued': waiting for a worker (set by async process requests)
+-- ============================================
+
+ALTER TABLE mpa_analysis_batches
+ADD COLUMN IF NOT EXISTS lease_owner VARCHAR(100),
+ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMPTZ,
+ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMPTZ,
+ADD COLUMN IF NOT EXISTS attempts INTEGER DEFAULT 0,
+ADD COLUMN IF NOT EXISTS next_attempt_at TIMESTAMPTZ;
+
+COMMENT ON COLUMN mpa_analysis_batches.lease_owner IS 'Worker id currently holding the processing lease';
+COMMENT ON COLUMN mpa_analysis_batches.lease_expires_at IS 'Lease expiry; an expired processing batch can be reclaimed';
+COMMENT ON COLUMN mpa_analysis_batches.attempts IS 'Number of times a worker has claimed this batch';
+COMMENT ON COLUMN mpa_analysis_batches.next_attempt_at IS 'Earliest time a re-queued batch may be retried (backoff)';
+
+-- Partial index for the claim query
+CREATE INDEX IF NOT EXISTS idx_mpa_batches_claimable
+    ON mpa_analysis_batches(created_at)
+    WHERE status IN ('queued', 'processing');
+
+-- ============================================
+-- CLAIM FUNCTION
+-- Atomically leases the oldest claimable batch (SKIP LOCKED so workers never block each other)
+-- ============================================
+
+CREATE OR REPLACE FUNCTION mpa_claim_batch(p_worker_id TEXT, p_lease_seconds INTEGER)
+RETURNS SETOF mpa_analysis_batches AS $$
+DECLARE
+    v_id UUID;
+BEGIN
+    SELECT id INTO v_id
+    FROM mpa_analysis_batches
+    WHERE (
+        status = 'queued'
+        AND (next_attempt_at IS NULL OR next_attempt_at <= NOW())
+    ) OR (
+        status = 'processing'
+        AND lease_owner IS NOT NULL
+        AND lease_expires_at <= NOW()
+    )
+    ORDER BY created_at
+    LIMIT 1
+    FOR UPDATE SKIP LOCKED;
+
+    IF v_id IS NULL THEN
+        RETURN;
+    END IF;
+
+    RETURN QUERY
+    UPDATE mpa_analysis_batches
+    SET status = 'processing',
+        lease_owner = p_worker_id,
+        lease_expires_at = NOW() + make_interval(secs => p_lease_seconds),
+        heartbeat_at = NOW(),
+        attempts = COALESCE(attempts, 0) + 1,
+        updated_at = NOW()
+    WHERE id = v_id
+    RETURNING *;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============================================
+-- HEARTBEAT FUNCTION
+-- Extends the lease; returns false if the worker lost it
+-- ============================================
+
+CREATE OR REPLACE FUNCTION mpa_heartbeat_batch(p_batch_id UUID, p_worker_id TEXT, p_lease_seconds INTEGER)
+RETURNS BOOLEAN AS $$
+BEGIN
+    UPDATE mpa_analysis_batches
+    SET heartbeat_at = NOW(),
+        lease_expires_at = NOW() + make_interval(secs => p_lease_seconds)
+    WHERE id = p_batch_id
+      AND lease_owner = p_worker_id;
+    RETURN FOUND;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,9 @@
+-- Migration: 007_mpa_batch_metrics.sql
+-- Purpose: Store structured per-stage performance metrics for each MPA batch run
+-- Created: 2026-10-19
+
+ALTER TABLE mpa_analysis_batches
+ADD COLUMN IF NOT EXISTS metrics JSONB;
+
+COMMENT ON COLUMN mpa_analysis_batches.metrics IS
+    'Instrumentation for the last run: {version, wall_ms, peak_bytes, max_rss_bytes, totals: {kind: {count, wall_ms, cpu_ms}}, records: [{kind, name, wall_ms, cpu_ms, rows_in, rows_out, max_rss_bytes, peak_bytes}]}';
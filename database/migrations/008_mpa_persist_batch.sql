@@ -0,0 +1,132 @@
+-- Migration: 008_mpa_persist_batch.sql
+-- Purpose: Persist a complete MPA result set in one call and one transaction
+-- Created: 2026-10-19
+
+-- ============================================
+-- BULK PERSIST FUNCTION
+-- Called once per batch by the Python pipeline (MPA_PERSIST_MODE=rpc).
+--
+-- p_payload is compact: each table is an array of row arrays whose
+-- positions follow the column specs in api/py/mpa/lib/db.py
+--   revenue_centers:     [contract_code, project_name, proforma_section, analysis_category,
+--                         allocation_tag, revenue, hours, labor_cost, expense_cost,
+--                         sga_allocation, data_allocation, workplace_allocation,
+--                         margin_dollars, margin_percent]
+--   cost_centers:        [contract_code, description, pool, hours, labor_cost, expense_cost, total_cost]
+--   non_revenue_clients: [contract_code, project_name, hours, labor_cost, expense_cost, total_cost]
+--   hours_detail:        [contract_code, staff_key, hours, hourly_cost, labor_cost]
+--   expenses_detail:     [contract_code, expense_date, amount, notes]
+-- plus pools_detail (object) and batch (summary columns for mpa_analysis_batches).
+--
+-- Existing result rows for the batch are replaced, so a reprocessed batch
+-- never holds two copies. Any error rolls the whole call back.
+-- ============================================
+
+CREATE OR REPLACE FUNCTION mpa_persist_batch(p_batch_id UUID, p_payload JSONB)
+RETURNS JSONB AS $$
+DECLARE
+    v_counts JSONB := '{}'::jsonb;
+    v_rows INTEGER;
+    v_batch JSONB := p_payload->'batch';
+    v_pools JSONB := p_payload->'pools_detail';
+BEGIN
+    DELETE FROM mpa_revenue_centers WHERE batch_id = p_batch_id;
+    DELETE FROM mpa_cost_centers WHERE batch_id = p_batch_id;
+    DELETE FROM mpa_non_revenue_clients WHERE batch_id = p_batch_id;
+    DELETE FROM mpa_hours_detail WHERE batch_id = p_batch_id;
+    DELETE FROM mpa_expenses_detail WHERE batch_id = p_batch_id;
+    DELETE FROM mpa_pools_detail WHERE batch_id = p_batch_id;
+
+    INSERT INTO mpa_revenue_centers (
+        batch_id, contract_code, project_name, proforma_section, analysis_category,
+        allocation_tag, revenue, hours, labor_cost, expense_cost,
+        sga_allocation, data_allocation, workplace_allocation,
+        margin_dollars, margin_percent
+    )
+    SELECT p_batch_id, r->>0, r->>1, r->>2, r->>3,
+           r->>4, (r->>5)::numeric, (r->>6)::numeric, (r->>7)::numeric, (r->>8)::numeric,
+           (r->>9)::numeric, (r->>10)::numeric, (r->>11)::numeric,
+           (r->>12)::numeric, (r->>13)::numeric
+    FROM jsonb_array_elements(COALESCE(p_payload->'revenue_centers', '[]'::jsonb)) AS r;
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    v_counts := v_counts || jsonb_build_object('mpa_revenue_centers', v_rows);
+
+    INSERT INTO mpa_cost_centers (
+        batch_id, contract_code, description, pool, hours, labor_cost, expense_cost, total_cost
+    )
+    SELECT p_batch_id, r->>0, r->>1, COALESCE(r->>2, 'SGA'),
+           (r->>3)::numeric, (r->>4)::numeric, (r->>5)::numeric, (r->>6)::numeric
+    FROM jsonb_array_elements(COALESCE(p_payload->'cost_centers', '[]'::jsonb)) AS r;
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    v_counts := v_counts || jsonb_build_object('mpa_cost_centers', v_rows);
+
+    INSERT INTO mpa_non_revenue_clients (
+        batch_id, contract_code, project_name, hours, labor_cost, expense_cost, total_cost
+    )
+    SELECT p_batch_id, r->>0, r->>1,
+           (r->>2)::numeric, (r->>3)::numeric, (r->>4)::numeric, (r->>5)::numeric
+    FROM jsonb_array_elements(COALESCE(p_payload->'non_revenue_clients', '[]'::jsonb)) AS r;
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    v_counts := v_counts || jsonb_build_object('mpa_non_revenue_clients', v_rows);
+
+    INSERT INTO mpa_hours_detail (
+        batch_id, contract_code, staff_key, hours, hourly_cost, labor_cost
+    )
+    SELECT p_batch_id, r->>0, r->>1, (r->>2)::numeric, (r->>3)::numeric, (r->>4)::numeric
+    FROM jsonb_array_elements(COALESCE(p_payload->'hours_detail', '[]'::jsonb)) AS r;
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    v_counts := v_counts || jsonb_build_object('mpa_hours_detail', v_rows);
+
+    INSERT INTO mpa_expenses_detail (
+        batch_id, contract_code, expense_date, amount, notes
+    )
+    SELECT p_batch_id, r->>0, (r->>1)::date, (r->>2)::numeric, r->>3
+    FROM jsonb_array_elements(COALESCE(p_payload->'expenses_detail', '[]'::jsonb)) AS r;
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    v_counts := v_counts || jsonb_build_object('mpa_expenses_detail', v_rows);
+
+    INSERT INTO mpa_pools_detail (
+        batch_id, sga_from_pnl, data_from_pnl, workplace_from_pnl, nil_excluded,
+        sga_from_cc, data_from_cc, total_revenue, data_tagged_revenue, wellness_tagged_revenue
+    )
+    VALUES (
+        p_batch_id,
+        (v_pools->>'sga_from_pnl')::numeric,
+        (v_pools->>'data_from_pnl')::numeric,
+        (v_pools->>'workplace_from_pnl')::numeric,
+        (v_pools->>'nil_excluded')::numeric,
+        (v_pools->>'sga_from_cc')::numeric,
+        (v_pools->>'data_from_cc')::numeric,
+        (v_pools->>'total_revenue')::numeric,
+        (v_pools->>'data_tagged_revenue')::numeric,
+        (v_pools->>'wellness_tagged_revenue')::numeric
+    );
+
+    UPDATE mpa_analysis_batches
+    SET total_revenue = (v_batch->>'total_revenue')::numeric,
+        total_labor_cost = (v_batch->>'total_labor_cost')::numeric,
+        total_expense_cost = (v_batch->>'total_expense_cost')::numeric,
+        total_margin_dollars = (v_batch->>'total_margin_dollars')::numeric,
+        overall_margin_percent = (v_batch->>'overall_margin_percent')::numeric,
+        sga_pool = (v_batch->>'sga_pool')::numeric,
+        data_pool = (v_batch->>'data_pool')::numeric,
+        workplace_pool = (v_batch->>'workplace_pool')::numeric,
+        revenue_center_count = COALESCE((v_batch->>'revenue_center_count')::integer, 0),
+        cost_center_count = COALESCE((v_batch->>'cost_center_count')::integer, 0),
+        non_revenue_client_count = COALESCE((v_batch->>'non_revenue_client_count')::integer, 0),
+        validation_passed = COALESCE((v_batch->>'validation_passed')::boolean, false),
+        validation_errors = v_batch->'validation_errors',
+        status = 'completed',
+        processed_at = NOW(),
+        updated_at = NOW()
+    WHERE id = p_batch_id;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'MPA batch % not found', p_batch_id;
+    END IF;
+
+    RETURN v_counts;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION mpa_persist_batch(UUID, JSONB) IS 'Replaces all MPA result rows for a batch and completes it in one transaction';
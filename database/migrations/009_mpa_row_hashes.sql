@@ -0,0 +1,24 @@
+-- Migration: 009_mpa_row_hashes.sql
+-- Purpose: Content hashes on MPA result rows so reprocessing writes only changed rows
+-- Created: 2026-10-19
+
+-- ============================================
+-- ROW HASH COLUMNS
+-- MD5 of the serialized row values, set by the Python pipeline.
+-- Reprocessing a batch matches stored rows by natural key
+-- (contract_code[, staff_key]; expenses by content) and compares hashes:
+-- only new, changed and removed rows are written.
+-- Rows without a hash (written before this migration) are rewritten once.
+-- ============================================
+
+ALTER TABLE mpa_revenue_centers ADD COLUMN IF NOT EXISTS row_hash VARCHAR(32);
+ALTER TABLE mpa_cost_centers ADD COLUMN IF NOT EXISTS row_hash VARCHAR(32);
+ALTER TABLE mpa_non_revenue_clients ADD COLUMN IF NOT EXISTS row_hash VARCHAR(32);
+ALTER TABLE mpa_hours_detail ADD COLUMN IF NOT EXISTS row_hash VARCHAR(32);
+ALTER TABLE mpa_expenses_detail ADD COLUMN IF NOT EXISTS row_hash VARCHAR(32);
+
+COMMENT ON COLUMN mpa_revenue_centers.row_hash IS 'Content hash used for diff-based re-persistence';
+COMMENT ON COLUMN mpa_cost_centers.row_hash IS 'Content hash used for diff-based re-persistence';
+COMMENT ON COLUMN mpa_non_revenue_clients.row_hash IS 'Content hash used for diff-based re-persistence';
+COMMENT ON COLUMN mpa_hours_detail.row_hash IS 'Content hash used for diff-based re-persistence';
+COMMENT ON COLUMN mpa_expenses_detail.row_hash IS 'Content hash used for diff-based re-persistence';
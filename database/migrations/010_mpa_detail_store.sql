@@ -0,0 +1,15 @@
+-- Migration: 010_mpa_detail_store.sql
+-- Purpose: Record where each MPA batch's drill-down detail rows are stored
+-- Created: 2026-10-19
+
+-- ============================================
+-- DETAIL STORE
+-- 'postgres': mpa_hours_detail / mpa_expenses_detail rows (default)
+-- 'parquet':  mpa_detail/<batch_id>/<table>.parquet in the uploads bucket
+--             (MPA_DETAIL_STORE=parquet); the detail tables hold no rows
+-- ============================================
+
+ALTER TABLE mpa_analysis_batches
+ADD COLUMN IF NOT EXISTS detail_store VARCHAR(20) DEFAULT 'postgres';
+
+COMMENT ON COLUMN mpa_analysis_batches.detail_store IS 'Where drill-down detail lives: postgres or parquet (storage)';
@@ -0,0 +1,37 @@
+-- Migration: 011_mpa_drilldown_indexes.sql
+-- Purpose: Indexes for keyset-paginated MPA drill-down queries (api/py/mpa/query.py)
+-- Created: 2026-10-19
+
+-- ============================================
+-- KEYSET PAGINATION
+-- Pages are ordered by (sort column, id) within a batch, optionally for one
+-- contract code. Indexes on (batch_id, <sort>, id) let each page be an index
+-- range scan instead of a sort of the whole batch.
+-- ============================================
+
+-- Default orderings of each resource
+CREATE INDEX IF NOT EXISTS idx_mpa_rev_batch_revenue
+ON mpa_revenue_centers(batch_id, revenue DESC, id);
+
+CREATE INDEX IF NOT EXISTS idx_mpa_cc_batch_cost
+ON mpa_cost_centers(batch_id, total_cost DESC, id);
+
+CREATE INDEX IF NOT EXISTS idx_mpa_nrc_batch_cost
+ON mpa_non_revenue_clients(batch_id, total_cost DESC, id);
+
+-- ============================================
+-- DRILL-DOWN BY CONTRACT CODE
+-- Covering indexes so a code's detail page is served from the index alone
+-- ============================================
+
+CREATE INDEX IF NOT EXISTS idx_mpa_hours_batch_code_hours
+ON mpa_hours_detail(batch_id, contract_code, hours DESC, id)
+INCLUDE (staff_key, hourly_cost, labor_cost);
+
+CREATE INDEX IF NOT EXISTS idx_mpa_exp_batch_code_amount
+ON mpa_expenses_detail(batch_id, contract_code, amount DESC, id)
+INCLUDE (expense_date, notes);
+
+-- Superseded by the covering indexes above (same leading columns)
+DROP INDEX IF EXISTS idx_mpa_hours_batch_code;
+DROP INDEX IF EXISTS idx_mpa_exp_batch_code;
@@ -0,0 +1,66 @@
+-- Migration: 012_mpa_batch_rollups.sql
+-- Purpose: Precomputed MPA dashboard rollups, refreshed by the pipeline after each batch
+-- Created: 2026-10-19
+
+-- ============================================
+-- MPA BATCH ROLLUPS TABLE
+-- Written by api/py/mpa (lib/rollups.py) from the in-memory results once a
+-- batch is persisted; replaced wholesale when the batch is reprocessed.
+-- rollup:
+--   'category'      margins by analysis_category (x month via month_name)
+--   'section'       margins by proforma_section
+--   'tag'           allocation_tag totals and the pool shares allocated to them
+--   'top_margin'    top N codes by margin dollars (group_key = contract_code)
+--   'bottom_margin' bottom N codes by margin dollars
+-- ============================================
+
+CREATE TABLE IF NOT EXISTS mpa_batch_rollups (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    batch_id UUID NOT NULL REFERENCES mpa_analysis_batches(id) ON DELETE CASCADE,
+    month_name VARCHAR(50) NOT NULL,
+
+    rollup VARCHAR(30) NOT NULL,
+    group_key VARCHAR(255) NOT NULL,
+    rank INTEGER NOT NULL,
+
+    -- Summed revenue center metrics
+    revenue DECIMAL(15,2) DEFAULT 0,
+    hours DECIMAL(10,2) DEFAULT 0,
+    labor_cost DECIMAL(15,2) DEFAULT 0,
+    expense_cost DECIMAL(15,2) DEFAULT 0,
+    sga_allocation DECIMAL(15,2) DEFAULT 0,
+    data_allocation DECIMAL(15,2) DEFAULT 0,
+    workplace_allocation DECIMAL(15,2) DEFAULT 0,
+    margin_dollars DECIMAL(15,2) DEFAULT 0,
+    margin_percent DECIMAL(8,2) DEFAULT 0,
+    code_count INTEGER DEFAULT 0,
+
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+
+    UNIQUE (batch_id, rollup, group_key)
+);
+
+-- Indexes for mpa_batch_rollups
+CREATE INDEX IF NOT EXISTS idx_mpa_rollups_batch ON mpa_batch_rollups(batch_id, rollup, rank);
+CREATE INDEX IF NOT EXISTS idx_mpa_rollups_month ON mpa_batch_rollups(rollup, group_key, month_name);
+
+COMMENT ON TABLE mpa_batch_rollups IS 'Precomputed dashboard aggregates per batch (category, section, tag, top/bottom codes)';
+
+-- ============================================
+-- ROW LEVEL SECURITY
+-- ============================================
+
+ALTER TABLE mpa_batch_rollups ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY mpa_rollups_select ON mpa_batch_rollups
+    FOR SELECT USING (
+        EXISTS (
+            SELECT 1 FROM mpa_analysis_batches b
+            WHERE b.id = mpa_batch_rollups.batch_id
+            AND (
+                auth.jwt() ->> 'email' = b.created_by
+                OR auth.jwt() ->> 'role' = 'admin'
+                OR auth.jwt() ->> 'executive_id' IN ('exec-cfo', 'exec-ceo', 'exec-president', 'exec-coo')
+            )
+        )
+    );
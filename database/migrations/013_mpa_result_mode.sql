@@ -0,0 +1,17 @@
+-- Migration: 013_mpa_result_mode.sql
+-- Purpose: Record whether an MPA batch holds full results or only the summary
+-- Created: 2026-10-19
+
+-- ============================================
+-- RESULT MODE
+-- 'full':    every result table is current (default)
+-- 'summary': processed with mode=summary; only the batch summary,
+--            mpa_revenue_centers and mpa_batch_rollups are written. Cost
+--            centers, non-revenue clients, detail rows and pools detail are
+--            empty until the next full run of the batch
+-- ============================================
+
+ALTER TABLE mpa_analysis_batches
+ADD COLUMN IF NOT EXISTS result_mode VARCHAR(20) DEFAULT 'full';
+
+COMMENT ON COLUMN mpa_analysis_batches.result_mode IS 'full, or summary when only the headline results were written';
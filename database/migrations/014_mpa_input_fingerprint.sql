@@ -0,0 +1,155 @@
+-- Migration: 014_mpa_input_fingerprint.sql
+-- Purpose: Reuse the results of a completed MPA batch with identical inputs
+-- Created: 2026-10-19
+
+-- ============================================
+-- INPUT FINGERPRINT
+-- SHA-256 over the month, the content hashes of the five source files, the
+-- config fingerprint and the pipeline code version, set by the Python
+-- pipeline when a batch's results are written. Processing a batch whose
+-- fingerprint matches a completed batch copies that batch's results
+-- (mpa_copy_batch_results) instead of running the pipeline.
+-- ============================================
+
+ALTER TABLE mpa_analysis_batches
+ADD COLUMN IF NOT EXISTS input_fingerprint VARCHAR(64);
+
+CREATE INDEX IF NOT EXISTS idx_mpa_batches_fingerprint
+ON mpa_analysis_batches(input_fingerprint, processed_at DESC)
+WHERE status = 'completed';
+
+COMMENT ON COLUMN mpa_analysis_batches.input_fingerprint IS 'Hash of month, input files, config and code version of the stored results';
+
+-- ============================================
+-- COPY RESULTS FUNCTION
+-- Replaces the target batch's result rows with copies of the source
+-- batch's (result tables, pools detail and rollups), copies the summary
+-- columns and completes the target in one transaction.
+-- Parquet detail files (detail_store = 'parquet') are copied in storage by
+-- the caller before this runs.
+-- ============================================
+
+CREATE OR REPLACE FUNCTION mpa_copy_batch_results(p_source_batch_id UUID, p_target_batch_id UUID)
+RETURNS JSONB AS $$
+DECLARE
+    v_counts JSONB := '{}'::jsonb;
+    v_rows INTEGER;
+    v_source mpa_analysis_batches%ROWTYPE;
+BEGIN
+    SELECT * INTO v_source FROM mpa_analysis_batches
+    WHERE id = p_source_batch_id AND status = 'completed';
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'MPA batch % not found or not completed', p_source_batch_id;
+    END IF;
+
+    DELETE FROM mpa_revenue_centers WHERE batch_id = p_target_batch_id;
+    DELETE FROM mpa_cost_centers WHERE batch_id = p_target_batch_id;
+    DELETE FROM mpa_non_revenue_clients WHERE batch_id = p_target_batch_id;
+    DELETE FROM mpa_hours_detail WHERE batch_id = p_target_batch_id;
+    DELETE FROM mpa_expenses_detail WHERE batch_id = p_target_batch_id;
+    DELETE FROM mpa_pools_detail WHERE batch_id = p_target_batch_id;
+    DELETE FROM mpa_batch_rollups WHERE batch_id = p_target_batch_id;
+
+    INSERT INTO mpa_revenue_centers (
+        batch_id, contract_code, project_name, proforma_section, analysis_category,
+        allocation_tag, revenue, hours, labor_cost, expense_cost,
+        sga_allocation, data_allocation, workplace_allocation,
+        margin_dollars, margin_percent, row_hash
+    )
+    SELECT p_target_batch_id, contract_code, project_name, proforma_section, analysis_category,
+           allocation_tag, revenue, hours, labor_cost, expense_cost,
+           sga_allocation, data_allocation, workplace_allocation,
+           margin_dollars, margin_percent, row_hash
+    FROM mpa_revenue_centers WHERE batch_id = p_source_batch_id;
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    v_counts := v_counts || jsonb_build_object('mpa_revenue_centers', v_rows);
+
+    INSERT INTO mpa_cost_centers (
+        batch_id, contract_code, description, pool, hours, labor_cost, expense_cost, total_cost, row_hash
+    )
+    SELECT p_target_batch_id, contract_code, description, pool, hours, labor_cost, expense_cost, total_cost, row_hash
+    FROM mpa_cost_centers WHERE batch_id = p_source_batch_id;
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    v_counts := v_counts || jsonb_build_object('mpa_cost_centers', v_rows);
+
+    INSERT INTO mpa_non_revenue_clients (
+        batch_id, contract_code, project_name, hours, labor_cost, expense_cost, total_cost, row_hash
+    )
+    SELECT p_target_batch_id, contract_code, project_name, hours, labor_cost, expense_cost, total_cost, row_hash
+    FROM mpa_non_revenue_clients WHERE batch_id = p_source_batch_id;
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    v_counts := v_counts || jsonb_build_object('mpa_non_revenue_clients', v_rows);
+
+    INSERT INTO mpa_hours_detail (
+        batch_id, contract_code, staff_key, hours, hourly_cost, labor_cost, row_hash
+    )
+    SELECT p_target_batch_id, contract_code, staff_key, hours, hourly_cost, labor_cost, row_hash
+    FROM mpa_hours_detail WHERE batch_id = p_source_batch_id;
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    v_counts := v_counts || jsonb_build_object('mpa_hours_detail', v_rows);
+
+    INSERT INTO mpa_expenses_detail (
+        batch_id, contract_code, expense_date, amount, notes, row_hash
+    )
+    SELECT p_target_batch_id, contract_code, expense_date, amount, notes, row_hash
+    FROM mpa_expenses_detail WHERE batch_id = p_source_batch_id;
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    v_counts := v_counts || jsonb_build_object('mpa_expenses_detail', v_rows);
+
+    INSERT INTO mpa_pools_detail (
+        batch_id, sga_from_pnl, data_from_pnl, workplace_from_pnl, nil_excluded,
+        sga_from_cc, data_from_cc, total_revenue, data_tagged_revenue, wellness_tagged_revenue
+    )
+    SELECT p_target_batch_id, sga_from_pnl, data_from_pnl, workplace_from_pnl, nil_excluded,
+           sga_from_cc, data_from_cc, total_revenue, data_tagged_revenue, wellness_tagged_revenue
+    FROM mpa_pools_detail WHERE batch_id = p_source_batch_id;
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    v_counts := v_counts || jsonb_build_object('mpa_pools_detail', v_rows);
+
+    INSERT INTO mpa_batch_rollups (
+        batch_id, month_name, rollup, group_key, rank,
+        revenue, hours, labor_cost, expense_cost,
+        sga_allocation, data_allocation, workplace_allocation,
+        margin_dollars, margin_percent, code_count
+    )
+    SELECT p_target_batch_id, month_name, rollup, group_key, rank,
+           revenue, hours, labor_cost, expense_cost,
+           sga_allocation, data_allocation, workplace_allocation,
+           margin_dollars, margin_percent, code_count
+    FROM mpa_batch_rollups WHERE batch_id = p_source_batch_id;
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    v_counts := v_counts || jsonb_build_object('mpa_batch_rollups', v_rows);
+
+    UPDATE mpa_analysis_batches
+    SET total_revenue = v_source.total_revenue,
+        total_labor_cost = v_source.total_labor_cost,
+        total_expense_cost = v_source.total_expense_cost,
+        total_margin_dollars = v_source.total_margin_dollars,
+        overall_margin_percent = v_source.overall_margin_percent,
+        sga_pool = v_source.sga_pool,
+        data_pool = v_source.data_pool,
+        workplace_pool = v_source.workplace_pool,
+        revenue_center_count = v_source.revenue_center_count,
+        cost_center_count = v_source.cost_center_count,
+        non_revenue_client_count = v_source.non_revenue_client_count,
+        validation_passed = v_source.validation_passed,
+        validation_errors = v_source.validation_errors,
+        detail_store = v_source.detail_store,
+        result_mode = v_source.result_mode,
+        input_fingerprint = v_source.input_fingerprint,
+        error_message = NULL,
+        status = 'completed',
+        processed_at = NOW(),
+        updated_at = NOW()
+    WHERE id = p_target_batch_id;
+
+    IF NOT FOUND THEN
+        RAISE EXCEPTION 'MPA batch % not found', p_target_batch_id;
+    END IF;
+
+    RETURN v_counts;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION mpa_copy_batch_results(UUID, UUID) IS 'Copies a completed MPA batch''s results to another batch with identical inputs';
@@ -12,7 +12,7 @@ import hashlib
 import logging
 from datetime import datetime, date
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Optional, Union
 from dataclasses import dataclass, field
 
 # Note: Requires openpyxl: pip install openpyxl pandas
@@ -25,6 +25,13 @@ except ImportError:
     print("  pip install pandas openpyxl")
     sys.exit(1)
 
+# Profiling modes are shared with the MPA pipeline (api/py/mpa/lib/profiling.py)
+mpa_lib_dir = str(Path(__file__).resolve().parents[2] / "api" / "py" / "mpa" / "lib")
+if mpa_lib_dir not in sys.path:
+    sys.path.insert(0, mpa_lib_dir)
+
+from profiling import PROFILE_MODES, Profiler, profile_mode
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -53,6 +60,7 @@ class IngestionResult:
     errors: list[ValidationError] = field(default_factory=list)
     started_at: datetime = field(default_factory=datetime.now)
     completed_at: Optional[datetime] = None
+    profile_path: Optional[str] = None
 
 
 # ============================================
@@ -300,7 +308,8 @@ def transform_training_to_kpis(df: pd.DataFrame) -> list[dict[str, Any]]:
 def ingest_excel(
     file_path: str,
     source_type: str,
-    dry_run: bool = False
+    dry_run: bool = False,
+    profile: Union[bool, str] = False
 ) -> IngestionResult:
     """
     Main entry point for Excel file ingestion.
@@ -309,10 +318,52 @@ def ingest_excel(
         file_path: Path to the Excel file
         source_type: One of 'excel_harvest', 'excel_training', 'excel_billable'
         dry_run: If True, validate only without persisting
+        profile: True, 'cprofile' or 'sample' (or MPA_PROFILE, parsed as for
+            run_analysis) to write a .pstats or .folded profile to
+            MPA_PROFILE_DIR (default ./profiles) named by file hash
 
     Returns:
         IngestionResult with status and any errors
     """
+    mode = profile_mode(profile)
+    if mode:
+        return _ingest_excel_profiled(file_path, source_type, dry_run, mode)
+    return _ingest_excel(file_path, source_type, dry_run)
+
+
+def _ingest_excel_profiled(file_path: str, source_type: str, dry_run: bool, mode: str) -> IngestionResult:
+    """Run _ingest_excel under the profiler and save the profile, also when it raises."""
+    profiler = Profiler(mode)
+    result = None
+    try:
+        with profiler:
+            result = _ingest_excel(file_path, source_type, dry_run)
+    finally:
+        name = (result.file_hash[:16] if result else "") or Path(file_path).stem
+        profile_path = _write_profile(profiler, name)
+    result.profile_path = profile_path
+    return result
+
+
+def _write_profile(profiler: Profiler, name: str) -> Optional[str]:
+    """Write a profile to MPA_PROFILE_DIR; failures are logged, not raised."""
+    try:
+        extension, content = profiler.artifact()
+        profile_dir = Path(os.environ.get("MPA_PROFILE_DIR", "profiles"))
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
+        profile_path = str(profile_dir / f"{name}_{stamp}.{extension}")
+        with open(profile_path, "wb") as f:
+            f.write(content)
+    except OSError as e:
+        logger.warning(f"Profile not written: {e}")
+        return None
+    logger.info(f"Profile written to {profile_path}")
+    return profile_path
+
+
+def _ingest_excel(file_path: str, source_type: str, dry_run: bool) -> IngestionResult:
+    """Unprofiled body of ingest_excel."""
     result = IngestionResult(
         success=False,
         source_type=source_type,
@@ -396,15 +447,25 @@ if __name__ == "__main__":
         action="store_true",
         help="Validate without persisting"
     )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=True,
+        default=False,
+        choices=PROFILE_MODES,
+        help="Write a profile for this run (cprofile .pstats by default, or sample .folded)"
+    )
 
     args = parser.parse_args()
 
-    result = ingest_excel(args.file, args.type, dry_run=args.dry_run)
+    result = ingest_excel(args.file, args.type, dry_run=args.dry_run, profile=args.profile)
 
     print(f"\nIngestion Result:")
     print(f"  Success: {result.success}")
     print(f"  Rows: {result.row_count}")
     print(f"  Records created: {result.records_created}")
+    if result.profile_path:
+        print(f"  Profile: {result.profile_path}")
     if result.errors:
         print(f"  Errors:")
         for err in result.errors:
@@ -5,6 +5,10 @@
  *
  * type: 'revenue' | 'cost' | 'nonrevenue'
  * code: contract_code (URL encoded)
+ *
+ * Hours and expense detail are read from Postgres. Batches persisted with
+ * MPA_DETAIL_STORE=parquet (detail_store = 'parquet') keep them in storage
+ * instead, and this route returns empty detail lists for them.
  */
 
 import { NextRequest, NextResponse } from 'next/server';